@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 r"""
-CerebrumLux V8 Build Automation v7.37.19 (Final Robust MinGW Build - Incorporating all feedback)
+CerebrumLux V8 Build Automation v7.38.24 (Final Robust MinGW Build - Incorporating all feedback)
 - Auto-resume (incremental fetch + gclient sync)
 - Proxy fallback & git/http tuning for flaky networks
 -  MinGW toolchain usage (DEPOT_TOOLS_WIN_TOOLCHAIN=0)
@@ -84,6 +84,31 @@ CerebrumLux V8 Build Automation v7.37.19 (Final Robust MinGW Build - Incorporati
 - FIX (v7.37.17): CRITICAL: Addressed persistent `Expecting assignment or function call. ]` error in `_patch_build_gn` by ensuring `vcvars_toolchain_data` block is reliably removed (replaced with empty string). Corrected `_patch_toolchain_win_build_gn` to use a temporary variable for `toolchain_arch` assignment (`_cerebrum_tmp_toolchain_arch = _invoker_local.toolchain_arch; toolchain_arch = _cerebrum_tmp_toolchain_arch`) to satisfy "May only subscript identifiers" and aggressively cleaned blank/comment lines in both patch functions. Finalized docstring `\\g` escapes.
 - FIX (v7.37.18): CRITICAL: Resolved a subtle issue in `_patch_setup_toolchain_py` where `original_text` was not always defined when creating a backup. Initialized `original_text` to `""` to ensure robustness. Further refined `_patch_build_gn` to handle trailing commas or empty lines immediately before the end of the file in the `vcvars_data_object_pattern` replacement, which was a potential cause of the `Expecting assignment or function call. ]` error when the block was at EOF. Re-verified all `\g` escapes to `\\g` in the docstring.
 - FIX (v7.37.19): CRITICAL: Ensured the `V8_VERSION` variable is consistently updated to match the latest docstring version for accurate logging. Addressed the persistent `SyntaxWarning: invalid escape sequence '\g'` by exhaustively checking and fixing all `\g` instances to `\\g` within the entire raw docstring. Finalized `_patch_toolchain_win_build_gn` logic to correctly handle `toolchain_arch` assignment using a temporary variable, ensuring the regex matches the dynamic content reliably.
+- NEW (v7.38.0): Replaced the open/append/close-per-line `log()` with a single background writer thread fed by a bounded queue. LOG_FILE/ERR_FILE stay open and are flushed on a size (LOG_FLUSH_BYTES) or time (LOG_FLUSH_INTERVAL) threshold, on every FATAL line and at interpreter exit. Line format, error-file split and console echo are unchanged.
+- NEW (v7.38.1): `run()` now streams stdout/stderr line-by-line into the log while the process runs instead of buffering everything with `capture_output=True`. Only the last RUN_TAIL_LINES lines per stream are kept (returned as `cp.stdout`/`cp.stderr` and attached to CalledProcessError), so memory stays flat for multi-hour gclient/ninja runs. Also repaired `run_gn_gen()` so the GN retry/args.gn auto-patch loop is actually reached (it referenced an undefined `gn_bin`).
+- NEW (v7.38.2): `log()` keeps per-level counters and remembers the first and last ERROR/FATAL line (log line number, timestamp, message). The end-of-run SUMMARY_ERROR/SUMMARY_SUCCESS decision now comes from those counters instead of re-reading the whole log and substring-matching "ERROR" (which also hit harmless compiler output), and a machine-readable run summary is written to RUN_SUMMARY_FILE next to the log.
+- NEW (v7.38.3): Split `main()` into named PIPELINE_STEPS run by `run_pipeline()`. Each step records a fingerprint of its inputs (V8_REF, DEPS hash, patched file hashes, args.gn content, toolchain versions, ...) in a checkpoint manifest (CHECKPOINT_FILE under V8_ROOT) and is skipped on re-runs while those inputs are unchanged. Added `--from-step`, `--only-step`, `--no-checkpoints` and `--list-steps`.
+- NEW (v7.38.4): PIPELINE_STEPS is now a DAG: every step declares the resources it consumes and produces, and `run_pipeline()` schedules ready steps on a thread pool limited to PIPELINE_MAX_WORKERS (`--pipeline-jobs`). Python dependency installs, depot_tools/.gclient preparation and the gerrit_util patch overlap, and `copy_to_vcpkg` is split so header copying and port generation overlap the ninja build. A failing step still aborts with the same FATAL/exit path; per-step timings and the critical path are logged and added to the run summary.
+- NEW (v7.38.5): Every pipeline step, every `log("STEP", ...)` stage and every `run()` invocation is recorded as a timed span (command, cwd, exit code, wall time and child CPU time via wait4()/GetProcessTimes where available). The spans are exported to TRACE_FILE as Chrome trace_event JSON and the SLOWEST_COMMANDS_REPORTED slowest commands are printed at exit and added to the run summary.
+- NEW (v7.38.6): The hand-written _patch_* functions are replaced by a declarative patch engine: each patch is a spec (pattern, anchor, replacement, idempotency marker) compiled once at import, all specs for a file are applied in one read-transform-write pass, and every spec reports applied/already/miss (logged and added to the run summary). GN list normalization now runs in the same pass instead of re-reading the file.
+- NEW (v7.38.7): Patch cache (PATCH_CACHE_FILE under V8_ROOT) mapping each patched file to the content hash it was left with and the digest of the spec set that produced it. Re-patching a file that is still byte-identical to that output (e.g. vs_toolchain.py around every gclient sync attempt, or the build files after the second sync) is skipped without any regex work; only files gclient actually rewrote are patched again. The spec set digest covers the specs' code and the module-level helpers they call (hashed the same way in every process) plus PATCH_SET_VERSION.
+- NEW (v7.38.8): DEPS and the build files are patched as independent jobs on a pool of PATCH_MAX_WORKERS threads (`--patch-jobs`, 1 = sequential). Results are gathered in patch order, so a failure aborts with the same FATAL message naming the first failing file; `git add` runs afterwards, one file at a time.
+- NEW (v7.38.9): `GitStagingBatch` replaces the per-file `git add` calls: patched files are registered during a phase and staged with one `git add -- <paths...>` (chunked to GIT_CMDLINE_MAX_CHARS), skipping files whose content already matches the index (`git ls-files -s` vs. the blob hash of the working-tree file).
+- NEW (v7.38.10): BUILD.gn files are patched through a small GN lexer/parser (`gn_parse`) and span editor (`GnEditor`) instead of regex surgery: specs of kind "gn" locate assignments, `exec_script(...)` calls, `defined()` checks and scope accesses in the syntax tree, record edits, and all gn specs of a file share one parse and one linear splice. The output is always valid GN, so the orphaned-comma / empty-line / list normalization passes (and the `//` comment filter) are no longer run on them. Parse errors report line and column. The args.gn scope blocks are printed with `gn_format_value`.
+- NEW (v7.38.11): In-process GN validation: every patched .gn/.gni file is parsed with `gn_parse` right after the patch phase (and again before `gn gen`), and syntax errors are reported as file:line:column with the offending line, failing in milliseconds instead of after a gn start-up, args.gn auto-patch and retry. `--validate-patches` runs the same check against an existing checkout and exits.
+- NEW (v7.38.12): `--benchmark` times the patch text transforms (`normalize_gn_lists`, `_filter_gn_comments`, `gn_parse` and every spec set, including the DEPS and visual_studio_version.gni regexes) on synthetic realistic and adversarial GN/DEPS/Python inputs of doubling size, records a JSON baseline (BENCHMARK_BASELINE_FILE / `--benchmark-baseline`, `--update-benchmark-baseline`) and fails on super-linear growth (the log-log slope of time over input size, fitted across all sizes, against BENCHMARK_SUPERLINEAR_RATIO per doubling) or regressions past BENCHMARK_REGRESSION_FACTOR. `run_patch_specs()` is the text-only core of `apply_patch_specs()`. The GN span editor now uses sorted spans with binary search and `gn_parse` pauses GC, keeping both linear.
+- NEW (v7.38.13): `--harness` runs the whole `main()` pipeline offline: local bare git repos stand in for the V8 and depot_tools remotes (DEPOT_TOOLS_GIT_URL is now a constant) and Python stubs for gclient, gn, ninja and pip, with configurable latency, failure rate, output volume and source size (`--harness-*`). Each run is a child process against a temporary V8_ROOT; step timings, subprocess counts, bytes logged and peak RSS are reported and written to HARNESS_REPORT_FILE. `--harness-runs 2` adds a warm run that exercises the checkpoints.
+- NEW (v7.38.14): Patch patterns are checked for open-ended sweeps when their spec is built (`regex_backtracking_hazards`: unbounded `[\s\S]` repeats, `.` repeats under re.DOTALL and lazy negated-class repeats that cross newlines, the shapes behind the `declare_args()`, `Var(.*?)` and cipd `[^}]*?},` hangs; read from the pattern source, `--benchmark` checks it on those shapes); a hazardous pattern raises RegexHazardError at import. The flagged `\s*`/`[\s\S]*?`/`.*?`/`[^}]*?` patterns were bounded to the line or replaced by `ScanPattern`, a linear opener ... closer matcher, and `_filter_gn_comments` strips block comments with a scanner. Every spec application runs under PATCH_SPEC_TIME_BUDGET and fails its file with a diagnostic naming the spec and pattern when it overruns.
+- NEW (v7.38.15): Machine-wide git object cache (GIT_CACHE_DIR) shared by every V8_ROOT: .gclient gets `cache_dir`, so gclient clones V8 and its DEPS against depot_tools' git_cache mirrors, and git_clone_with_retry() keeps a mirror per URL there (same naming and lock files) and clones with `--reference`. A recreated root or a second V8 version only fetches missing objects. Each run reports cache size, hits and misses (run summary `git_cache`); with `--prune-git-cache` it also prunes mirrors unused for GIT_CACHE_MAX_AGE_DAYS or beyond GIT_CACHE_MAX_BYTES, except those the root's checkouts borrow objects from.
+- NEW (v7.38.16): Lean fetch mode (GIT_FETCH_MODE / `--fetch-mode`, default lean): gclient syncs with `--revision v8@V8_REF --no-history` instead of `--with_branch_heads --with_tags`, so V8 and every DEPS entry arrive at their pinned revisions without history, branch heads or tags (DEPS is still resolved by gclient from the pinned commit); depot_tools is cloned with `--filter=blob:none`; checkout_v8_ref fetches exactly V8_REF (depth 1) when a checkout lacks it; the git cache mirrors of V8 and the prefetched DEPS entries get only their pinned SHA (depth 1 in a new or shallow mirror), a later full-mode fetch unshallows them. `--fetch-mode full` fetches history, branch heads and tags again; the v8 solution stays pinned with `--revision v8@V8_REF` in both modes.
+- NEW (v7.38.17): `git_fetch_and_reset()` no longer runs `git remote update --prune` and a full `--tags` fetch on every attempt: a commit SHA already present (`git cat-file -e`) is not fetched at all, anything else is fetched by itself (no tags; in lean mode depth 1 when the repository is new or already shallow, so a full or blob-less checkout never becomes shallow), and checkout + `reset --hard` became one `git switch --detach --discard-changes`. The checkout_v8_ref step now uses it, so a no-op resume is two local git commands.
+- NEW (v7.38.18): Parallel DEPS fetcher: before each gclient sync the git DEPS entries resolved by `gclient revinfo` are fetched DEPS_FETCH_JOBS at a time (`--deps-jobs`, default the CPU count; gclient sync gets the same `--jobs`), each with its own DEPS_FETCH_RETRIES attempts and back-off, into the git cache mirrors or, without a cache, the checkouts. Per-entry time, bytes and attempts are logged and recorded under "deps_prefetch" in the run summary; entries that keep failing are left to gclient sync. `--no-deps-prefetch` turns it off.
+- NEW (v7.38.19): Shared retry policy: failures are classified from exception types and stderr signatures (`classify_failure()`); permanent ones (missing ref or repository, 401/403/404, Python errors in patched scripts) are raised at once instead of being retried, transient ones wait a jittered back-off (GCLIENT_RETRY_BACKOFF, GIT_RETRY_BACKOFF, DEPS_FETCH_BACKOFF), and CIRCUIT_BREAKER_THRESHOLD consecutive transient failures trip a per-host (or per-proxy) circuit breaker for CIRCUIT_BREAKER_COOLDOWN seconds so clones move to the next proxy and DEPS fetches to gclient right away. Counts and tripped hosts go to "retries" in the run summary.
+- NEW (v7.38.20): Route selection: every mirror (V8_GITHUB_MIRROR_URL for V8) x proxy (PROXY_FALLBACKS) combination is probed concurrently with `git ls-remote` (ROUTE_PROBE_TIMEOUT), and the fastest is cached per host in ROUTE_CACHE_FILE for ROUTE_CACHE_TTL. The depot_tools clone and gclient sync start on it and fall back to the next route. Proxies and mirrors are applied per process through the environment (GIT_CONFIG_COUNT http.proxy / url.insteadOf plus *_proxy; the "" entry keeps the user's own proxy settings, "direct" forces none), so the user's global git config is no longer modified (this also removes the broken `git global --unset` call).
+- NEW (v7.38.21): DEPS URL rewrites live in one table (GIT_URL_REWRITES, URL prefix -> ordered mirror prefixes) instead of per-URL DEPS text patches; the mirrors join route selection for the DEPS prefetcher and gclient gets matching url.insteadOf rules, so Var()-built URLs are covered as well. The table ships empty (the old simdutf/zlib upstream rewrites are commented examples: upstream zlib has neither Chromium's pinned revisions nor its BUILD.gn), and a mirror only becomes a route for a pinned SHA it actually serves. Optional local bare mirrors (LOCAL_GIT_MIRROR_DIR, refreshed with --refresh-local-mirrors) are tried first whenever they already hold the pinned revision, without probing.
+- NEW (v7.38.22): DEPS is evaluated from its AST the way gclient does it (Var()/Str(), string concatenation, `{var}` placeholders, conditions over the DEPS vars and the host variables) into a dependency graph, replacing the regex DEPS patches. DEPS_PRUNE_MODE (`--deps-prune deny|allow|off`) removes the entries v8_monolith never reads (DEPS_PRUNE_DENY, or everything outside DEPS_PRUNE_ALLOW), along with the hooks running their scripts and their recursedeps lines; the rest of DEPS is left untouched. The repositories, CIPD packages, GCS objects and bytes left out are logged and recorded under "deps_pruning" in the run summary; `--deps-graph` prints the evaluated graph.
+- NEW (v7.38.23): One gclient sync per fresh build instead of two. The new bootstrap_v8 step fetches the V8 repository alone at V8_REF (git, over the best route and through the git cache mirror; no DEPS entries, no hooks), patch_deps prunes DEPS, and gclient_sync_deps then fetches only the dependencies that are left. The build files and vs_toolchain.py live in the build/ dependency, so patch_build_files and the vs_toolchain.py self-test now run after that sync. Replaces the gclient_sync_initial, checkout_v8_ref, patch_mingw and repatch_build_files steps.
+- NEW (v7.38.24): gclient sync runs with --nohooks and only the DEPS hooks matching GCLIENT_HOOK_ALLOWLIST run afterwards (`--gclient-hooks selected|all`), in DEPS order, each one timed; the hooks that ran and those skipped (not allowed, condition false) are logged and recorded under "gclient_hooks" in the run summary. The pre-sync vs_toolchain.py patch loop is gone: no hook runs it in "selected" mode, and "all" mode patches it once before each attempt.
 """
 import os
 import sys
@@ -91,49 +116,142 @@ import subprocess
 import shutil
 import time
 import datetime
+import threading # For the background log writer
+import queue # For the background log writer
+import atexit # For flushing the log writer on exit
+import collections # For bounded subprocess output tails
 import stat # For aggressive file removal
 import json # For vcpkg.json
 import re # For patching files
 import warnings # For filtering warnings
+import hashlib # For checkpoint fingerprints
+import functools # For caching toolchain version probes
+import argparse # For --from-step/--only-step
+import concurrent.futures # For the pipeline step scheduler
+import contextlib # For trace spans
+import bisect # For the GN span editor
+import gc # Paused while parsing GN files
+import signal # For the patch time budget
+import tempfile # For the end-to-end harness tree
+import urllib.parse # For git cache mirror names
+import random # For retry back-off jitter
+import ast # For evaluating DEPS
+import fnmatch # For DEPS pruning rules
+import platform # For the DEPS host variables
+import types # For patch spec digests
+import math # For the benchmark growth fit
 from pathlib import Path # ADDED: For robust path handling
 
 # ----------------------------
 # === CONFIGURABLE PATHS ===
 # ----------------------------
+SCRIPT_VERSION = "7.38.24" # Keep in sync with the docstring header
 V8_VERSION = "9.1.269.39" # V7.37.16
 V8_REF = "7d3d62c91f69a702e5aa54c6b4dbbaa883683717" # Correct ref for V8 9.1.269.39 tag
 V8_GIT_URL = "https://chromium.googlesource.com/v8/v8.git"
 V8_GITHUB_MIRROR_URL = "https://github.com/v8/v8.git" # Fallback mirror
+DEPOT_TOOLS_GIT_URL = "https://chromium.googlesource.com/chromium/tools/depot_tools.git"
 
 V8_ROOT = r"C:\v8-mingw" # V8 sources and build outputs root
 DEPOT_TOOLS = r"C:\depot_tools" # Where depot_tools is cloned
 MINGW_BIN = r"C:\Qt\Tools\mingw1310_64\bin" # MinGW compiler bin directory
 VCPKG_ROOT = r"C:\vcpkg" # vcpkg root directory
+GIT_CACHE_DIR = r"C:\cerebrumlux-git-cache" # Machine-wide git object cache shared by every V8_ROOT ("" disables it)
+LOCAL_GIT_MIRROR_DIR = "" # Bare mirrors (local disk or a LAN share) preferred over the network for V8 and every DEPS entry; filled by --refresh-local-mirrors ("" disables)
 
 V8_SRC = os.path.join(V8_ROOT, "v8") # Actual V8 source code directory (inside V8_ROOT)
 OUT_DIR = os.path.join(V8_SRC, "out.gn", "mingw") # GN build output directory
+CHECKPOINT_FILE = os.path.join(V8_ROOT, ".cerebrumlux-checkpoints.json") # Per-step input fingerprints of completed steps
+CHECKPOINT_FORMAT_VERSION = 1
+PATCH_CACHE_FILE = os.path.join(V8_ROOT, ".cerebrumlux-patch-cache.json") # Content hashes of files left patched by the patch engine
+PATCH_CACHE_FORMAT_VERSION = 1
+PATCH_SET_VERSION = 1 # Part of every spec set digest; bump it when a patch spec or a helper it calls changes behaviour in a way its code cannot show (data files, external tools)
+ROUTE_CACHE_FILE = os.path.join(V8_ROOT, ".cerebrumlux-routes.json") # Fastest git route (mirror + proxy) per host, see select_git_routes()
 
 # Log files are placed in a 'logs' subdirectory relative to where the script runs.
 # This ensures V8_ROOT can be safely deleted.
 LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
 LOG_FILE = os.path.join(LOG_DIR, f"CerebrumLux-V8-Build-{V8_VERSION}.log") # Dynamic log name
 ERR_FILE = os.path.join(LOG_DIR, f"CerebrumLux-V8-Build-{V8_VERSION}-error.log") # Dynamic error log name
+RUN_SUMMARY_FILE = os.path.join(LOG_DIR, f"CerebrumLux-V8-Build-{V8_VERSION}-summary.json") # Machine-readable run summary
+TRACE_FILE = os.path.join(LOG_DIR, f"CerebrumLux-V8-Build-{V8_VERSION}-trace.json") # Chrome trace_event timeline (chrome://tracing, Perfetto)
 
 # Vcpkg port klasörü (güncelleme için kullanılır)
 PORT_DIR = os.path.join(VCPKG_ROOT, "ports", "v8")
 
 
 MAX_GCLIENT_RETRIES = 5
-GCLIENT_RETRY_BACKOFF = [10, 20, 40, 80, 160]  # seconds
+GCLIENT_RETRY_BACKOFF = [10, 20, 40, 80, 160]  # seconds (each wait is jittered between half and all of it)
 GIT_RETRY = 3
+GIT_RETRY_BACKOFF = [5, 10, 20] # seconds between git fetch/clone attempts (jittered like GCLIENT_RETRY_BACKOFF)
+CIRCUIT_BREAKER_THRESHOLD = 3 # Consecutive transient failures after which a host (or proxy) is skipped
+CIRCUIT_BREAKER_COOLDOWN = 300 # Seconds a tripped host is skipped before it gets another try
+GIT_FETCH_MODE = "lean" # "lean": V8 at exactly V8_REF without history, branch heads or tags, blob-less depot_tools; "full": complete history
+GIT_CACHE_MAX_AGE_DAYS = 60 # With --prune-git-cache, mirrors no build fetched for this long are pruned at the end of the run
+GIT_CACHE_MAX_BYTES = 0 # With --prune-git-cache, least recently fetched mirrors are pruned while the cache is bigger than this (0 = no limit)
+GIT_CACHE_LOCK_TIMEOUT = 600 # Seconds to wait for another process populating the same mirror before cloning without it
+DEPS_FETCH_JOBS = os.cpu_count() or 4 # DEPS entries fetched concurrently, by the prefetcher and by gclient sync (--jobs)
+DEPS_PREFETCH = True # Fetch every git DEPS entry ourselves (per-entry retries and timing) before each gclient sync
+DEPS_FETCH_RETRIES = 3 # Attempts per DEPS entry; a failing entry is retried on its own, the others are not held up
+DEPS_FETCH_BACKOFF = [5, 15, 45] # seconds between attempts of one DEPS entry
+DEPS_PRUNE_MODE = "deny" # "deny": drop the DEPS entries matching DEPS_PRUNE_DENY; "allow": keep only those matching DEPS_PRUNE_ALLOW (the deny list still applies); "off": sync DEPS as it is
+# DEPS pruning rules: a checkout path (fnmatch pattern; the entries below it are covered too) or
+# "package:<pattern>", matching a CIPD entry by any of its package names.
+DEPS_PRUNE_DENY = [
+    "buildtools/win", "tools/win", "tools/clang", "third_party/llvm-build", "package:infra/tools/win*", # MSVC/clang-cl host toolchain
+    "test/benchmarks/data", "test/mozilla/data", "test/test262/data", "test/test262/harness", # Test suites' data
+    "third_party/google_benchmark", "third_party/google_benchmark_chrome", # Only behind v8_enable_google_benchmark
+    "tools/swarming_client", "tools/luci-go", "third_party/logdog", # Test infrastructure clients
+]
+DEPS_PRUNE_ALLOW = [ # Everything gn gen and v8_monolith read (build files, toolchain helpers and the sources compiled in)
+    "build", "buildtools", "base/trace_event/common", "third_party/depot_tools", "tools/protoc_wrapper",
+    "third_party/icu", "third_party/zlib", "third_party/abseil-cpp", "third_party/simdutf", "third_party/fp16", "third_party/fast_float",
+    "third_party/highway", "third_party/dragonbox", "third_party/jinja2", "third_party/markupsafe", "third_party/googletest",
+    "third_party/jsoncpp", "third_party/protobuf", "third_party/libc++", "third_party/libc++abi", "third_party/libunwind", "third_party/llvm-libc",
+]
+GCLIENT_HOOK_MODE = "selected" # "selected": gclient sync --nohooks, then only the DEPS hooks in GCLIENT_HOOK_ALLOWLIST run, each one timed; "all": gclient runs every hook
+GCLIENT_HOOK_ALLOWLIST = [ # DEPS hook names (fnmatch patterns) run in "selected" mode, in DEPS order
+    "lastchange", # build/util/LASTCHANGE(.committime), read by build/timestamp.gni during gn gen
+]
 SYNC_RETRY = 3
 NINJA_TARGET = "v8_monolith"
 
 # Proxy fallback list (HTTP proxies). Add any internal proxies or empty list to disable.
 PROXY_FALLBACKS = [
-    "",  # empty = try direct first
+    "",  # empty = the user's own proxy settings (environment, git config), untouched
+    # "direct",  # no proxy at all, even if the environment or git config names one
     # "http://172.21.129.18:3128",  # example local proxy; replace with real if you have.
 ]
+# URL prefix -> mirror prefixes, in preference order, for V8's DEPS entries (and anything else fetched).
+# The rest of the URL is appended to the mirror prefix. Mirrors take part in route selection (only for a
+# revision they serve), and gclient's own fetches go to the first mirror of each prefix, so a mirror must
+# be a true copy of its upstream: same commits, same files.
+GIT_URL_REWRITES = {
+    # "https://chromium.googlesource.com/": ["file://fileserver/git-mirrors/chromium.googlesource.com/"],  # example LAN mirror of a whole host
+    # Upstream projects are not copies of Chromium's forks (zlib lacks the pinned revisions and Chromium's BUILD.gn):
+    # "https://chromium.googlesource.com/chromium/src/third_party/simdutf": ["https://github.com/simdutf/simdutf.git"],
+    # "https://chromium.googlesource.com/chromium/src/third_party/zlib.git": ["https://github.com/madler/zlib.git"],
+}
+ROUTE_PROBE_TIMEOUT = 10 # Seconds a `git ls-remote` route probe may take before the route counts as down
+ROUTE_CACHE_TTL = 6 * 3600 # Seconds the fastest route of a host is reused without probing again
+
+# Log writer tuning. The queue is bounded so a chatty subprocess applies back-pressure instead of growing memory.
+LOG_QUEUE_MAXSIZE = 10000 # lines
+LOG_FLUSH_BYTES = 64 * 1024 # flush once this many bytes are buffered
+LOG_FLUSH_INTERVAL = 1.0 # seconds; flush at least this often while lines are pending
+RUN_TAIL_LINES = 200 # stdout/stderr lines kept in memory per command for error reporting and GN error matching
+PIPELINE_MAX_WORKERS = 4 # Max pipeline steps running concurrently (1 = strictly sequential, declaration order)
+GIT_CMDLINE_MAX_CHARS = 8000 # Max characters of path arguments per batched git command
+PATCH_MAX_WORKERS = 4 # Source files patched concurrently by _patch_build_files() (1 = one after another)
+PATCH_SPEC_TIME_BUDGET = 10.0 # Seconds one patch spec may take on one file before that file's patch is aborted (0 = no budget)
+SLOWEST_COMMANDS_REPORTED = 10 # Number of slowest subprocesses listed at exit
+BENCHMARK_BASELINE_FILE = os.path.join(LOG_DIR, "CerebrumLux-transform-benchmarks.json") # Baseline timings for --benchmark
+BENCHMARK_SIZES = (250, 500, 1000, 2000) # Input sizes (repeated units) per benchmark case; each one doubles the previous
+BENCHMARK_REPEATS = 5 # Best-of-N timing per size
+BENCHMARK_SUPERLINEAR_RATIO = 3.0 # Fail when doubling the input multiplies the time by more than this (linear = 2), fitted across all sizes
+BENCHMARK_REGRESSION_FACTOR = 1.5 # Fail when the largest input is this many times slower than the baseline
+BENCHMARK_MIN_SECONDS = 0.005 # Timings below this are too noisy for growth and regression checks
+HARNESS_REPORT_FILE = os.path.join(LOG_DIR, "CerebrumLux-harness-report.json") # Report of the last --harness run
 
 # -------------------------------------------------------------------
 # Global Dummy Toolchain Paths (for MinGW compatibility)
@@ -179,16 +297,24 @@ def _filter_gn_comments(content: str) -> str:
     Filters GN file content to replace C-style comments (/* ... */) with #-style comments
     and ensure only # is used for line comments.
     """
-    # Remove block comments /* ... */
-    # This regex is made non-greedy (`*?`) to handle multiple block comments on one line correctly.
-    content = re.sub(r"/\*[\s\S]*?\*/", "", content)
+    # Remove block comments /* ... */, each up to the first */ after it. Scanned with str.find rather than
+    # a lazy /\*[\s\S]*?\*/ regex, which rescans the rest of the file from every unterminated /*.
+    parts, pos = [], 0
+    while True:
+        start = content.find("/*", pos)
+        end = content.find("*/", start + 2) if start >= 0 else -1
+        if end < 0:
+            break
+        parts.append(content[pos:start])
+        pos = end + 2
+    content = "".join(parts) + content[pos:]
     
     # Replace `//` line comments with `#`.
     # Ensure it only targets actual `//` comments, not paths like `//build`.
     # This pattern matches `//` only if it's at the start of a line (after optional whitespace)
     # or preceded by whitespace within a line, and not part of a URL or path.
     # FIX (v7.37.18): Refined to avoid incorrect replacements in URLs/paths by looking for a preceding non-colon character.
-    content = re.sub(r"(?m)^(\s*)//(?=\s*[^/])", r"\1#", content) # Match // not followed by / at start of line
+    content = re.sub(r"(?m)^([ \t]*)//(?=\s*[^/])", r"\1#", content) # Match // not followed by / at start of line
     content = re.sub(r"(?m)([^:])//(?=\s*[^/])", r"\1#", content) # Match // not preceded by :, not followed by / within line
     
     return content
@@ -200,27 +326,267 @@ def _filter_gn_comments(content: str) -> str:
 def timestamp():
     return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
 
-def log(level, msg, to_console=True):
-    line = f"[{timestamp()}] [{level}] {msg}"
-    os.makedirs(LOG_DIR, exist_ok=True) # Ensure log directory exists
-    try:
-        # Use a new 'with open' block for each write to prevent 'I/O operation on closed file'
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(line + "\n")
-    except Exception as e:
-        # Fallback print if cannot write to file, but don't stop execution
-        if to_console:
-            print(f"ERROR: Could not write to main log file: {e} - {line}")
-
-    if level in ("ERROR", "FATAL"):
+class _LogWriter(threading.Thread):
+    """
+    Single background writer for LOG_FILE and ERR_FILE.
+    Keeps the files open, drains lines from a bounded queue and flushes when
+    LOG_FLUSH_BYTES are pending, when LOG_FLUSH_INTERVAL has elapsed, or on request.
+    """
+    def __init__(self):
+        super().__init__(name="CerebrumLux-LogWriter", daemon=True)
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_MAXSIZE)
+        self._files = {} # path -> open file object
+        self._pending_bytes = 0
+        self._last_flush = time.monotonic()
+
+    def _file_for(self, path):
+        # Paths are resolved at write time so a changed LOG_FILE/ERR_FILE simply opens a new file.
+        f = self._files.get(path)
+        if f is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = open(path, "a", encoding="utf-8")
+            self._files[path] = f
+        return f
+
+    def _write(self, line, is_error, to_console):
         try:
-            with open(ERR_FILE, "a", encoding="utf-8") as ef:
-                ef.write(line + "\n") # Corrected: use 'ef' for error file
+            self._file_for(LOG_FILE).write(line + "\n")
         except Exception as e:
+            # Fallback print if cannot write to file, but don't stop execution
             if to_console:
-                print(f"ERROR: Could not write to error log file: {e} - {line}")
+                print(f"ERROR: Could not write to main log file: {e} - {line}")
+        if is_error:
+            try:
+                self._file_for(ERR_FILE).write(line + "\n")
+            except Exception as e:
+                if to_console:
+                    print(f"ERROR: Could not write to error log file: {e} - {line}")
+        self._pending_bytes += len(line) + 1
+
+    def _flush(self):
+        for f in self._files.values():
+            try:
+                f.flush()
+            except Exception:
+                pass
+        self._pending_bytes = 0
+        self._last_flush = time.monotonic()
+
+    def _close_files(self):
+        self._flush()
+        for f in self._files.values():
+            try:
+                f.close()
+            except Exception:
+                pass
+        self._files = {}
+
+    def run(self):
+        while True:
+            # Only wake up on a timer while there is something buffered to flush.
+            timeout = None
+            if self._pending_bytes:
+                timeout = max(0.0, LOG_FLUSH_INTERVAL - (time.monotonic() - self._last_flush))
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush()
+                continue
+
+            kind = item[0]
+            if kind == "line":
+                _, line, is_error, to_console = item
+                self._write(line, is_error, to_console)
+                if self._pending_bytes >= LOG_FLUSH_BYTES or time.monotonic() - self._last_flush >= LOG_FLUSH_INTERVAL:
+                    self._flush()
+            elif kind == "flush":
+                self._flush()
+                item[1].set()
+            elif kind == "close":
+                self._close_files()
+                item[1].set()
+                return
+
+_log_writer = None
+_log_writer_lock = threading.Lock()
+
+def _get_log_writer():
+    """Returns the running log writer, starting it on first use."""
+    global _log_writer
+    writer = _log_writer
+    if writer is None or not writer.is_alive():
+        with _log_writer_lock:
+            if _log_writer is None or not _log_writer.is_alive():
+                _log_writer = _LogWriter()
+                _log_writer.start()
+            writer = _log_writer
+    return writer
+
+def flush_log(timeout=10.0):
+    """Blocks until every line logged so far has been written and flushed to disk."""
+    writer = _log_writer
+    if writer is None or not writer.is_alive():
+        return
+    done = threading.Event()
+    writer.queue.put(("flush", done))
+    done.wait(timeout)
+
+def close_log(timeout=10.0):
+    """Flushes and closes the log files. A later log() call transparently starts a new writer."""
+    global _log_writer
+    with _log_writer_lock:
+        writer = _log_writer
+        _log_writer = None
+    if writer is None or not writer.is_alive():
+        return
+    done = threading.Event()
+    writer.queue.put(("close", done))
+    done.wait(timeout)
+
+atexit.register(close_log)
+
+# Per-run log statistics, maintained incrementally by log() so the end-of-run summary never has to re-read LOG_FILE.
+_log_stats_lock = threading.Lock()
+_log_stats = {
+    "counts": collections.Counter(), # level -> number of log() calls
+    "lines": 0, # physical lines written to LOG_FILE during this run
+    "first_error": None, # {"line", "level", "timestamp", "message"} of the first ERROR/FATAL
+    "last_error": None, # same for the most recent ERROR/FATAL
+}
+_run_summary_extra = {} # Additional sections contributed by other subsystems via record_run_summary()
+
+# ----------------------------
+# === Timing spans (Chrome trace_event export) ===
+# ----------------------------
+_trace_lock = threading.Lock()
+_trace_events = [] # Complete ("X") and instant ("i") trace events, timestamps in microseconds since _trace_origin
+_trace_origin = time.perf_counter()
+_trace_local = threading.local() # Per-thread open STEP stage: (name, start)
+
+def record_span(name, category, start, end, args=None):
+    """Records a completed span. `start`/`end` are time.perf_counter() values."""
+    event = {
+        "name": name, "cat": category, "ph": "X",
+        "ts": round((start - _trace_origin) * 1e6, 1),
+        "dur": round((end - start) * 1e6, 1),
+        "pid": os.getpid(), "tid": threading.get_ident(),
+        "args": args or {},
+    }
+    with _trace_lock:
+        _trace_events.append(event)
+
+@contextlib.contextmanager
+def trace_span(name, category, **args):
+    """Times the enclosed block as a span; the yielded dict can be filled with extra args (e.g. exit code)."""
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        record_span(name, category, start, time.perf_counter(), args)
+
+def _end_stage_span():
+    """Closes the STEP stage currently open on this thread, if any."""
+    stage = getattr(_trace_local, "stage", None)
+    if stage is not None:
+        _trace_local.stage = None
+        record_span(stage[0], "stage", stage[1], time.perf_counter())
+
+def _begin_stage_span(title):
+    """A log("STEP", ...) starts a stage that lasts until the next STEP on the same thread or the end of its pipeline step."""
+    _end_stage_span()
+    _trace_local.stage = (str(title), time.perf_counter())
+
+def subprocess_spans() -> list:
+    with _trace_lock:
+        return [e for e in _trace_events if e["cat"] == "subprocess"]
+
+def write_trace():
+    """Writes all recorded spans to TRACE_FILE in Chrome trace_event JSON format."""
+    _end_stage_span()
+    with _trace_lock:
+        events = list(_trace_events)
+    metadata = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": f"CerebrumLux V8 Build v{SCRIPT_VERSION}"}}]
+    for thread in threading.enumerate():
+        metadata.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": thread.ident, "args": {"name": thread.name}})
+    try:
+        os.makedirs(os.path.dirname(TRACE_FILE), exist_ok=True)
+        with open(TRACE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+    except Exception as e:
+        log("WARN", f"Could not write trace file {TRACE_FILE}: {e}", to_console=True)
+
+def report_slowest_commands(limit=None):
+    """Logs the slowest subprocesses of this run and returns them for the run summary."""
+    limit = SLOWEST_COMMANDS_REPORTED if limit is None else limit
+    spans = sorted(subprocess_spans(), key=lambda e: e["dur"], reverse=True)[:limit]
+    slowest = []
+    for e in spans:
+        entry = {"command": e["args"].get("command"), "cwd": e["args"].get("cwd"), "exit_code": e["args"].get("exit_code"),
+                 "wall_seconds": round(e["dur"] / 1e6, 3), "cpu": e["args"].get("cpu")}
+        slowest.append(entry)
+        cpu = entry["cpu"]
+        cpu_text = f", cpu user {cpu['user']:.2f}s sys {cpu['sys']:.2f}s" if cpu else ""
+        log("INFO", f"  {entry['wall_seconds']:>9.2f}s  (exit {entry['exit_code']}{cpu_text})  {entry['command'][:200]}", to_console=True)
+    return slowest
+
+def log(level, msg, to_console=True):
+    ts = timestamp()
+    if level == "STEP":
+        _begin_stage_span(msg)
+    line = f"[{ts}] [{level}] {msg}"
+    is_error = level in ("ERROR", "FATAL")
+    with _log_stats_lock:
+        # Numbering and enqueueing happen under one lock so the recorded line numbers match the file order.
+        first_line = _log_stats["lines"] + 1
+        _log_stats["lines"] += line.count("\n") + 1
+        _log_stats["counts"][level] += 1
+        if is_error:
+            location = {"line": first_line, "level": level, "timestamp": ts, "message": str(msg)[:500]}
+            if _log_stats["first_error"] is None:
+                _log_stats["first_error"] = location
+            _log_stats["last_error"] = location
+        # Blocks when the queue is full, which throttles the producer instead of buffering unboundedly.
+        _get_log_writer().queue.put(("line", line, is_error, to_console))
     if to_console:
-        print(line)
+        print(line + "\n", end="") # One write per line so concurrent steps/patch jobs do not interleave mid-line
+    if level == "FATAL":
+        flush_log() # Make sure the reason for an abort is on disk before sys.exit()
+
+def log_counts():
+    """Returns a snapshot of the per-level log counters for this run."""
+    with _log_stats_lock:
+        return collections.Counter(_log_stats["counts"])
+
+def record_run_summary(key, value):
+    """Adds a named section to the JSON run summary written at the end of main()."""
+    with _log_stats_lock:
+        _run_summary_extra[key] = value
+
+def write_run_summary(status, duration):
+    """Writes RUN_SUMMARY_FILE from the incremental log statistics. Returns the summary dict."""
+    with _log_stats_lock:
+        summary = {
+            "script_version": SCRIPT_VERSION,
+            "v8_version": V8_VERSION,
+            "v8_ref": V8_REF,
+            "status": status,
+            "duration_seconds": round(duration, 3),
+            "finished_at": timestamp(),
+            "log_file": LOG_FILE,
+            "error_file": ERR_FILE,
+            "log_lines": _log_stats["lines"],
+            "counts": dict(_log_stats["counts"]),
+            "first_error": _log_stats["first_error"],
+            "last_error": _log_stats["last_error"],
+        }
+        summary.update(_run_summary_extra)
+    try:
+        os.makedirs(os.path.dirname(RUN_SUMMARY_FILE), exist_ok=True)
+        with open(RUN_SUMMARY_FILE, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, default=str)
+    except Exception as e:
+        log("WARN", f"Could not write run summary to {RUN_SUMMARY_FILE}: {e}", to_console=True)
+    return summary
 
 def onerror(func, path, exc_info):
     """
@@ -273,31 +639,84 @@ def aggressive_rmtree(path):
 
     raise OSError(f"Failed to aggressively remove directory after multiple attempts: {path}")
 
-def run(cmd_list, cwd=None, env=None, check=True, capture_output=True):
+def _pump_stream(stream, label, tail):
+    """Logs every line of a subprocess pipe as it arrives and keeps only the last lines in `tail`."""
+    try:
+        for raw_line in stream:
+            line = raw_line.rstrip("\r\n")
+            tail.append(line)
+            log("DEBUG", f"{label}: {line}", to_console=False)
+    finally:
+        stream.close()
+
+def _wait_with_cpu_times(proc):
+    """
+    Waits for `proc` and returns (returncode, cpu) where cpu is {"user", "sys"} seconds of the child
+    (plus "max_rss_kb" on POSIX), or None where the OS does not report it.
+    """
+    if hasattr(os, "wait4"):
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status) # Mark as reaped so Popen does not wait again
+            return proc.returncode, {"user": usage.ru_utime, "sys": usage.ru_stime, "max_rss_kb": usage.ru_maxrss}
+        except ChildProcessError:
+            return proc.wait(), None
+    returncode = proc.wait()
+    if os.name == "nt":
+        try:
+            import ctypes
+            from ctypes import wintypes
+            creation, exit_, kernel, user = (wintypes.FILETIME() for _ in range(4))
+            if ctypes.windll.kernel32.GetProcessTimes(wintypes.HANDLE(int(proc._handle)), ctypes.byref(creation),
+                                                       ctypes.byref(exit_), ctypes.byref(kernel), ctypes.byref(user)):
+                to_seconds = lambda ft: ((ft.dwHighDateTime << 32) | ft.dwLowDateTime) / 1e7 # 100 ns units
+                return returncode, {"user": to_seconds(user), "sys": to_seconds(kernel)}
+        except Exception:
+            pass
+    return returncode, None
+
+def run(cmd_list, cwd=None, env=None, check=True, capture_output=True, tail_lines=None):
     """
     Run a shell command. Returns subprocess.CompletedProcess or raises.
     `cmd_list` should be a list of arguments for shell=False.
-    Captures stdout/stderr as DEBUG logs if capture_output is True.
+    If capture_output is True, stdout/stderr are streamed line-by-line into the log as DEBUG
+    while the process runs; only the last `tail_lines` (default RUN_TAIL_LINES) lines of each
+    stream are kept and returned as cp.stdout / cp.stderr.
     """
     # FIX: Corrected cmd_str initialization for robustness
     cmd_str = ' '.join(cmd_list) if isinstance(cmd_list, list) else str(cmd_list)
     log("INFO", f"RUN: {cmd_str} (CWD: {cwd or os.getcwd()})", to_console=False)
+    tail_lines = RUN_TAIL_LINES if tail_lines is None else tail_lines
+    stdout_tail = collections.deque(maxlen=tail_lines)
+    stderr_tail = collections.deque(maxlen=tail_lines)
+    proc = None
+    span_start = time.perf_counter()
+    span_args = {"command": cmd_str, "cwd": str(cwd or os.getcwd()), "exit_code": None, "cpu": None}
     try:
-        cp = subprocess.run(cmd_list, cwd=cwd, env=env, shell=False, # shell=False for list of commands
-                            check=check, text=True, capture_output=capture_output,
-                            encoding='utf-8', errors='replace') # errors='replace' for problematic output
         if capture_output:
-            # DEBUG logs for stdout/stderr to avoid overwhelming console/INFO log
-            if cp.stdout:
-                log("DEBUG", f"STDOUT:\n{cp.stdout}", to_console=False)
-            if cp.stderr:
-                log("DEBUG", f"STDERR:\n{cp.stderr}", to_console=False)
-        return cp
+            proc = subprocess.Popen(cmd_list, cwd=cwd, env=env, shell=False, # shell=False for list of commands
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                    encoding='utf-8', errors='replace') # errors='replace' for problematic output
+            # stderr gets its own reader thread so neither pipe can fill up and block the child.
+            stderr_reader = threading.Thread(target=_pump_stream, args=(proc.stderr, "STDERR", stderr_tail), daemon=True)
+            stderr_reader.start()
+            _pump_stream(proc.stdout, "STDOUT", stdout_tail)
+            stderr_reader.join()
+        else:
+            proc = subprocess.Popen(cmd_list, cwd=cwd, env=env, shell=False)
+        returncode, span_args["cpu"] = _wait_with_cpu_times(proc)
+        span_args["exit_code"] = returncode
+
+        stdout_text = "\n".join(stdout_tail) if capture_output else None
+        stderr_text = "\n".join(stderr_tail) if capture_output else None
+        if check and returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd_list, output=stdout_text, stderr=stderr_text)
+        return subprocess.CompletedProcess(cmd_list, returncode, stdout=stdout_text, stderr=stderr_text)
     except subprocess.CalledProcessError as e:
         log("ERROR", f"Command failed (code {e.returncode}): {cmd_str}")
         if capture_output:
-            log("ERROR", f"Stdout: {e.stdout}", to_console=False)
-            log("ERROR", f"Stderr: {e.stderr}", to_console=False)
+            log("ERROR", f"Stdout (last {tail_lines} lines): {e.stdout}", to_console=False)
+            log("ERROR", f"Stderr (last {tail_lines} lines): {e.stderr}", to_console=False)
         raise
     except FileNotFoundError as e:
         log("FATAL", f"Command not found: {cmd_list[0] if isinstance(cmd_list, list) else cmd_list.split(' ')[0]}. Ensure it's in PATH. Error: {e}")
@@ -305,6 +724,156 @@ def run(cmd_list, cwd=None, env=None, check=True, capture_output=True):
     except Exception as e:
         log("FATAL", f"An unexpected error occurred while running command: {e}")
         raise
+    finally:
+        # Never leave an orphaned child behind (e.g. KeyboardInterrupt while streaming).
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        program = cmd_list[0] if isinstance(cmd_list, list) else cmd_str.split(' ')[0]
+        record_span(os.path.basename(str(program)), "subprocess", span_start, time.perf_counter(), span_args)
+
+# ----------------------------
+# === Retry policy ===
+# ----------------------------
+# Retry loops ask classify_failure() whether another attempt can help. Transient failures (network, an
+# overloaded remote) are retried after retry_delay(), the loop's back-off schedule with jitter, so parallel
+# fetches and concurrent builds do not hit a recovering host in lockstep. Permanent failures (a ref or
+# repository that does not exist, a Python error in a patched script) are raised at once. Failures that
+# match no signature are retried as before. Transient failures also count against the circuit breaker of
+# the host that was contacted: after CIRCUIT_BREAKER_THRESHOLD in a row the host is skipped for
+# CIRCUIT_BREAKER_COOLDOWN seconds (CircuitOpenError), so callers move on to their next proxy or mirror
+# right away instead of spending their remaining retries on it.
+_PERMANENT_FAILURE_SIGNATURES = re.compile("|".join([
+    r"couldn't find remote ref", r"not our ref", r"invalid reference", r"unknown revision", r"bad revision",
+    r"not a valid object name", r"did not match any file\(s\) known to git", r"repository '[^'\n]*' not found",
+    r"Repository not found", r"Authentication failed", r"could not read Username", r"Permission denied \(publickey",
+    r"The requested URL returned error: 40[0134]", r"HTTP (?:Error )?40[0134]\b", r"not a git repository",
+    r"SyntaxError", r"IndentationError", r"NameError", r"ModuleNotFoundError", r"ImportError",
+]), re.IGNORECASE)
+_TRANSIENT_FAILURE_SIGNATURES = re.compile("|".join([
+    r"Could not resolve host", r"Temporary failure in name resolution", r"Name or service not known",
+    r"timed out", r"Connection reset", r"Connection refused",
+    r"Failed to connect", r"Couldn't connect to server", r"unable to access", r"early EOF", r"RPC failed",
+    r"remote end hung up unexpectedly", r"unexpected disconnect", r"index-pack failed", r"transfer closed",
+    r"gnutls_handshake", r"SSL_ERROR", r"SSL_read", r"schannel", r"TLS (?:handshake|connection)",
+    r"The requested URL returned error: (?:408|429|5\d\d)", r"HTTP (?:Error )?(?:408|429|5\d\d)\b",
+    r"Service Unavailable", r"Bad Gateway", r"Gateway Time-?out", r"Too Many Requests",
+    r"ConnectionResetError", r"ConnectionError", r"URLError", r"socket\.timeout",
+]), re.IGNORECASE)
+_retry_lock = threading.Lock()
+_retry_stats = {"transient": 0, "permanent": 0, "unknown": 0, "short_circuited": 0}
+_circuit_breakers = {} # host -> {"failures": consecutive transient failures, "open_until": monotonic time, "trips": n}
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of contacting a host whose circuit breaker is open."""
+
+def classify_failure(error) -> tuple:
+    """("transient" | "permanent" | "unknown", reason) for an exception raised by run() or another retried call."""
+    if isinstance(error, CircuitOpenError):
+        return "transient", str(error)
+    if isinstance(error, FileNotFoundError):
+        return "permanent", f"command not found: {error}"
+    if isinstance(error, (subprocess.TimeoutExpired, TimeoutError, ConnectionError)):
+        return "transient", type(error).__name__
+    text = ""
+    if isinstance(error, subprocess.CalledProcessError):
+        text = "\n".join(part for part in (error.stderr, error.output) if isinstance(part, str))
+    text = text or str(error)
+    # Permanent signatures win: a traceback of a broken script may mention a connection further up.
+    for kind, signatures in (("permanent", _PERMANENT_FAILURE_SIGNATURES), ("transient", _TRANSIENT_FAILURE_SIGNATURES)):
+        match = signatures.search(text)
+        if match:
+            return kind, match.group(0)
+    return "unknown", f"exit code {error.returncode}" if isinstance(error, subprocess.CalledProcessError) else type(error).__name__
+
+def retry_delay(schedule: list, attempt: int) -> float:
+    """Seconds to wait after failed attempt `attempt` (1-based): the schedule's entry with equal jitter (between half and all of it)."""
+    base = schedule[min(attempt - 1, len(schedule) - 1)]
+    return base / 2 + random.uniform(0, base / 2)
+
+def failure_host(url: str, proxy: str = None) -> str:
+    """The host a fetch of `url` actually talks to, for the circuit breaker: the proxy if one is set, else the URL's host."""
+    target = proxy if proxy and proxy != "direct" else url
+    if target.startswith("file:") or os.path.isabs(target):
+        return target # Local repositories fail independently of each other
+    parsed = urllib.parse.urlparse(target if "://" in target else "//" + target) # scp-like git@host:path too
+    return (parsed.hostname or "local").lower()
+
+def _circuit_open(host: str) -> bool:
+    with _retry_lock:
+        breaker = _circuit_breakers.get(host)
+        return bool(breaker) and breaker["open_until"] > time.monotonic()
+
+def circuit_check(host: str):
+    """Raises CircuitOpenError while `host` is tripped; once the cooldown is over one more attempt is let through."""
+    with _retry_lock:
+        breaker = _circuit_breakers.get(host)
+        remaining = breaker["open_until"] - time.monotonic() if breaker else 0
+        if remaining > 0:
+            _retry_stats["short_circuited"] += 1
+    if remaining > 0:
+        raise CircuitOpenError(f"{host} is skipped for another {remaining:.0f}s after {breaker['failures']} consecutive transient failures")
+
+def note_failure(error, host: str = None) -> tuple:
+    """Classifies `error`, counts it and, if it is transient, charges it to `host`'s circuit breaker. Returns classify_failure(error)."""
+    kind, reason = classify_failure(error)
+    if isinstance(error, CircuitOpenError):
+        return kind, reason
+    with _retry_lock:
+        _retry_stats[kind] += 1
+        if host is None or kind != "transient":
+            return kind, reason
+        breaker = _circuit_breakers.setdefault(host, {"failures": 0, "open_until": 0.0, "trips": 0})
+        breaker["failures"] += 1
+        tripped = breaker["failures"] >= CIRCUIT_BREAKER_THRESHOLD
+        if tripped: # Also re-opens at once when the one attempt after a cooldown fails
+            breaker["open_until"] = time.monotonic() + CIRCUIT_BREAKER_COOLDOWN
+            breaker["trips"] += 1
+    if tripped:
+        log("WARN", f"Circuit breaker for {host} tripped after {breaker['failures']} consecutive transient failures ({reason}); "
+                    f"skipping it for {CIRCUIT_BREAKER_COOLDOWN}s.", to_console=True)
+    return kind, reason
+
+def note_success(host: str):
+    """Closes `host`'s circuit breaker again."""
+    with _retry_lock:
+        if host in _circuit_breakers:
+            _circuit_breakers[host].update(failures=0, open_until=0.0)
+
+def retry_call(fn, what: str, attempts: int, schedule: list, host: str = None, report: dict = None):
+    """
+    Returns fn(), calling it up to `attempts` times with retry_delay(schedule, n) between attempts. A permanent
+    failure ends the loop at once, as does an open circuit breaker for `host` (CircuitOpenError); the last
+    error is raised. `report`, if given, gets the number of attempts made.
+    """
+    for attempt in range(1, attempts + 1):
+        if report is not None:
+            report["attempts"] = attempt
+        if host:
+            circuit_check(host)
+        try:
+            result = fn()
+        except Exception as e:
+            kind, reason = note_failure(e, host)
+            if kind == "permanent":
+                log("WARN", f"{what} failed permanently ({reason}); not retrying.", to_console=True)
+                raise
+            if attempt >= attempts or (host and _circuit_open(host)):
+                raise # A host that just tripped is not waited for; the caller moves on to its next route
+            delay = retry_delay(schedule, attempt)
+            log("WARN", f"{what} failed (attempt {attempt}/{attempts}, {kind}: {reason}). Retrying in {delay:.1f}s.", to_console=True)
+            time.sleep(delay)
+        else:
+            if host:
+                note_success(host)
+            return result
+
+def retry_report() -> dict:
+    """Failure classes seen by the retry loops and the circuit breakers that tripped, for the run summary."""
+    with _retry_lock:
+        return {"failures": dict(_retry_stats),
+                "circuit_breakers": {host: {"trips": breaker["trips"], "open": breaker["open_until"] > time.monotonic()}
+                                     for host, breaker in _circuit_breakers.items() if breaker["trips"]}}
 
 # ----------------------------
 # === Environment prep ===
@@ -339,900 +908,2014 @@ def prepare_subprocess_env():
 # ----------------------------
 # === Git helpers (with retries + proxy fallback) ===
 # ----------------------------
-def git_configure_proxy(env, proxy_url):
-    """Configures Git's global HTTP/S proxy settings."""
-    if proxy_url:
-        log("INFO", f"Setting Git proxy to: {proxy_url}", to_console=False)
-        run(['git', 'config', '--global', 'http.proxy', proxy_url], env=env, check=False, capture_output=False)
-        run(['git', 'config', '--global', 'https.proxy', proxy_url], env=env, check=False, capture_output=False)
-    else:
-        log("INFO", "Unsetting Git proxy.", to_console=False)
-        run(['git', 'config', '--global', '--unset', 'http.proxy'], env=env, check=False, capture_output=False)
-        run(['git', 'global', '--unset', 'https.proxy'], env=env, check=False, capture_output=False)
+def _git_blob_hash(path: Path, algorithm: str = "sha1") -> str:
+    """Object id git would give `path`'s current bytes (no clean filters / autocrlf applied)."""
+    data = path.read_bytes()
+    h = hashlib.new(algorithm)
+    h.update(b"blob %d\0" % len(data))
+    h.update(data)
+    return h.hexdigest()
+
+def _chunk_args(args: list, max_chars: int = GIT_CMDLINE_MAX_CHARS):
+    """Splits `args` into chunks whose joined length stays under `max_chars` (Windows caps command lines at 32767)."""
+    chunk, size = [], 0
+    for arg in args:
+        if chunk and size + len(arg) + 1 > max_chars:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(arg)
+        size += len(arg) + 1
+    if chunk:
+        yield chunk
+
+class GitStagingBatch:
+    """
+    Collects paths touched during one phase and stages them with a single `git add -- <paths...>`
+    (chunked for command-line limits) instead of one git process per file. Paths whose working-tree
+    content already matches the index are left alone. add() is thread-safe.
+    """
+    def __init__(self, repo_dir, env):
+        self.repo_dir = str(repo_dir)
+        self.env = env
+        self._paths = []
+        self._lock = threading.Lock()
+
+    def add(self, path):
+        with self._lock:
+            if str(path) not in self._paths:
+                self._paths.append(str(path))
+
+    def _index_entries(self, rel_paths) -> dict:
+        """rel path -> object id from `git ls-files -s`."""
+        entries = {}
+        for chunk in _chunk_args(rel_paths):
+            cp = run(["git", "ls-files", "-s", "--"] + chunk, cwd=self.repo_dir, env=self.env, check=False)
+            if cp.returncode != 0:
+                return {}
+            for line in (cp.stdout or "").splitlines():
+                meta, _, name = line.partition("\t")
+                fields = meta.split()
+                if len(fields) == 3:
+                    entries[name] = fields[1]
+        return entries
+
+    def flush(self) -> bool:
+        """Stages everything collected so far. Returns False if a `git add` failed."""
+        with self._lock:
+            paths, self._paths = self._paths, []
+        if not paths:
+            return True
+        rel_paths = []
+        for p in paths:
+            try:
+                rel_paths.append(Path(p).resolve().relative_to(Path(self.repo_dir).resolve()).as_posix())
+            except ValueError:
+                rel_paths.append(p)
+        index = self._index_entries(rel_paths)
+        pending = []
+        for rel_path in rel_paths:
+            object_id = index.get(rel_path)
+            try:
+                if object_id and _git_blob_hash(Path(self.repo_dir) / rel_path, "sha256" if len(object_id) == 64 else "sha1") == object_id:
+                    continue
+            except OSError:
+                pass
+            pending.append(rel_path)
+        skipped = len(rel_paths) - len(pending)
+        ok = True
+        for chunk in _chunk_args(pending):
+            ok = run(["git", "add", "--"] + chunk, cwd=self.repo_dir, env=self.env, check=False).returncode == 0 and ok
+        log("INFO", f"Staged {len(pending)} file(s) in '{self.repo_dir}' with 'git add' ({skipped} already matched the index).", to_console=True)
+        return ok
+
+def _is_commit_sha(ref) -> bool:
+    """True for a full SHA-1/SHA-256 commit id. Branches and tags can move; these cannot, so a local copy is final."""
+    return re.fullmatch(r"[0-9a-fA-F]{40}|[0-9a-fA-F]{64}", ref or "") is not None
+
+def _git_is_shallow(env, repo_dir) -> bool:
+    """True when `repo_dir` has a shallow history (a lean-mode fetch made it, or it was cloned with --depth)."""
+    result = run(['git', 'rev-parse', '--is-shallow-repository'], cwd=repo_dir, env=env, capture_output=True, check=False)
+    return result.returncode == 0 and result.stdout.strip() == "true"
+
+def git_fetch_and_reset(env, repo_dir, ref, remote="origin", fresh=False):
+    """
+    Makes `repo_dir` a clean detached checkout of `ref`. A commit SHA that is already present is not
+    fetched at all, so resuming on an up-to-date checkout is two local git commands; anything else is
+    fetched by itself (no other refs, no tags) and checked out from FETCH_HEAD. In lean mode the fetch is
+    depth 1 only when the repository is new (`fresh`, just git-init'ed) or already shallow, so a full or
+    blob-less checkout never becomes shallow.
+    """
+    def fetch_and_reset():
+        target = ref
+        if not _is_commit_sha(ref) or run(['git', 'cat-file', '-e', f'{ref}^{{commit}}'], cwd=repo_dir, env=env, check=False).returncode != 0:
+            shallow = GIT_FETCH_MODE == "lean" and (fresh or _git_is_shallow(env, repo_dir))
+            run(['git', 'fetch', '--no-tags', '--no-recurse-submodules'] + (['--depth=1'] if shallow else []) + [remote, ref],
+                cwd=repo_dir, env=env, capture_output=True)
+            target = 'FETCH_HEAD'
+        # One command for what used to be checkout + reset --hard: local changes are discarded, untracked files kept.
+        run(['git', 'switch', '--detach', '--discard-changes', '--quiet', target], cwd=repo_dir, env=env, capture_output=True)
+
+    log("INFO", f"Git fetch/reset of {repo_dir} @ {ref}.")
+    retry_call(fetch_and_reset, f"git fetch/reset of {repo_dir} @ {ref}", GIT_RETRY, GIT_RETRY_BACKOFF)
+    log("INFO", f"Checked out {ref} in {repo_dir}.")
+
+def _git_clone_fetch_flags() -> list:
+    # Lean clones get every commit and tree but only the blobs of the checked-out revision; the rest
+    # is fetched on demand, which depot_tools' own `git pull` based updates never need.
+    return ['--filter=blob:none'] if GIT_FETCH_MODE == "lean" else []
 
-def git_fetch_and_reset(env, repo_dir, ref, remote="origin"):
-    """Performs a git fetch, checkout, and hard reset for a given repository and ref."""
-    for attempt in range(1, GIT_RETRY + 1):
+# ----------------------------
+# === Git routes ===
+# ----------------------------
+# A route is a URL serving a repository (the canonical one or a mirror from git_url_mirrors()) plus a proxy
+# from PROXY_FALLBACKS ("" = the user's own settings, "direct" = none). select_git_routes() probes all of them at once with `git ls-remote`
+# (ROUTE_PROBE_TIMEOUT each), ranks them by latency and remembers the winning kind of route per host in
+# ROUTE_CACHE_FILE for ROUTE_CACHE_TTL, so later runs, and other repositories on that host, start on it
+# without probing. Local mirrors (LOCAL_GIT_MIRROR_DIR, see refresh_local_mirrors()) are not probed: one
+# that exists, and has the wanted revision, always goes first. A route is applied to one process tree
+# through its environment (route_env()): the proxy as http.proxy in per-process git config (GIT_CONFIG_COUNT)
+# and in the *_proxy variables, a mirror as `url.<mirror>.insteadOf <canonical>`. The user's global git
+# config is never written, and checkouts and .gclient keep the canonical URL.
+_route_lock = threading.Lock()
+_route_probe_locks = collections.defaultdict(threading.Lock) # One probe round per host at a time; the others reuse its choice
+_route_decisions = {}
+
+def local_git_mirror_path(url: str) -> Path:
+    """Bare mirror of `url` under LOCAL_GIT_MIRROR_DIR (git cache naming), or None when local mirrors are disabled."""
+    return Path(LOCAL_GIT_MIRROR_DIR) / git_cache_mirror_path(url).name if LOCAL_GIT_MIRROR_DIR else None
+
+def git_url_mirrors(url: str) -> list:
+    """
+    (source, URL) of the mirrors serving the same repository as `url`, in preference order: "local" for the
+    local mirror when it exists, "mirror:<prefix>" for each GIT_URL_REWRITES mirror of the longest matching
+    prefix (the rest of `url` is appended), and V8_GITHUB_MIRROR_URL for V8 itself.
+    """
+    mirrors = []
+    local = local_git_mirror_path(url)
+    if local is not None and (local / "HEAD").is_file():
+        mirrors.append(("local", local.as_uri()))
+    prefixes = sorted((prefix for prefix in GIT_URL_REWRITES if url.startswith(prefix)), key=len, reverse=True)
+    if prefixes:
+        mirrors.extend((f"mirror:{mirror}", mirror + url[len(prefixes[0]):]) for mirror in GIT_URL_REWRITES[prefixes[0]])
+    if url == V8_GIT_URL and V8_GITHUB_MIRROR_URL:
+        mirrors.append((f"mirror:{V8_GITHUB_MIRROR_URL}", V8_GITHUB_MIRROR_URL))
+    return mirrors
+
+def git_rewrite_settings() -> list:
+    """`url.<mirror>.insteadOf <prefix>` settings sending every GIT_URL_REWRITES prefix to its first mirror (for gclient's own fetches)."""
+    return [(f"url.{mirrors[0]}.insteadOf", prefix) for prefix, mirrors in GIT_URL_REWRITES.items() if mirrors]
+
+def _route_label(route: dict) -> str:
+    if route["proxy"] == "direct":
+        return f"{route['url']} (direct)"
+    return f"{route['url']} via proxy '{route['proxy']}'" if route["proxy"] else f"{route['url']} (default proxy settings)"
+
+def _git_config_env(env: dict, settings: list) -> dict:
+    """Copy of `env` with (key, value) git config settings appended to its GIT_CONFIG_COUNT/KEY/VALUE entries."""
+    env = dict(env)
+    count = int(env.get("GIT_CONFIG_COUNT") or 0)
+    for key, value in settings:
+        env[f"GIT_CONFIG_KEY_{count}"], env[f"GIT_CONFIG_VALUE_{count}"] = key, value
+        count += 1
+    env["GIT_CONFIG_COUNT"] = str(count)
+    return env
+
+def route_env(env: dict, url: str, route: dict) -> dict:
+    """
+    Environment that makes git (and gclient's own downloads) reach `url` over `route`. A route without a proxy
+    leaves the user's proxy settings (environment, git config) alone; "direct" overrides them with none.
+    """
+    settings = []
+    if route["proxy"]:
+        # An empty http.proxy makes git connect directly even if the user's config or environment names a proxy.
+        settings.append(("http.proxy", "" if route["proxy"] == "direct" else route["proxy"]))
+    if route["url"] != url:
+        settings.append((f"url.{route['url']}.insteadOf", url))
+    routed = _git_config_env(env, settings)
+    if not route["proxy"]:
+        return routed
+    for name in ("http_proxy", "https_proxy", "HTTP_PROXY", "HTTPS_PROXY", "all_proxy", "ALL_PROXY"):
+        routed.pop(name, None)
+    if route["proxy"] != "direct":
+        # Windows environment names are case-insensitive; POSIX tools differ in which spelling they read.
+        for name in (("HTTP_PROXY", "HTTPS_PROXY") if os.name == "nt" else ("http_proxy", "https_proxy", "HTTP_PROXY", "HTTPS_PROXY")):
+            routed[name] = route["proxy"]
+    return routed
+
+def probe_git_route(env: dict, route: dict):
+    """Seconds `git ls-remote` took over `route`, or None if it failed or exceeded ROUTE_PROBE_TIMEOUT."""
+    probe_env = route_env(env, route["url"], route)
+    probe_env["GIT_TERMINAL_PROMPT"] = "0" # A route that wants credentials is down, not a prompt
+    start = time.perf_counter()
+    with trace_span(f"probe {_route_label(route)}", "route") as span:
         try:
-            log("INFO", f"Git fetch/reset attempt {attempt}/{GIT_RETRY} for {repo_dir} @ {ref}.")
-            run(['git', 'remote', 'update', '--prune'], cwd=repo_dir, env=env, capture_output=True)
-            run(['git', 'fetch', remote, '--tags', '--prune', '--no-recurse-submodules'], cwd=repo_dir, env=env, capture_output=True)
-            run(['git', 'checkout', '--detach', ref], cwd=repo_dir, env=env, capture_output=True)
-            run(['git', 'reset', '--hard', ref], cwd=repo_dir, env=env, capture_output=True)
-            log("INFO", f"Checked out V8 ref {ref}.")
+            subprocess.run(["git", "ls-remote", route["url"], "HEAD"], env=probe_env, stdin=subprocess.DEVNULL,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=ROUTE_PROBE_TIMEOUT, check=True)
+        except (subprocess.SubprocessError, OSError) as e:
+            reason = f"timed out after {ROUTE_PROBE_TIMEOUT}s" if isinstance(e, subprocess.TimeoutExpired) else \
+                     (getattr(e, "stderr", None) or b"").decode("utf-8", "replace").strip()[-300:] or str(e)
+            span["error"] = reason
+            log("INFO", f"Route probe {_route_label(route)} failed: {reason}", to_console=False)
+            return None
+    return time.perf_counter() - start
+
+def _load_route_cache() -> dict:
+    try:
+        with open(ROUTE_CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_route_choice(host: str, choice):
+    """Records (or with None forgets) the chosen route of `host` in ROUTE_CACHE_FILE."""
+    with _route_lock:
+        cache = _load_route_cache()
+        if choice is None and cache.pop(host, None) is None:
             return
-        except Exception as e:
-            log("WARN", f"git fetch/reset attempt {attempt} failed: {e}")
-            if attempt < GIT_RETRY:
-                time.sleep(5 * attempt)
-            else:
-                raise
+        if choice is not None:
+            cache[host] = choice
+        try:
+            os.makedirs(os.path.dirname(ROUTE_CACHE_FILE), exist_ok=True)
+            with open(ROUTE_CACHE_FILE, "w", encoding="utf-8") as f:
+                json.dump(cache, f, indent=2)
+        except OSError as e:
+            log("WARN", f"Could not write route cache {ROUTE_CACHE_FILE}: {e}", to_console=False)
+
+def forget_git_route(url: str, route: dict):
+    """Drops the cached route of `url`'s host if it is `route` (it just failed), so the next selection probes again."""
+    cached = _load_route_cache().get(failure_host(url))
+    if cached and cached.get("source") == route.get("source") and cached.get("proxy") == route["proxy"]:
+        _save_route_choice(failure_host(url), None)
+
+def _local_mirror_has(mirror: Path, revision) -> bool:
+    """Whether a local mirror can serve `revision` (anything but a commit SHA is assumed to be there)."""
+    if not _is_commit_sha(revision):
+        return True
+    return subprocess.run(["git", "cat-file", "-e", f"{revision}^{{commit}}"], cwd=str(mirror), stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL).returncode == 0
+
+def _git_route_has_revision(env: dict, route: dict, revision: str) -> bool:
+    """Whether the repository behind `route` serves commit `revision`: fetches that commit object alone into a scratch repository."""
+    probe_env = route_env(env, route["url"], route)
+    probe_env["GIT_TERMINAL_PROMPT"] = "0"
+    scratch = tempfile.mkdtemp(prefix="cerebrumlux-probe-")
+    try:
+        subprocess.run(["git", "init", "--bare", "--quiet", scratch], env=probe_env, stdin=subprocess.DEVNULL,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=ROUTE_PROBE_TIMEOUT, check=True)
+        subprocess.run(["git", "fetch", "--quiet", "--no-tags", "--depth=1", "--filter=tree:0", route["url"], revision], cwd=scratch,
+                       env=probe_env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       timeout=ROUTE_PROBE_TIMEOUT, check=True)
+        return True
+    except (subprocess.SubprocessError, OSError):
+        return False
+    finally:
+        shutil.rmtree(scratch, onerror=onerror)
+
+def select_git_routes(env: dict, url: str, revision: str = None) -> list:
+    """
+    Every route to `url`, best first: a local mirror that has `revision`, then the cached choice for the host
+    while it is fresh, else all network routes probed concurrently and ordered by latency (failed probes
+    last, in configured order). Mirrors that do not serve `revision` (a commit SHA) are left out, and so are
+    routes whose circuit breaker is open unless nothing else is configured.
+    """
+    local, candidates = [], []
+    for source, candidate in [("origin", url)] + git_url_mirrors(url):
+        if source == "local":
+            local.append({"url": candidate, "proxy": "", "source": source})
+        else:
+            candidates.extend({"url": candidate, "proxy": proxy, "source": source} for proxy in PROXY_FALLBACKS)
+    if local and not _local_mirror_has(local_git_mirror_path(url), revision):
+        log("INFO", f"Local mirror of {url} lacks {revision}; not using it.", to_console=False)
+        local = []
+    candidates = [r for r in candidates if not _circuit_open(failure_host(r["url"], r["proxy"]))] or candidates
+    # The origin defines the revision; a mirror is only a route to it if it has it (an upstream project is not a copy of Chromium's fork).
+    serves = lambda route: not (_is_commit_sha(revision) and route["source"].startswith("mirror:")) or _git_route_has_revision(env, route, revision)
+    if len(candidates) <= 1:
+        return local + (candidates or [{"url": url, "proxy": "", "source": "origin"}])
+    host = failure_host(url)
+    with _route_lock:
+        probe_lock = _route_probe_locks[host]
+    with probe_lock:
+        cached = _load_route_cache().get(host)
+        if cached and time.time() - cached.get("chosen_at", 0) < ROUTE_CACHE_TTL:
+            for route in candidates:
+                if route["source"] == cached.get("source") and route["proxy"] == cached.get("proxy") and serves(route):
+                    log("INFO", f"Route to {url}: {_route_label(route)} (cached choice for {host}).", to_console=False)
+                    # The fallbacks are filtered like probed routes, so a mirror lacking the revision is never tried.
+                    rest = [r for r in candidates if r is not route]
+                    with concurrent.futures.ThreadPoolExecutor(max_workers=len(rest), thread_name_prefix="probe") as pool:
+                        served = list(pool.map(serves, rest))
+                    for fallback, ok in zip(rest, served):
+                        if not ok:
+                            log("INFO", f"Route {_route_label(fallback)} does not serve {revision}; not using it.", to_console=False)
+                    return local + [route] + [r for r, ok in zip(rest, served) if ok]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="probe") as pool:
+            latencies = list(pool.map(lambda route: probe_git_route(env, route), candidates))
+            served = list(pool.map(lambda route, latency: latency is None or serves(route), candidates, latencies))
+        for route, ok in zip(candidates, served):
+            if not ok:
+                log("INFO", f"Route {_route_label(route)} does not serve {revision}; not using it.", to_console=False)
+        candidates = [route for route, ok in zip(candidates, served) if ok]
+        latencies = [latency for latency, ok in zip(latencies, served) if ok]
+        order = sorted(range(len(candidates)), key=lambda i: (latencies[i] is None, latencies[i] or 0.0, i))
+        routes = [candidates[i] for i in order]
+        probes = [{"route": _route_label(candidates[i]), "seconds": None if latencies[i] is None else round(latencies[i], 3)} for i in order]
+        if latencies[order[0]] is None:
+            log("WARN", f"No route to {host} answered a probe; trying them in configured order.", to_console=True)
+            routes = candidates
+        else:
+            log("INFO", f"Route to {host}: {_route_label(routes[0])} ({latencies[order[0]]:.2f}s"
+                        + "".join(f"; {p['route']}: " + (f"{p['seconds']:.2f}s" if p["seconds"] is not None else "down") for p in probes[1:]) + ").", to_console=True)
+            _save_route_choice(host, {"source": routes[0]["source"], "proxy": routes[0]["proxy"],
+                                      "probe_seconds": probes[0]["seconds"], "chosen_at": time.time()})
+    with _route_lock:
+        _route_decisions[url] = probes
+        record_run_summary("git_routes", dict(_route_decisions))
+    return local + routes
 
 def git_clone_with_retry(env, target_dir, url):
-    """Clones a Git repository with retries and proxy fallbacks."""
-    for proxy_url in PROXY_FALLBACKS:
+    """
+    Clones a Git repository on the fastest working route (select_git_routes()), falling back to the other
+    routes, borrowing objects from the git cache (GIT_CACHE_DIR). `target_dir` keeps `url` as its origin.
+    """
+    dead_urls = set()
+    for route in select_git_routes(env, url):
+        if route["url"] in dead_urls:
+            continue
+        routed = route_env(env, url, route)
         try:
-            git_configure_proxy(env, proxy_url)
-            for attempt in range(1, GIT_RETRY + 1):
-                try:
-                    log("INFO", f"Cloning attempt {attempt}/{GIT_RETRY} from {url} via proxy '{proxy_url}'")
-                    run(['git', 'clone', url, target_dir], env=env)
-                    log("INFO", "Git clone successful.")
-                    return
-                except Exception as e:
-                    log("WARN", f"git clone attempt {attempt} failed: {e}")
-                    if attempt < GIT_RETRY:
-                        time.sleep(5 * attempt)
-                    else:
-                        raise
+            reference = git_cache_populate(routed, url)
+            log("INFO", f"Cloning {url} over {_route_label(route)}")
+            retry_call(lambda: run(['git', 'clone'] + (['--reference', str(reference)] if reference else []) + _git_clone_fetch_flags() + [url, target_dir], env=routed),
+                       f"git clone of {url} over {_route_label(route)}", GIT_RETRY, GIT_RETRY_BACKOFF, host=failure_host(route["url"], route["proxy"]))
+            log("INFO", "Git clone successful.")
+            return
         except Exception as e:
-            log("ERROR", f"Proxy configuration or clone failed for proxy '{proxy_url}': {e}")
+            log("ERROR", f"Clone of {url} over {_route_label(route)} failed: {e}")
+            forget_git_route(url, route)
+            if classify_failure(e)[0] == "permanent":
+                dead_urls.add(route["url"]) # Another proxy will not make a missing repository appear at this URL
     raise RuntimeError(f"All git clone attempts failed for {url}.")
 
 # ----------------------------
-# === gclient helpers ===
+# === Git object cache ===
 # ----------------------------
-def write_gclient_file(root_dir: str, url: str):
-    """Writes a .gclient file in the root directory."""
-    gclient_content = (
-        "solutions = [\n"
-        "  {\n"
-        f"    'name': 'v8',\n"
-        f"    'url': '{url}',\n"
-        "    'deps_file': 'DEPS',\n"
-        "    'managed': False,\n"
-        "  },\n"
-        "]\n"
-    )
-    path = Path(root_dir) / ".gclient" # Use Path for consistency
-    with path.open("w", encoding="utf-8") as f:
-        f.write(gclient_content)
-    log("INFO", f".gclient written to: {path} with name 'v8'.")
-
-def _apply_vs_toolchain_patch_logic(vs_toolchain_path: Path) -> bool:
-    """Internal helper to aggressively patch vs_toolchain.py."""
+# One bare mirror per remote under GIT_CACHE_DIR, shared by every V8_ROOT on the machine. gclient uses it
+# through `cache_dir` in .gclient (its git_cache module populates the mirrors and clones against them);
+# git_clone_with_retry() keeps its own mirrors there under the same naming and clones with --reference.
+# Either way a fresh root, or a second V8 version, only fetches objects the mirror does not have yet.
+# Checkouts borrow objects from their mirror (alternates), so pruning is opt-in (--prune-git-cache) and
+# spares every mirror a checkout of this V8_ROOT borrows from; another root whose mirror was pruned after
+# GIT_CACHE_MAX_AGE_DAYS without any build using it has to be recreated.
+_git_cache_lock = threading.Lock()
+_git_cache_stats = {"hits": 0, "misses": 0, "failures": 0, "used": set()}
+
+def git_cache_mirror_path(url: str) -> Path:
+    """Mirror directory for `url`, named the way depot_tools' git_cache names it so both share mirrors."""
+    if os.path.isdir(url):
+        name = os.path.splitdrive(url)[1].replace("-", "--").replace(os.sep, "-")
+    else:
+        parsed = urllib.parse.urlparse(url)
+        name = parsed.netloc + parsed.path
+        if name.endswith(".git"):
+            name = name[:-len(".git")]
+        name = name.replace("googlesource.com/a/", "googlesource.com/").replace(":", "__")
+        name = name.replace("-", "--").replace("/", "-").lower()
+    return Path(GIT_CACHE_DIR) / name
+
+@contextlib.contextmanager
+def _git_cache_mirror_lock(mirror: Path, timeout: float = None):
+    """Holds <mirror>.lock (the lock file git_cache uses too) while a mirror is created or fetched; yields False on timeout."""
+    lock_path = str(mirror) + ".lock"
+    deadline = time.monotonic() + (GIT_CACHE_LOCK_TIMEOUT if timeout is None else timeout)
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            if time.monotonic() >= deadline:
+                yield False
+                return
+            time.sleep(1)
     try:
-        if not vs_toolchain_path.exists():
-            log("DEBUG", f"'{vs_toolchain_path.name}' not found at {vs_toolchain_path}, cannot patch.", to_console=False)
-            return False
-
-        text = vs_toolchain_path.read_text(encoding="utf-8")
-        original_text = text
-        modified = False
+        yield True
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
 
-        # Prepare a small top-of-file shim to guarantee definitions are present early.
-        shim_block = (
-            "# --- CerebrumLux injected shim START (v7.36) ---\n" # Updated shim version marker
-            "import sys\n"
-            "import subprocess\n"
-            "from types import SimpleNamespace\n"
-            "\n"
-            "# The 'pipes' module is removed in Python 3.13+. Provide a compatibility shim.\n"
-            "if 'pipes' not in sys.modules:\n"
-            "    pipes = SimpleNamespace(quote=lambda s: subprocess.list2cmdline([s]))\n"
-            "else:\n"
-            "    pipes = sys.modules['pipes']\n"
-            "\n"
-            "def DetectVisualStudioPath():\n"
-            "    return r'C:\\FakeVS'\n"
-            "\n"
-            "def GetVisualStudioVersion():\n"
-            "    return '16.0'\n"
-            "\n"
-            "def SetEnvironmentAndGetRuntimeDllDirs():\n"
-            "    # CerebrumLux shim: bypass all VS runtime detection for MinGW builds.\n"
-            "    # Return a dummy scope for GN scripts, defining expected variables.\n"
-            "    import os\n"
-            "    os.environ['GYP_MSVS_OVERRIDE_PATH'] = DetectVisualStudioPath()\n"
-            "    os.environ['DEPOT_TOOLS_WIN_TOOLCHAIN'] = '0'\n"
-            "    return {\n"
-            "        'path': DetectVisualStudioPath(),\n"
-            "        'vs_path': DetectVisualStudioPath(),\n"
-            "        'sdk_path': r'C:\\FakeSDK',\n"
-            "        'wdk_path': r'C:\\FakeWDK',\n"
-            "        'runtime_dirs': [r'C:\\FakeVS\\VC\\Tools\\MSVC\\14.16.27023\\bin\\Hostx64\\x64'],\n"
-            "        'version': GetVisualStudioVersion(),\n"
-            "    }\n"
-            "# --- CerebrumLux injected shim END ---\n\n"
-        )
-
-        if f"# --- CerebrumLux injected shim START (v7.36) ---" not in text: # Updated version check
-            text = shim_block + text
-            modified = True
-            log("INFO", f"Prepended CerebrumLux shim to '{vs_toolchain_path.name}'.", to_console=False)
-        else:
-            log("DEBUG", f"CerebrumLux shim already present in '{vs_toolchain_path.name}', skipping prepend.", to_console=False)
-            
-            old_shim_pattern = re.compile(r"# --- CerebrumLux injected shim START \(v[\d\.]+\) ---[\s\S]*?# --- CerebrumLux injected shim END ---\n\n", re.MULTILINE)
-            if old_shim_pattern.search(text):
-                text = old_shim_pattern.sub("", text)
-                log("DEBUG", f"Removed old CerebrumLux shim from '{vs_toolchain_path.name}' for re-application.", to_console=False)
-                text = shim_block + text
-                modified = True
+def git_cache_populate(env, url, revision=None, strict=False):
+    """
+    Creates or updates the cache mirror of `url` and returns its path, or None when the cache is disabled
+    or unusable (the caller then clones without it; the cache never fails a build). A mirror that already
+    has `revision` (a commit SHA) is not fetched. In lean mode a missing SHA is fetched by itself, without
+    branch heads or tags (depth 1 unless the mirror already has complete history); otherwise every branch
+    and tag is fetched. With `strict`, a failed fetch is raised instead, for callers with their own retry policy.
+    """
+    if not GIT_CACHE_DIR:
+        return None
+    mirror = git_cache_mirror_path(url)
+    try:
+        os.makedirs(GIT_CACHE_DIR, exist_ok=True)
+        with _git_cache_mirror_lock(mirror) as locked:
+            if not locked:
+                log("WARN", f"Git cache mirror {mirror} is locked by another process; cloning {url} without the cache.", to_console=False)
+                return None
+            existed = (mirror / "HEAD").is_file()
+            if not existed:
+                log("INFO", f"Git cache: creating mirror of {url} in {mirror}.", to_console=True)
+                if mirror.exists():
+                    aggressive_rmtree(str(mirror)) # Leftover of an interrupted populate
+                run(['git', 'init', '--bare', '--quiet', str(mirror)], env=env)
+                run(['git', 'config', 'remote.origin.url', url], cwd=str(mirror), env=env)
+                run(['git', 'config', '--replace-all', 'remote.origin.fetch', '+refs/heads/*:refs/heads/*'], cwd=str(mirror), env=env)
+            has_revision = lambda: run(['git', 'cat-file', '-e', f'{revision}^{{commit}}'], cwd=str(mirror), env=env, check=False).returncode == 0
+            if existed and _is_commit_sha(revision) and has_revision():
+                stamp = mirror / "FETCH_HEAD" # Nothing to fetch; touch the stamp report_git_cache() ages mirrors by
+                if stamp.exists():
+                    os.utime(stamp)
             else:
-                if any(s in text for s in [r"wdk_path': r''", r"sdk_path': r''", r"DetectVisualStudioPath():\n    return r''", r"# --- CerebrumLux injected shim START (v7.0) ---"]):
-                    log("WARN", f"Outdated CerebrumLux shim content or old version marker detected in '{vs_toolchain_path.name}'. Re-applying full shim.", to_console=False)
-                    text = re.sub(r"# --- CerebrumLux injected shim START \(v[\d\.]+\) ---[\s\S]*?# --- CerebrumLux injected shim END ---\n\n", "", text, flags=re.MULTILINE)
-                    text = shim_block + text
-                    modified = True
-
-        func_patterns_to_remove = [
-            r"^(def\s+DetectVisualStudioPath\s*\([^)]*\):(?:\n\s+.*)*?\n)(?=\n?^def|\Z)",
-            r"^(def\s+GetVisualStudioVersion\s*\([^)]*\):(?:\n\s+.*)*?\n)(?=\n?^def|\Z)",
-            r"^(def\s+SetEnvironmentAndGetRuntimeDllDirs\s*\([^)]*\):(?:\n\s+.*)*?\n)(?=\n?^def|\Z)",
-        ]
-
-        for pattern in func_patterns_to_remove:
-            initial_func_replace_text = text
-            text = re.sub(pattern, r"", text, flags=re.MULTILINE | re.DOTALL)
-            if initial_func_replace_text != text:
-                modified = True
-                log("INFO", f"Removed original function body for pattern '{pattern[:min(len(pattern), 50)]}...' in '{vs_toolchain_path.name}'.", to_console=False)
-
-        if "import pipes" in text and not ("# import pipes (replaced by CerebrumLux shim)" in text):
-            text = text.replace("import pipes", "# import pipes (replaced by CerebrumLux shim)")
-            modified = True
-            log("INFO", f"Replaced 'import pipes' occurrences in '{vs_toolchain_path.name}'.", to_console=False)
-
-        exception_pattern = r"(raise\s+Exception\s*\(\s*['\"]No supported Visual Studio can be found[\s\S]*?\)\s*)"
-        if re.search(exception_pattern, text):
-            text = re.sub(exception_pattern, "# CerebrumLux neutralized original exception: No supported Visual Studio can be found.", text)
-            modified = True
-            log("INFO", f"Neutralized explicit 'No supported Visual Studio can be found' exception text in '{vs_toolchain_path.name}'.", to_console=False)
-
-        if modified:
+                shallow = not existed or (mirror / "shallow").exists()
+                with trace_span(f"git cache {'update' if existed else 'populate'} {mirror.name}", "git_cache"):
+                    if GIT_FETCH_MODE == "lean" and _is_commit_sha(revision):
+                        # Depth 1 would make a complete mirror shallow; there it only costs the commits it lacks.
+                        run(['git', 'fetch', '--no-tags', '--quiet'] + (['--depth=1'] if shallow else []) + ['origin', revision],
+                            cwd=str(mirror), env=env)
+                    else:
+                        run(['git', 'fetch', '--prune', '--tags', '--quiet'] + (['--unshallow'] if existed and shallow else []) + ['origin'],
+                            cwd=str(mirror), env=env)
+                        if _is_commit_sha(revision) and not has_revision(): # Pinned off every branch (or served by a mirror that keeps it elsewhere)
+                            run(['git', 'fetch', '--quiet', 'origin', revision], cwd=str(mirror), env=env)
+    except Exception as e:
+        with _git_cache_lock:
+            _git_cache_stats["failures"] += 1
+        if strict:
+            raise
+        log("WARN", f"Git cache: could not populate {mirror} from {url}: {e}. Cloning without the cache.", to_console=True)
+        return None
+    with _git_cache_lock:
+        _git_cache_stats["hits" if existed else "misses"] += 1
+        _git_cache_stats["used"].add(mirror.name)
+    log("INFO", f"Git cache {'hit' if existed else 'miss'} for {url}: " + ("updated" if existed else "created") + f" mirror {mirror}.", to_console=False)
+    return mirror
+
+def _dir_size(path) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+def _git_cache_borrowed(root_dir) -> set:
+    """Names of the cache mirrors the git checkouts under `root_dir` borrow objects from (objects/info/alternates)."""
+    cache = os.path.normcase(os.path.abspath(GIT_CACHE_DIR))
+    borrowed = set()
+    for dirpath, dirnames, _ in os.walk(root_dir):
+        if ".git" not in dirnames:
+            continue
+        dirnames.remove(".git") # Nothing to find inside the repository itself
+        alternates = Path(dirpath) / ".git" / "objects" / "info" / "alternates"
+        try:
+            lines = alternates.read_text(encoding="utf-8").splitlines() if alternates.is_file() else []
+        except OSError:
+            continue
+        for line in lines:
+            if not line.strip() or line.startswith("#"):
+                continue
+            mirror = os.path.dirname(os.path.abspath(os.path.join(alternates.parent.parent, line.strip()))) # <mirror>/objects
+            if os.path.normcase(os.path.dirname(mirror)) == cache:
+                borrowed.add(os.path.basename(mirror))
+    return borrowed
+
+def report_git_cache(prune: bool = False, root_dir: str = None) -> dict:
+    """
+    Logs the size of GIT_CACHE_DIR and, if `prune`, deletes mirrors nobody fetched for GIT_CACHE_MAX_AGE_DAYS,
+    then least recently fetched ones while the cache is larger than GIT_CACHE_MAX_BYTES (0 = no size limit).
+    Mirrors used by this run, mirrors a checkout under `root_dir` borrows objects from and mirrors that are
+    locked are never pruned. Returns the figures for the run summary.
+    """
+    cache = Path(GIT_CACHE_DIR)
+    mirrors = []
+    if cache.is_dir():
+        for entry in cache.iterdir():
+            if entry.is_dir() and (entry / "HEAD").is_file():
+                stamp = entry / "FETCH_HEAD" # Touched by every fetch, ours and git_cache's
+                last_used = (stamp if stamp.exists() else entry).stat().st_mtime
+                mirrors.append({"name": entry.name, "path": entry, "bytes": _dir_size(entry), "last_used": last_used})
+    with _git_cache_lock:
+        stats = {key: value for key, value in _git_cache_stats.items() if key != "used"}
+        used = set(_git_cache_stats["used"])
+    total = sum(mirror["bytes"] for mirror in mirrors)
+    pruned, pruned_bytes = [], 0
+    if prune:
+        if root_dir:
+            used |= _git_cache_borrowed(root_dir)
+        cutoff = time.time() - GIT_CACHE_MAX_AGE_DAYS * 86400
+        candidates = sorted((m for m in mirrors if m["name"] not in used and not Path(str(m["path"]) + ".lock").exists()),
+                            key=lambda m: m["last_used"])
+        for mirror in candidates:
+            if not (mirror["last_used"] < cutoff or (GIT_CACHE_MAX_BYTES and total - pruned_bytes > GIT_CACHE_MAX_BYTES)):
+                continue
             try:
-                bak_path = vs_toolchain_path.with_suffix(vs_toolchain_path.suffix + ".cerebrumlux.bak")
-                if not bak_path.exists() or original_text != text:
-                    bak_path.write_bytes(original_text.encode("utf-8", errors="replace"))
-                    log("DEBUG", f"Created backup of original '{vs_toolchain_path.name}' at '{bak_path.name}'.", to_console=False)
+                shutil.rmtree(mirror["path"], onerror=onerror)
             except Exception as e:
-                log("WARN", f"Could not write backup of '{vs_toolchain_path.name}': {e}", to_console=False)
+                log("WARN", f"Git cache: could not prune {mirror['path']}: {e}", to_console=False)
+                continue
+            pruned.append(mirror["name"])
+            pruned_bytes += mirror["bytes"]
+    summary = dict(stats, dir=str(cache), mirrors=len(mirrors) - len(pruned), bytes=total - pruned_bytes,
+                   pruned=pruned, pruned_bytes=pruned_bytes)
+    log("INFO", f"Git cache {cache}: {summary['mirrors']} mirrors, {summary['bytes'] / 1024 ** 2:.1f} MiB "
+                f"(this run: {stats['hits']} hits, {stats['misses']} misses" + (f", {stats['failures']} failures" if stats["failures"] else "") + ")"
+                + (f"; pruned {len(pruned)} mirrors ({pruned_bytes / 1024 ** 2:.1f} MiB) unused for {GIT_CACHE_MAX_AGE_DAYS}+ days or over the size limit"
+                   if pruned else "") + ".", to_console=True)
+    return summary
 
-            vs_toolchain_path.write_text(text, encoding="utf-8")
-            log("INFO", f"'{vs_toolchain_path.name}' patched (shim-injected and originals deleted) successfully.", to_console=False)
-            return True
+# ----------------------------
+# === GN lexer, parser and span editor ===
+# ----------------------------
+# Enough of the GN grammar (https://gn.googlesource.com/gn/+/main/docs/reference.md#grammar) to
+# locate statements and expressions in BUILD.gn files. Nodes are dicts with "type", "start" and "end"
+# (offsets into the source). Patches are recorded as span edits and spliced into the original text in
+# one linear pass, so everything that is not touched (formatting, comments) is preserved byte for byte
+# and replacements are always whole statements or expressions, never partial lines.
+class GnSyntaxError(ValueError):
+    def __init__(self, message, text, offset):
+        line = text.count("\n", 0, offset) + 1
+        column = offset - (text.rfind("\n", 0, offset) + 1) + 1
+        super().__init__(f"{message} at line {line}, column {column}")
+        self.reason, self.line, self.column = message, line, column
+
+_GN_TOKEN_RE = re.compile(r"""
+    (?P<ws>[ \t\r\n]+)
+  | (?P<comment>\#[^\n]*)
+  | (?P<string>"(?:[^"\\]|\\[\s\S])*")
+  | (?P<int>[0-9]+)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op>==|!=|<=|>=|&&|\|\||\+=|-=|[=<>!+\-,.()\[\]{}])
+""", re.VERBOSE)
+_GN_ASSIGN_OPS = ("=", "+=", "-=")
+_GN_LINE_TAIL_RE = re.compile(r"[ \t]*(?:#[^\n]*)?\n?") # Rest of a statement's line: spaces, a trailing comment, the newline
+_GN_BINARY_PRECEDENCE = {"||": 1, "&&": 2, "==": 3, "!=": 3, "<": 4, "<=": 4, ">": 4, ">=": 4, "+": 5, "-": 5}
+_GN_CHILD_KEYS = ("target", "value", "args", "block", "cond", "then", "else", "items", "statements", "base", "index", "left", "right", "operand", "expr")
+
+def gn_tokenize(text: str) -> list:
+    """Returns [(kind, value, start, end), ...] without whitespace and comments."""
+    tokens, pos, length = [], 0, len(text)
+    match = _GN_TOKEN_RE.match
+    while pos < length:
+        m = match(text, pos)
+        if not m:
+            raise GnSyntaxError(f"Invalid token {text[pos:pos + 10]!r}", text, pos)
+        kind = m.lastgroup
+        if kind not in ("ws", "comment"):
+            tokens.append((kind, m.group(), pos, m.end()))
+        pos = m.end()
+    return tokens
+
+class _GnParser:
+    def __init__(self, text):
+        self.text = text
+        self.tokens = gn_tokenize(text)
+        self.pos = 0
+
+    def _peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else ("eof", "", len(self.text), len(self.text))
+
+    def _at(self, value, offset=0):
+        token = self._peek(offset)
+        return token[0] in ("op", "ident") and token[1] == value
+
+    def _take(self, value=None, kind=None):
+        token = self._peek()
+        if (value is not None and not self._at(value)) or (kind is not None and token[0] != kind) or token[0] == "eof":
+            expected = repr(value) if value is not None else (kind or "token")
+            raise GnSyntaxError(f"Expected {expected}, got {token[1]!r}", self.text, token[2])
+        self.pos += 1
+        return token
+
+    def parse_file(self):
+        statements = []
+        while self._peek()[0] != "eof":
+            statements.append(self._statement())
+        return {"type": "block", "start": 0, "end": len(self.text), "statements": statements}
+
+    def _block(self):
+        start = self._take("{")[2]
+        statements = []
+        while not self._at("}"):
+            if self._peek()[0] == "eof":
+                raise GnSyntaxError("Expected '}'", self.text, start)
+            statements.append(self._statement())
+        end = self._take("}")[3]
+        return {"type": "block", "start": start, "end": end, "statements": statements}
+
+    def _statement(self):
+        if self._at("if"):
+            return self._condition()
+        token = self._peek()
+        expr = self._expression()
+        if self._peek()[0] == "op" and self._peek()[1] in _GN_ASSIGN_OPS:
+            if expr["type"] not in ("ident", "access", "subscript"):
+                raise GnSyntaxError("Left side of assignment must be an identifier, scope access or subscript", self.text, expr["start"])
+            op = self._take()[1]
+            value = self._expression()
+            return {"type": "assign", "start": expr["start"], "end": value["end"], "target": expr, "op": op, "value": value}
+        if expr["type"] == "call":
+            return expr
+        raise GnSyntaxError("Expecting assignment or function call", self.text, token[2])
+
+    def _condition(self):
+        start = self._take("if")[2]
+        self._take("(")
+        cond = self._expression()
+        self._take(")")
+        then = self._block()
+        node = {"type": "condition", "start": start, "end": then["end"], "cond": cond, "then": then, "else": None}
+        if self._at("else"):
+            self._take("else")
+            node["else"] = self._condition() if self._at("if") else self._block()
+            node["end"] = node["else"]["end"]
+        return node
+
+    def _expression(self, min_precedence=1):
+        left = self._unary()
+        while True:
+            token = self._peek()
+            precedence = _GN_BINARY_PRECEDENCE.get(token[1]) if token[0] == "op" else None
+            if precedence is None or precedence < min_precedence:
+                return left
+            self.pos += 1
+            right = self._expression(precedence + 1)
+            left = {"type": "binary", "start": left["start"], "end": right["end"], "op": token[1], "left": left, "right": right}
+
+    def _unary(self):
+        if self._at("!") or self._at("-"):
+            token = self._take()
+            operand = self._unary()
+            return {"type": "unary", "start": token[2], "end": operand["end"], "op": token[1], "operand": operand}
+        return self._primary()
+
+    def _primary(self):
+        kind, value, start, end = self._peek()
+        if kind == "string":
+            self.pos += 1
+            return {"type": "string", "start": start, "end": end, "value": value}
+        if kind == "int":
+            self.pos += 1
+            return {"type": "int", "start": start, "end": end, "value": value}
+        if kind == "ident":
+            self.pos += 1
+            if value in ("true", "false"):
+                return {"type": "bool", "start": start, "end": end, "value": value}
+            if self._at("("):
+                self._take("(")
+                args = self._items(")")
+                call_end = self._take(")")[3]
+                node = {"type": "call", "start": start, "end": call_end, "name": value, "args": args, "block": None}
+                if self._at("{"):
+                    node["block"] = self._block()
+                    node["end"] = node["block"]["end"]
+                return node
+            node = {"type": "ident", "start": start, "end": end, "name": value}
+            if self._at("."):
+                self._take(".")
+                member = self._take(kind="ident")
+                return {"type": "access", "start": start, "end": member[3], "base": node, "member": member[1]}
+            if self._at("["):
+                self._take("[")
+                index = self._expression()
+                close = self._take("]")
+                return {"type": "subscript", "start": start, "end": close[3], "base": node, "index": index}
+            return node
+        if kind == "op" and value == "[":
+            self._take("[")
+            items = self._items("]")
+            close = self._take("]")
+            return {"type": "list", "start": start, "end": close[3], "items": items}
+        if kind == "op" and value == "{":
+            block = self._block()
+            return {"type": "scope", "start": block["start"], "end": block["end"], "block": block}
+        if kind == "op" and value == "(":
+            self._take("(")
+            expr = self._expression()
+            close = self._take(")")
+            return {"type": "paren", "start": start, "end": close[3], "expr": expr}
+        raise GnSyntaxError(f"Unexpected token {value!r}" if kind != "eof" else "Unexpected end of file", self.text, start)
+
+    def _items(self, closer):
+        """Comma separated expressions up to (not including) `closer`; a trailing comma is allowed."""
+        items = []
+        while not self._at(closer):
+            items.append(self._expression())
+            if self._at(","):
+                self._take(",")
+            elif not self._at(closer):
+                raise GnSyntaxError("Expected comma between items", self.text, self._peek()[2])
+        return items
+
+def gn_parse(text: str) -> dict:
+    """Parses GN source into a "block" node. Raises GnSyntaxError with line/column on invalid input."""
+    # Every node survives until the parse ends, so the generational GC passes triggered by the
+    # allocations only rescan a growing heap; pausing GC keeps the parse linear.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _GnParser(text).parse_file()
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+def gn_walk(node):
+    """Yields `node` and all nodes below it in source order (pre-order, iterative)."""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        yield current
+        children = []
+        for key in _GN_CHILD_KEYS:
+            child = current.get(key)
+            if isinstance(child, list):
+                children.extend(child)
+            elif isinstance(child, dict):
+                children.append(child)
+        stack.extend(reversed(children))
+
+def gn_quote(value: str) -> str:
+    """GN string literal for `value`. GN only treats \\", \\$ and \\\\ as escapes; other backslashes are literal."""
+    out = []
+    for i, ch in enumerate(value):
+        if ch in '"$':
+            out.append("\\" + ch)
+        elif ch == "\\" and (i + 1 == len(value) or value[i + 1] in '"$\\'):
+            out.append("\\\\")
         else:
-            log("INFO", f"No changes required for '{vs_toolchain_path.name}'.", to_console=False)
-            current_content = vs_toolchain_path.read_text(encoding="utf-8")
-            if f"# --- CerebrumLux injected shim START (v7.36) ---" not in current_content: # Updated version check
-                log("ERROR", f"'{vs_toolchain_path.name}' does not contain the CerebrumLux shim (v7.36) after expected patching. Patching is NOT sticking.", to_console=False)
-                return False
-            for pattern in func_patterns_to_remove:
-                if re.search(pattern, current_content, flags=re.MULTILINE | re.DOTALL):
-                    log("ERROR", f"'{vs_toolchain_path.name}' still contains original function definitions (pattern: {pattern[:min(len(pattern), 50)]}) despite patching. Patch is NOT sticking.", to_console=False)
-                    return False
-            if "import pipes" in current_content and not ("# import pipes (replaced by CerebrumLux shim)" in current_content):
-                log("ERROR", f"'{vs_toolchain_path.name}' still contains 'import pipes' but was not replaced. Patching is NOT sticking.", to_console=False)
-                return False
-            if "No supported Visual Studio can be found" in current_content and not ("# CerebrumLux neutralized original exception" in current_content):
-                log("ERROR", f"'{vs_toolchain_path.name}' contains VS detection exception but was not neutralized. Patching is NOT sticking.", to_console=False)
+            out.append(ch)
+    return '"' + "".join(out) + '"'
+
+def gn_format_value(value, indent: str = "") -> str:
+    """Formats a Python value (bool, int, str, list, dict -> scope) as GN source."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, str):
+        return gn_quote(value)
+    if isinstance(value, (list, tuple)):
+        return "[]" if not value else "[ " + ", ".join(gn_format_value(v, indent) for v in value) + " ]"
+    if isinstance(value, dict):
+        body = "".join(f"{indent}  {key} = {gn_format_value(v, indent + '  ')}\n" for key, v in value.items())
+        return "{\n" + body + indent + "}"
+    raise TypeError(f"Cannot format {type(value).__name__} as GN")
+
+def gn_target_name(node) -> str:
+    """Name assigned by an "assign" node with a plain identifier target, else None."""
+    target = node.get("target") if node.get("type") == "assign" else None
+    return target["name"] if target and target["type"] == "ident" else None
+
+def gn_is_access(node, bases, members=None) -> bool:
+    return (node.get("type") == "access" and node["base"]["name"] in bases
+            and (members is None or node["member"] in members))
+
+class GnEditor:
+    """
+    Collects span edits against one source text and splices them in a single pass.
+    An edit nested inside another one is dropped (the outer edit already rewrites that text); an edit
+    enclosing earlier ones replaces them; partially overlapping edits are a programming error.
+    Replacements are kept as disjoint spans sorted by start and insertions as sorted positions, so each
+    edit is a binary search and apply() is linear in the text size.
+    """
+    def __init__(self, text):
+        self.text = text
+        self._span_starts, self._spans = [], [] # Non-empty replacements: (start, end, replacement), disjoint
+        self._insert_positions, self._inserts = [], [] # Insertions: (pos, replacement), in call order per position
+
+    def _containing_span(self, pos, strict):
+        """The span around `pos` (strictly inside it when `strict`), or None."""
+        index = bisect.bisect_right(self._span_starts, pos if not strict else pos - 1) - 1
+        if index >= 0:
+            start, end, _ = self._spans[index]
+            if (start < pos < end) if strict else (start <= pos < end):
+                return self._spans[index]
+        return None
+
+    def replace(self, start, end, replacement):
+        if start == end:
+            if self._containing_span(start, strict=True):
                 return False
-            if any(s in current_content for s in [r"wdk_path': r''", r"sdk_path': r''", r"DetectVisualStudioPath():\n    return r''"]):
-                 log("ERROR", f"'{vs_toolchain_path.name}' shim contains empty paths (r''). Patching is NOT sticking (v7.36 content missing).", to_console=False) # Updated version check
-                 return False
-            
+            index = bisect.bisect_right(self._insert_positions, start)
+            self._insert_positions.insert(index, start)
+            self._inserts.insert(index, (start, replacement))
             return True
+        outer = self._containing_span(start, strict=False)
+        if outer and end <= outer[1]:
+            return False
+        if outer and outer[0] < start:
+            raise ValueError(f"Overlapping GN edits at {start}-{end} and {outer[0]}-{outer[1]}")
+        first = bisect.bisect_left(self._span_starts, start)
+        last = bisect.bisect_left(self._span_starts, end, lo=first)
+        if last > first and self._spans[last - 1][1] > end:
+            other = self._spans[last - 1]
+            raise ValueError(f"Overlapping GN edits at {start}-{end} and {other[0]}-{other[1]}")
+        self._span_starts[first:last] = [start]
+        self._spans[first:last] = [(start, end, replacement)]
+        # Insertions strictly inside the new span are superseded by it.
+        low = bisect.bisect_right(self._insert_positions, start)
+        high = bisect.bisect_left(self._insert_positions, end, lo=low)
+        del self._insert_positions[low:high], self._inserts[low:high]
+        return True
 
-    except Exception as e:
-        log("ERROR", f"Failed to apply aggressive patch logic to '{vs_toolchain_path.name}': {e}", to_console=True)
-        return False
+    def insert(self, pos, text):
+        return self.replace(pos, pos, text)
+
+    def line_span(self, node) -> tuple:
+        """Span of the whole line(s) holding statement `node`, including a trailing comment and newline."""
+        text = self.text
+        start = text.rfind("\n", 0, node["start"]) + 1
+        if text[start:node["start"]].strip():
+            start = node["start"] # Something else precedes the statement on its line
+        tail = _GN_LINE_TAIL_RE.match(text, node["end"])
+        return start, tail.end()
+
+    def indent_of(self, node) -> str:
+        line_start = self.text.rfind("\n", 0, node["start"]) + 1
+        prefix = self.text[line_start:node["start"]]
+        return prefix if not prefix.strip() else ""
+
+    def remove_statement(self, node):
+        return self.replace(*self.line_span(node), "")
+
+    def comment_out(self, node, label="# CerebrumLux neutralized: "):
+        """Turns statement `node` (all of its lines) into comments, keeping the indentation."""
+        start, end = self.line_span(node)
+        indent = self.indent_of(node)
+        lines = self.text[start:end].rstrip("\n").split("\n")
+        commented = [indent + label + lines[0].strip()] + [indent + "# " + (line[len(indent):] if line.startswith(indent) else line.strip()) for line in lines[1:]]
+        return self.replace(start, end, "\n".join(commented) + "\n")
+
+    def apply(self) -> str:
+        if not self._spans and not self._inserts:
+            return self.text
+        out, pos, inserts, next_insert = [], 0, self._inserts, 0
+        for start, end, replacement in self._spans + [(len(self.text), len(self.text), "")]:
+            while next_insert < len(inserts) and inserts[next_insert][0] <= start: # Insertions at a span start go before it
+                insert_pos, insert_text = inserts[next_insert]
+                out.append(self.text[pos:insert_pos])
+                out.append(insert_text)
+                pos, next_insert = insert_pos, next_insert + 1
+            out.append(self.text[pos:start])
+            out.append(replacement)
+            pos = end
+        return "".join(out)
 
-def _patch_dotfile_settings_gni(v8_source_dir: str, env: dict) -> bool:
+# ----------------------------
+# === DEPS evaluation and pruning ===
+# ----------------------------
+# DEPS is evaluated the way gclient evaluates it (gclient_eval), from its AST rather than executed:
+# literals, '+' concatenation, Var()/Str(), '{var}' placeholders in strings, and 'condition' expressions
+# over the DEPS vars and gclient's host variables (host_os, host_cpu, checkout_<os>, checkout_<cpu>).
+# The result is the dependency graph: per checkout path its type (git, cipd or gcs), URL and revision or
+# packages, and whether its condition holds here. Pruning (DEPS_PRUNE_MODE) deletes the entries the MinGW
+# v8_monolith build never reads from the DEPS text, together with the hooks running scripts from them and
+# their recursedeps lines. The edits are spans of the original text, so everything else stays as it was.
+class DepsEvalError(ValueError):
+    """DEPS (or a condition in it) uses a construct gclient does not evaluate either."""
+
+_DEPS_OSES = ("android", "chromeos", "fuchsia", "ios", "linux", "mac", "win")
+_DEPS_CPUS = ("arm", "arm64", "mips", "mips64", "ppc", "riscv64", "s390", "x86", "x64")
+_DEPS_PLACEHOLDER_RE = re.compile(r"\{\{|\}\}|\{(\w+)\}")
+_DEPS_ITEM_TAIL_RE = re.compile(r"(?:\s*,)?[ \t]*(?:#[^\n]*)?\n?") # Only ever matched at the end of an item
+
+def deps_builtin_vars() -> dict:
+    """gclient's built-in DEPS variables on this host (.gclient sets no target_os, so the host OS is the checkout OS)."""
+    host_os = {"win32": "win", "cygwin": "win", "darwin": "mac"}.get(sys.platform, "linux" if sys.platform.startswith("linux") else sys.platform)
+    machine = platform.machine().lower()
+    host_cpu = {"amd64": "x64", "x86_64": "x64", "aarch64": "arm64", "i386": "x86", "i686": "x86"}.get(machine, machine)
+    variables = {"host_os": host_os, "host_cpu": host_cpu}
+    variables.update({f"checkout_{name}": name == host_os for name in _DEPS_OSES})
+    variables.update({f"checkout_{name}": name == host_cpu for name in _DEPS_CPUS})
+    return variables
+
+def eval_deps_condition(condition: str, variables: dict) -> bool:
     """
-    Patches V8_SRC/build/dotfile_settings.gni to define 'exec_script_whitelist'
-    within the 'build_dotfile_settings' scope.
+    Value of a DEPS 'condition' (and/or/not, ==, != over names and literals). As in gclient, a name whose
+    variable holds a string is evaluated as a condition itself, and an unknown name stands for its own text.
     """
-    dotfile_settings_path = Path(v8_source_dir) / "build" / "dotfile_settings.gni"
-    if not dotfile_settings_path.exists():
-        log("WARN", f"'{dotfile_settings_path.name}' not found at {dotfile_settings_path}. Skipping patch.", to_console=True)
-        return False
+    return bool(_eval_deps_condition_value(condition, variables, ()))
 
-    log("INFO", f"Patching '{dotfile_settings_path.name}' for 'exec_script_whitelist' compatibility.", to_console=True)
+def _eval_deps_condition_value(condition: str, variables: dict, referenced: tuple):
+    """Unconverted value of `condition`, so host_os == "win" compares the text a string variable evaluates to."""
     try:
-        content = dotfile_settings_path.read_text(encoding="utf-8")
-        patched_content = content
-        modified = False
-
-        match = re.search(r"^(?P<indent>\s*)build_dotfile_settings\s*=\s*\{", patched_content, re.MULTILINE)
-        if match:
-            indent_level = match.group("indent")
-            insert_point = match.end()
-            
-            scope_content_after_brace = patched_content[insert_point:]
-            
-            if "exec_script_whitelist" not in scope_content_after_brace:
-                insert_text = f"\n{indent_level}  exec_script_whitelist = []"
-                patched_content = patched_content[:insert_point] + insert_text + patched_content[insert_point:]
-                modified = True
-                log("INFO", "Inserted 'exec_script_whitelist = []' into 'build_dotfile_settings' scope.", to_console=True)
-            else:
-                log("INFO", "'exec_script_whitelist' already exists in 'build_dotfile_settings' scope. Skipping insertion.", to_console=False)
-        else:
-            log("WARN", "Could not find 'build_dotfile_settings = {' in 'dotfile_settings.gni'. Skipping patch.", to_console=True)
-            return False
-
-        if modified:
-            patched_content = _filter_gn_comments(patched_content) # Apply general comment filter
-            dotfile_settings_path.write_text(patched_content, encoding="utf-8")
-            log("INFO", f"'{dotfile_settings_path.name}' patched successfully.", to_console=True)
-            run(["git", "add", str(dotfile_settings_path)], cwd=v8_source_dir, env=env, check=False)
-            log("INFO", f"Staged '{dotfile_settings_path.name}' changes with 'git add'.", to_console=True)
+        tree = ast.parse(condition.strip(), mode="eval")
+    except SyntaxError as e:
+        raise DepsEvalError(f"condition {condition!r}: {e.msg}")
+
+    def value(node):
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id in referenced:
+                raise DepsEvalError(f"condition {condition!r}: {node.id!r} refers to itself")
+            if node.id not in variables:
+                return node.id
+            if not isinstance(variables[node.id], str):
+                return variables[node.id]
+            return _eval_deps_condition_value(variables[node.id], variables, referenced + (node.id,))
+        if isinstance(node, ast.BoolOp):
+            for operand in node.values:
+                result = value(operand)
+                if bool(result) != isinstance(node.op, ast.And):
+                    return result
+            return result
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return not value(node.operand)
+        if isinstance(node, ast.Compare) and all(isinstance(op, (ast.Eq, ast.NotEq)) for op in node.ops):
+            left = value(node.left)
+            for op, comparator in zip(node.ops, node.comparators):
+                right = value(comparator)
+                if (left == right) != isinstance(op, ast.Eq):
+                    return False
+                left = right
             return True
-        else:
-            log("INFO", f"'{dotfile_settings_path.name}' already patched or no changes needed.", to_console=False)
-            run(["git", "add", str(dotfile_settings_path)], cwd=v8_source_dir, env=env, check=False)
-            log("INFO", f"Ensured '{dotfile_settings_path.name}' is staged with 'git add'.", to_console=True)
+        raise DepsEvalError(f"condition {condition!r}: {type(node).__name__} is not allowed")
+
+    return value(tree.body)
+
+def _eval_deps_expr(node, variables: dict):
+    """Value of a DEPS expression: literals, dicts, lists, '+' on strings, Var() and Str()."""
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ("Var", "Str") \
+            and len(node.args) == 1 and not node.keywords:
+        argument = _eval_deps_expr(node.args[0], variables)
+        if node.func.id == "Str":
+            return argument
+        if argument not in variables:
+            raise DepsEvalError(f"line {node.lineno}: Var({argument!r}) is not defined in vars")
+        return variables[argument]
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, right = _eval_deps_expr(node.left, variables), _eval_deps_expr(node.right, variables)
+        if not isinstance(left, str) or not isinstance(right, str):
+            raise DepsEvalError(f"line {node.lineno}: '+' is only allowed on strings")
+        return left + right
+    if isinstance(node, ast.Dict) and None not in node.keys:
+        return {_eval_deps_expr(key, variables): _eval_deps_expr(value, variables) for key, value in zip(node.keys, node.values)}
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_eval_deps_expr(element, variables) for element in node.elts]
+    raise DepsEvalError(f"line {getattr(node, 'lineno', '?')}: {type(node).__name__} is not allowed in DEPS")
+
+def _format_deps_string(value, variables: dict):
+    """Fills in the '{var}' placeholders of a DEPS string ('{{' and '}}' stand for braces)."""
+    if not isinstance(value, str):
+        return value
+    return _DEPS_PLACEHOLDER_RE.sub(lambda m: m.group(0)[0] if m.group(1) is None else str(variables.get(m.group(1), m.group(0))), value)
+
+def _deps_offsets(text: str):
+    """Maps an AST (lineno, col_offset) position to an offset into `text` (col_offset counts UTF-8 bytes)."""
+    line_starts = [0] + [match.end() for match in re.finditer("\n", text)]
+    ascii_only = text.isascii()
+
+    def offset(lineno, col):
+        start = line_starts[lineno - 1]
+        if ascii_only:
+            return start + col
+        return start + len(text[start:start + col].encode("utf-8")[:col].decode("utf-8", errors="ignore"))
+    return offset
+
+def _deps_item_span(text: str, offset, first, last) -> tuple:
+    """Span of the dict item or list element from node `first` to node `last`, with its comma and, when nothing else shares them, its whole line(s)."""
+    start = offset(first.lineno, first.col_offset)
+    end = _DEPS_ITEM_TAIL_RE.match(text, offset(last.end_lineno, last.end_col_offset)).end()
+    line_start = text.rfind("\n", 0, start) + 1
+    if not text[line_start:start].strip():
+        start = line_start
+    return start, end
+
+def _deps_entry(path: str, value, variables: dict) -> dict:
+    spec = value if isinstance(value, dict) else {"url": value}
+    dep_type = spec.get("dep_type", "git")
+    url, revision = _format_deps_string(spec.get("url"), variables), None
+    if dep_type == "git" and url and "@" in url.rsplit("/", 1)[-1]:
+        url, _, revision = url.rpartition("@")
+    packages = [{"package": _format_deps_string(package.get("package"), variables), "version": _format_deps_string(package.get("version"), variables)}
+                for package in spec.get("packages", [])]
+    objects = spec.get("objects", [])
+    return {"path": path, "dep_type": dep_type, "url": url, "revision": revision, "packages": packages, "objects": len(objects),
+            "size_bytes": sum(obj.get("size_bytes", 0) for obj in objects) or None, "condition": spec.get("condition"), "active": True}
+
+def evaluate_deps(text: str) -> dict:
+    """
+    Evaluates DEPS `text` into its dependency graph:
+      {"vars", "use_relative_paths", "use_relative_hooks", "deps": {path: entry}, "hooks": [hook], "recursedeps": [{"path", "span"}], "errors": [message]}
+    An entry has "path", "dep_type", "url", "revision", "packages", "objects", "size_bytes", "condition",
+    "active" (None when its condition could not be evaluated) and "span", its text for prune_deps_text();
+    a hook has "name", "action", "cwd", "condition", "active" and "span".
+    Raises DepsEvalError or SyntaxError when DEPS itself cannot be evaluated.
+    """
+    tree = ast.parse(text, filename="DEPS")
+    offset = _deps_offsets(text)
+    assignments = {statement.targets[0].id: statement.value for statement in tree.body
+                   if isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name)}
+    variables = {}
+    if isinstance(assignments.get("vars"), ast.Dict):
+        for key, value in zip(assignments["vars"].keys, assignments["vars"].values):
+            variables[_eval_deps_expr(key, variables)] = _eval_deps_expr(value, variables)
+    condition_vars = dict(variables, **deps_builtin_vars())
+    flag = lambda name: bool(assignments.get(name) is not None and _eval_deps_expr(assignments[name], variables))
+    graph = {"vars": variables, "use_relative_paths": flag("use_relative_paths"), "use_relative_hooks": flag("use_relative_hooks"),
+             "deps": {}, "hooks": [], "recursedeps": [], "errors": []}
+
+    def active(what, condition):
+        if not condition:
             return True
+        try:
+            return eval_deps_condition(condition, condition_vars)
+        except DepsEvalError as e:
+            graph["errors"].append(f"{what}: {e}")
+            return None
+
+    if isinstance(assignments.get("deps"), ast.Dict):
+        for key, value in zip(assignments["deps"].keys, assignments["deps"].values):
+            path = _eval_deps_expr(key, variables)
+            entry = _deps_entry(path, _eval_deps_expr(value, variables), variables)
+            entry["active"] = active(f"'{path}'", entry["condition"])
+            entry["span"] = _deps_item_span(text, offset, key, value)
+            graph["deps"][path] = entry
+    if isinstance(assignments.get("hooks"), ast.List):
+        for element in assignments["hooks"].elts:
+            hook = _eval_deps_expr(element, variables)
+            graph["hooks"].append({"name": hook.get("name"), "action": [str(argument) for argument in hook.get("action", [])], "cwd": hook.get("cwd"),
+                                   "condition": hook.get("condition"), "active": active(f"hook '{hook.get('name')}'", hook.get("condition")),
+                                   "span": _deps_item_span(text, offset, element, element)})
+    if isinstance(assignments.get("recursedeps"), (ast.List, ast.Tuple)):
+        for element in assignments["recursedeps"].elts:
+            value = _eval_deps_expr(element, variables)
+            graph["recursedeps"].append({"path": value[0] if isinstance(value, list) else value, "span": _deps_item_span(text, offset, element, element)})
+    return graph
+
+def _deps_rule_matches(rule: str, entry: dict) -> bool:
+    if rule.startswith("package:"):
+        return any(fnmatch.fnmatchcase(package["package"] or "", rule[len("package:"):]) for package in entry["packages"])
+    rule = rule.rstrip("/")
+    return fnmatch.fnmatchcase(entry["path"], rule) or fnmatch.fnmatchcase(entry["path"], rule + "/*")
+
+def plan_deps_pruning(graph: dict, mode: str = None) -> dict:
+    """{pruned path: reason} under DEPS_PRUNE_MODE (or `mode`): the deny rule that matched, or "not allowed" in allow mode."""
+    mode = mode or DEPS_PRUNE_MODE
+    pruned = {}
+    if mode == "off":
+        return pruned
+    for path, entry in graph["deps"].items():
+        rule = next((rule for rule in DEPS_PRUNE_DENY if _deps_rule_matches(rule, entry)), None)
+        if rule is not None:
+            pruned[path] = f"deny {rule}"
+        elif mode == "allow" and not any(_deps_rule_matches(rule, entry) for rule in DEPS_PRUNE_ALLOW):
+            pruned[path] = "not allowed"
+    return pruned
+
+def _deps_hook_target(hook: dict, paths) -> str:
+    """The first of `paths` one of the hook's action arguments points into, or None."""
+    for argument in hook["action"]:
+        padded = "/" + argument.replace("\\", "/") + "/"
+        for path in paths:
+            if "/" + path + "/" in padded:
+                return path
+    return None
 
+def prune_deps_text(text: str) -> str:
+    """Patch transform: DEPS `text` without the entries plan_deps_pruning() prunes, the hooks running their scripts and their recursedeps."""
+    graph = evaluate_deps(text)
+    pruned = plan_deps_pruning(graph)
+    if not pruned:
+        return text
+    editor = GnEditor(text)
+    for path in pruned:
+        editor.replace(*graph["deps"][path]["span"], "")
+    for hook in graph["hooks"]:
+        if _deps_hook_target(hook, pruned):
+            editor.replace(*hook["span"], "")
+    for recursedep in graph["recursedeps"]:
+        if recursedep["path"] in pruned:
+            editor.replace(*recursedep["span"], "")
+    return editor.apply()
+
+def _pristine_deps_text(v8_source_dir: str, env=None) -> str:
+    """DEPS as committed at the checked-out V8 revision (the working tree copy may be pruned already), else the file itself."""
+    if (Path(v8_source_dir) / ".git").exists():
+        cp = subprocess.run(["git", "show", "HEAD:DEPS"], cwd=v8_source_dir, env=env, capture_output=True, text=True, encoding="utf-8", errors="replace")
+        if cp.returncode == 0:
+            return cp.stdout
+    return (Path(v8_source_dir) / "DEPS").read_text(encoding="utf-8")
+
+def report_deps_pruning(v8_source_dir: str, root_dir: str, env=None) -> dict:
+    """
+    Evaluates the pristine DEPS of the V8 checkout and logs what pruning leaves out: git repositories, CIPD
+    packages and GCS objects, and their size where it is known (GCS size_bytes, or an existing checkout or
+    git cache mirror of the entry). Recorded as "deps_pruning" in the run summary. Returns the summary, or
+    None when DEPS cannot be evaluated.
+    """
+    try:
+        graph = evaluate_deps(_pristine_deps_text(v8_source_dir, env))
+    except Exception as e:
+        log("WARN", f"Could not evaluate DEPS for the pruning report: {e}", to_console=True)
+        return None
+    pruned = plan_deps_pruning(graph)
+    base = Path(v8_source_dir) if graph["use_relative_paths"] else Path(root_dir)
+    entries = []
+    for path, reason in pruned.items():
+        entry = graph["deps"][path]
+        size = entry["size_bytes"]
+        if size is None and entry["dep_type"] == "git":
+            for candidate in (base / path, git_cache_mirror_path(entry["url"]) if GIT_CACHE_DIR and entry["url"] else None):
+                if candidate is not None and candidate.is_dir():
+                    size = _dir_size(candidate)
+                    break
+        entries.append({"path": path, "dep_type": entry["dep_type"], "url": entry["url"] or [package["package"] for package in entry["packages"]],
+                        "active": entry["active"], "reason": reason, "bytes": size})
+    avoided = [entry for entry in entries if entry["active"] is not False] # Inactive entries are not synced either way
+    hooks = [hook["name"] for hook in graph["hooks"] if _deps_hook_target(hook, pruned)]
+    active_count = sum(1 for entry in graph["deps"].values() if entry["active"] is not False)
+    summary = {
+        "mode": DEPS_PRUNE_MODE, "entries": len(graph["deps"]), "active": active_count, "kept": active_count - len(avoided),
+        "repos_avoided": sum(1 for entry in avoided if entry["dep_type"] == "git"),
+        "cipd_packages_avoided": sum(len(graph["deps"][entry["path"]]["packages"]) for entry in avoided if entry["dep_type"] == "cipd"),
+        "gcs_objects_avoided": sum(graph["deps"][entry["path"]]["objects"] for entry in avoided if entry["dep_type"] == "gcs"),
+        "bytes_avoided": sum(entry["bytes"] or 0 for entry in avoided), "unmeasured": sum(1 for entry in avoided if entry["bytes"] is None),
+        "hooks_dropped": hooks, "pruned": entries, "errors": graph["errors"],
+    }
+    log("INFO", f"DEPS pruning ({DEPS_PRUNE_MODE}): {len(avoided)} of {active_count} active entries left out ({summary['repos_avoided']} git "
+                f"repositories, {summary['cipd_packages_avoided']} CIPD packages, {summary['gcs_objects_avoided']} GCS objects), "
+                f"{summary['bytes_avoided'] / (1024 * 1024):.1f} MiB avoided" + (f" ({summary['unmeasured']} not measured)" if summary["unmeasured"] else "")
+                + (f"; hooks dropped: {', '.join(hooks)}" if hooks else "") + ".", to_console=True)
+    for entry in entries:
+        log("DEBUG", f"DEPS pruned: '{entry['path']}' ({entry['dep_type']}, {entry['reason']}" + (", inactive" if entry["active"] is False else "")
+                     + (f", {entry['bytes'] / 1024:.0f} KiB" if entry["bytes"] is not None else "") + ").", to_console=False)
+    for error in graph["errors"]:
+        log("WARN", f"DEPS condition not evaluated: {error}", to_console=False)
+    record_run_summary("deps_pruning", summary)
+    return summary
+
+def print_deps_graph(v8_source_dir: str) -> bool:
+    """Prints the evaluated DEPS of the V8 checkout, one entry per line with its pruning decision. False if DEPS cannot be evaluated."""
+    try:
+        graph = evaluate_deps(_pristine_deps_text(v8_source_dir))
     except Exception as e:
-        log("ERROR", f"Failed to patch '{dotfile_settings_path.name}': {e}", to_console=True)
+        print(f"Could not evaluate {Path(v8_source_dir) / 'DEPS'}: {e}", file=sys.stderr)
         return False
+    pruned = plan_deps_pruning(graph)
+    for path, entry in sorted(graph["deps"].items()):
+        state = "pruned" if path in pruned else {True: "synced", False: "inactive", None: "unknown"}[entry["active"]]
+        source = f"{entry['url']}@{entry['revision'] or 'HEAD'}" if entry["dep_type"] == "git" else \
+            ", ".join(package["package"] for package in entry["packages"]) or entry["url"] or f"{entry['objects']} object(s)"
+        print(f"{state:<8} {entry['dep_type']:<4} {path:<48} {source}" + (f"  [{pruned[path]}]" if path in pruned else ""))
+    for hook in graph["hooks"]:
+        target = _deps_hook_target(hook, pruned)
+        print(f"{'dropped' if target else 'hook':<8} {'':<4} {hook['name'] or '(unnamed)':<48} {' '.join(hook['action'])}" + (f"  [runs {target}]" if target else ""))
+    return True
 
-def _patch_visual_studio_version_gni(v8_source_dir: str, env: dict) -> bool:
+# ----------------------------
+# === Declarative patch engine ===
+# ----------------------------
+# Every MinGW source patch is a spec: which text it targets (pattern / anchor), what it turns it into
+# (replacement), and how to tell it is already applied (marker). Patterns are compiled once at import,
+# all specs for a file run in one read-transform-write pass and each spec reports its own outcome:
+#   applied - the spec changed the text
+#   already - the marker was present, or the pattern matched but the text was already in patched form
+#   miss    - the pattern/anchor was not found (fatal only for specs marked required)
+#   skipped - a conditional spec (fallback_for / when_changed) did not need to run
+#   cached  - (whole file) byte-identical to the output this spec set produced before; no regex work done
+PATCH_APPLIED, PATCH_ALREADY, PATCH_MISS, PATCH_SKIPPED, PATCH_CACHED = "applied", "already", "miss", "skipped", "cached"
+
+_patch_report_lock = threading.Lock()
+_patch_report = {} # file -> {spec name: status}, added to the run summary
+
+# Patch patterns run over whole upstream files, so a pattern that backtracks badly on a layout it was not
+# written for hangs the build without output. The shape behind the old hangs is the open-ended sweep: a
+# lazy `[\s\S]*?X`, `.*?X` under re.DOTALL or `[^}]*?}` runs to the end of the file when X (or `}`) is
+# missing, and is rescanned from every later start position, quadratic overall. Every pattern is checked for
+# it when its spec is built (at import) and rejected; such a construct is written as a ScanPattern instead,
+# which finds the body in linear time. `--benchmark` runs every spec set on adversarial inputs, and each spec
+# application additionally runs under PATCH_SPEC_TIME_BUDGET.
+_REGEX_ATOM = re.compile(r"\\.|\[\^?\]?(?:\\.|[^\]\\])*\]|.", re.DOTALL) # An escape, a character class or one character
+_REGEX_UNBOUNDED = re.compile(r"(?:[*+]|\{\d*,\})(\?)?") # An unbounded quantifier; group 1 marks a lazy one
+_REGEX_ANY_CLASSES = {r"[\s\S]", r"[\S\s]", r"[\d\D]", r"[\D\d]", r"[\w\W]", r"[\W\w]"}
+
+class RegexHazardError(ValueError):
+    """A patch pattern can backtrack catastrophically."""
+
+def regex_backtracking_hazards(pattern) -> list:
     """
-    Patches V8_SRC/build/config/win/visual_studio_version.gni to provide dummy values
-    for visual_studio_path, visual_studio_version, and visual_studio_runtime_dirs,
-    bypassing dynamic toolchain data fetching and associated errors.
+    The open-ended sweeps in a pattern: unbounded repeats of `[\\s\\S]` (or `.` under re.DOTALL), and lazy
+    unbounded repeats of a negated class that does not exclude newlines. Reads the pattern source only.
     """
-    vs_version_gni_path = Path(v8_source_dir) / "build" / "config" / "win" / "visual_studio_version.gni"
-    if not vs_version_gni_path.exists():
-        log("WARN", f"'{vs_version_gni_path.name}' not found at {vs_version_gni_path}. Skipping patch.", to_console=True)
-        return False
-
-    log("INFO", f"Patching '{vs_version_gni_path.name}' to bypass Visual Studio detection (direct assignment).", to_console=True)
+    compiled = re.compile(pattern, re.MULTILINE) if isinstance(pattern, str) else pattern
+    source, hazards = compiled.pattern, []
+    for atom in _REGEX_ATOM.finditer(source):
+        quantifier = _REGEX_UNBOUNDED.match(source, atom.end())
+        if not quantifier:
+            continue
+        text = atom.group()
+        if (text in _REGEX_ANY_CLASSES or (text == "." and compiled.flags & re.DOTALL)
+                or (text.startswith("[^") and quantifier.group(1) and "\\n" not in text and "\n" not in text)):
+            hazards.append(f"sweep: {text}{quantifier.group()} at offset {atom.start()} can run to the end of the text")
+    return hazards
+
+def _checked_regex(pattern, flags=re.MULTILINE) -> re.Pattern:
+    """Compiles `pattern` and raises RegexHazardError if it can backtrack catastrophically."""
+    compiled = re.compile(pattern, flags) if isinstance(pattern, str) else pattern
+    hazards = regex_backtracking_hazards(compiled)
+    if hazards:
+        raise RegexHazardError(f"Patch pattern {compiled.pattern!r}: " + "; ".join(hazards))
+    return compiled
+
+class ScanPattern:
+    """
+    Linear-time stand-in for `OPENER[\\s\\S]*?CLOSER` (and `OPENER[^x]*?CLOSER` when stop="x"): an opener
+    match, then everything up to the first closer match. Unlike the regex, a missing closer is noticed once
+    instead of being rescanned from every later opener. Supports the parts of the re.Pattern API the patch
+    engine uses (search, subn, .pattern); matches are real re.Match objects, so replacements can use groups.
+    """
+    def __init__(self, opener, closer, stop=None, flags=re.MULTILINE):
+        self.opener = _checked_regex(opener, flags)
+        self.closer = _checked_regex(closer, flags)
+        self.stop = stop
+        self.pattern = f"{self.opener.pattern} ... {self.closer.pattern}" + (f" (no {stop!r} between)" if stop else "")
+        # Only ever run on the exact span found by finditer(), so its lazy body cannot rescan.
+        body = "[\\s\\S]*?" if stop is None else f"[^{re.escape(stop)}]*?"
+        self._span_regex = re.compile(f"(?:{self.opener.pattern}){body}(?:{self.closer.pattern})", flags)
+
+    def finditer(self, text, pos=0):
+        # Non-overlapping like re.finditer: the opener scan resumes after each match, so openers inside a
+        # matched span are never tried. The first closer (and stop) at or after a position is reused for
+        # every opener ending before it, so the text between an opener and its closer is searched once.
+        closer_from = stop_from = None
+        while True:
+            opener = self.opener.search(text, pos)
+            if opener is None:
+                return
+            body_start = opener.end()
+            pos = max(body_start, opener.start() + 1)
+            if closer_from is None or body_start < closer_from or (closer is not None and body_start > closer.start()):
+                closer_from, closer = body_start, self.closer.search(text, body_start)
+            if closer is None:
+                return # No closer anywhere after this opener, so none after any later one either.
+            if self.stop is not None:
+                if stop_from is None or body_start < stop_from or (stop_at >= 0 and body_start > stop_at):
+                    stop_from, stop_at = body_start, text.find(self.stop, body_start)
+                if 0 <= stop_at < closer.start():
+                    continue
+            match = self._span_regex.match(text, opener.start(), closer.end())
+            if match is not None:
+                yield match
+                pos = max(pos, match.end())
+
+    def search(self, text, pos=0):
+        return next(self.finditer(text, pos), None)
+
+    def subn(self, replacement, text):
+        out, pos, count = [], 0, 0
+        for match in self.finditer(text):
+            out.append(text[pos:match.start()])
+            out.append(replacement(match) if callable(replacement) else match.expand(replacement))
+            pos, count = match.end(), count + 1
+        out.append(text[pos:])
+        return "".join(out), count
+
+class PatchBudgetExceeded(RuntimeError):
+    """A patch spec ran longer than PATCH_SPEC_TIME_BUDGET on one file."""
+
+@contextlib.contextmanager
+def patch_time_budget(seconds: float):
+    """
+    Raises PatchBudgetExceeded when the block runs longer than `seconds`. On the main thread of a POSIX
+    process a running match is interrupted (SIGALRM; CPython's regex engine polls for signals). Python
+    cannot pre-empt a match anywhere else, so there the overrun is reported as soon as the block returns.
+    """
+    interrupt = seconds > 0 and hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+    if interrupt:
+        def on_alarm(signum, frame):
+            raise PatchBudgetExceeded(f"interrupted after {seconds:g} s")
+        previous = signal.signal(signal.SIGALRM, on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+    start = time.perf_counter()
     try:
-        content = vs_version_gni_path.read_text(encoding="utf-8")
-        patched_content = content
-        modified = False
-
-        # 1. Neutralize the import line for toolchain_data.gni
-        import_toolchain_data_pattern = re.compile(r"^\s*import\s*\(\"//build/toolchain/win/toolchain_data\.gni\"\)\s*\n", re.MULTILINE)
-        if import_toolchain_data_pattern.search(patched_content):
-            patched_content = import_toolchain_data_pattern.sub(r"# CerebrumLux neutralized: \g<0>", patched_content)
-            modified = True
-            log("INFO", f"Neutralized 'import(\"//build/toolchain/win/toolchain_data.gni\")' in '{vs_version_gni_path.name}'.", to_console=False)
-        
-        # 2. Neutralize the 'exec_script' call that populates toolchain_data.
-        exec_script_pattern = re.compile(
-            r"^(?P<indent>\s*)(?:toolchain_data\s*=\s*)?exec_script\s*\(\"..\s*/../vs_toolchain\.py\"[\s\S]*?\)\s*\n",
-            re.MULTILINE | re.DOTALL
-        )
-        if exec_script_pattern.search(patched_content):
-            # FIX (v7.36): Escape captured group for safety before using in replacement
-            patched_content = exec_script_pattern.sub(lambda m: m.group('indent') + "# CerebrumLux neutralized: " + m.group(0).strip().replace('\\', '/') + "\n", patched_content)
-            modified = True
-            log("INFO", f"Neutralized 'exec_script(\"../../vs_toolchain.py\"...)' call in '{vs_version_gni_path.name}'.", to_console=False)
-
-        # 3. Find and replace *all* assignments to visual_studio_path, visual_studio_version, visual_studio_runtime_dirs
-        assignments_to_patch = {
-            "visual_studio_path": '"C:/FakeVS"',
-            "visual_studio_version": '"16.0"',
-            "visual_studio_runtime_dirs": '"C:/FakeVS/VC/Tools/MSVC/14.16.27023/bin/Hostx64/x64"',
-            "windows_sdk_path": '"C:/FakeSDK"', # Added to ensure non-empty for consistency
-            "wdk_path": '"C:/FakeWDK"' # Added to ensure non-empty for consistency
-        }
-
-        for var, dummy_value in assignments_to_patch.items():
-            assignment_pattern = re.compile(rf"^(?P<indent>\s*){re.escape(var)}\s*=\s*.*$", re.MULTILINE)
-            
-            initial_var_content = patched_content
-            while True:
-                new_content_after_sub = assignment_pattern.sub(rf"\g<indent>{var} = {dummy_value} # CerebrumLux MinGW patch", patched_content)
-                if new_content_after_sub == patched_content:
-                    break
-                patched_content = new_content_after_sub
-                if initial_var_content != patched_content:
-                    modified = True
-                    log("INFO", f"Replaced assignment for '{var}' with dummy value in '{vs_version_gni_path.name}'.", to_console=False)
-            
-            if not re.search(rf"^\s*{re.escape(var)}\s*=\s*{re.escape(dummy_value)}", patched_content, re.MULTILINE) and \
-               not re.search(rf"^\s*{re.escape(var)}\s*=\s*[\s\S]*?# CerebrumLux MinGW patch", patched_content, re.MULTILINE):
-                declare_args_block_pattern = re.compile(r"(^\s*declare_args\s*\(\s*\)\s*\{\n)(?P<body_content>[\s\S]*?)(^\s*\}\s*$)", re.MULTILINE | re.DOTALL)
-                match_declare_args = re.search(declare_args_block_pattern, patched_content)
-                if match_declare_args and f"{var} =" not in match_declare_args.group('body_content'):
-                    indent_level_declare_args = re.match(r"^(?P<indent>\s*)", match_declare_args.group(1), re.MULTILINE).group('indent')
-                    insert_text = f"{indent_level_declare_args}  {var} = {dummy_value} # CerebrumLux MinGW injected default\n"
-                    patched_content = patched_content[:match_declare_args.start('body_content')] + \
-                                      insert_text + \
-                                      patched_content[match_declare_args.start('body_content'):]
-                    modified = True
-                    log("INFO", f"Injected default assignment for '{var}' into 'declare_args()' in '{vs_version_gni_path.name}' as a fallback.", to_console=False)
-
-
-        # --- Extra fallback patch for missing toolchain_data.vs_path (GN gen stage) ---
-        toolchain_patch_pattern = re.compile(
-            r"^\s*visual_studio_path\s*=\s*toolchain_data\.vs_path.*$",
-            re.MULTILINE
-        )
-        if toolchain_patch_pattern.search(patched_content):
-            patched_content = toolchain_patch_pattern.sub(
-                'visual_studio_path = "C:/FakeVS" # CerebrumLux: bypass missing toolchain_data.vs_path',
-                patched_content
-            )
-            modified = True
-            log("INFO", f"Replaced toolchain_data.vs_path with dummy string assignment.", to_console=True)
-
-        # --- Extra fallback patch for missing toolchain_data.sdk_path (GN gen stage) ---
-        sdk_patch_pattern = re.compile(
-            r"^\s*windows_sdk_path\s*=\s*toolchain_data\.sdk_path.*$",
-            re.MULTILINE
-        )
-        if sdk_patch_pattern.search(patched_content):
-            patched_content = sdk_patch_pattern.sub(
-                'windows_sdk_path = "C:/FakeSDK" # CerebrumLux: bypass missing toolchain_data.sdk_path',
-                patched_content
-            )
-            modified = True
-            log("INFO", f"Replaced toolchain_data.sdk_path with dummy string assignment.", to_console=True)
-
-        # --- Extra fallback patch for missing toolchain_data.wdk_dir (GN gen stage) ---
-        wdk_patch_pattern = re.compile(
-            r"^\s*wdk_path\s*=\s*toolchain_data\.wdk_dir.*$",
-            re.MULTILINE
-        )
-        if wdk_patch_pattern.search(patched_content):
-            patched_content = wdk_patch_pattern.sub(
-                'wdk_path = "C:/FakeWDK" # CerebrumLux: bypass missing toolchain_data.wdk_dir',
-                patched_content
-            )
-            modified = True
-            log("INFO", f"Replaced toolchain_data.wdk_dir with dummy string assignment.", to_console=True)
-
-        if modified:
-            patched_content = _filter_gn_comments(patched_content) # Apply general comment filter
-            vs_version_gni_path.write_text(patched_content, encoding="utf-8")
-            log("INFO", f"'{vs_version_gni_path.name}' patched successfully.", to_console=True)
-            run(["git", "add", str(vs_version_gni_path)], cwd=v8_source_dir, env=env, check=False)
-            log("INFO", f"Staged '{vs_version_gni_path.name}' changes with 'git add'.", to_console=True)
-            return True
-        else:
-            log("INFO", f"'{vs_version_gni_path.name}' already patched or no changes needed.", to_console=False)
-            run(["git", "add", str(vs_version_gni_path)], cwd=v8_source_dir, env=env, check=False)
-            log("INFO", f"Ensured '{vs_version_gni_path.name}' is staged with 'git add'.", to_console=True)
-            return True
+        yield
+    finally:
+        if interrupt:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    elapsed = time.perf_counter() - start
+    if seconds > 0 and elapsed > seconds:
+        raise PatchBudgetExceeded(f"took {elapsed:.1f} s")
+
+def _compile(pattern, flags=re.MULTILINE):
+    return pattern if isinstance(pattern, ScanPattern) else _checked_regex(pattern, flags)
+
+def patch_spec(name, kind="sub", pattern=None, replacement="", flags=re.MULTILINE, anchor=None, marker=None,
+               requires=None, fallback_for=None, required=False, when_changed=False, transform=None, settings=None) -> dict:
+    """
+    Builds a patch spec. kind is one of:
+      sub            - pattern.sub(replacement) on the text after `anchor` (whole text if no anchor)
+      insert_after   - insert replacement (str or callable(match)) after the first pattern match
+      insert_before  - insert replacement before the first pattern match
+      prepend/append - add replacement at the start/end of the file
+      transform      - replace the text with transform(text)
+      gn             - transform(tree, editor) records span edits on the parsed GN file and returns how
+                       many it made; consecutive gn specs share one parse and one splice
+    marker (str or regex): the spec is already applied when it is found in the text.
+    requires (regex): the spec only runs when this matches; otherwise it is a miss.
+    fallback_for: only runs when the named spec was a miss.
+    when_changed: only runs when an earlier spec changed the text.
+    settings: callable returning the configuration the spec reads besides the text (part of its digest).
+    """
+    assert kind in ("sub", "insert_after", "insert_before", "prepend", "append", "transform", "gn"), kind
+    return {
+        "name": name, "kind": kind,
+        "pattern": _compile(pattern, flags) if pattern is not None else None,
+        "replacement": replacement,
+        "anchor": _compile(anchor) if anchor is not None else None,
+        "marker": _compile(marker) if isinstance(marker, re.Pattern) else marker,
+        "requires": _compile(requires) if requires is not None else None,
+        "fallback_for": fallback_for, "required": required, "when_changed": when_changed,
+        "transform": transform, "settings": settings,
+    }
 
-    except Exception as e:
-        log("ERROR", f"Failed to patch '{vs_version_gni_path.name}': {e}", to_console=True)
+def _marker_present(marker, text) -> bool:
+    if marker is None:
         return False
+    return bool(marker.search(text)) if isinstance(marker, re.Pattern) else marker in text
+
+def _spec_gate(spec, text, original, statuses):
+    """Status that settles `spec` without running it (skipped / already / miss), or None if it must run."""
+    if spec["fallback_for"] and statuses.get(spec["fallback_for"]) != PATCH_MISS:
+        return PATCH_SKIPPED
+    if spec["when_changed"] and text == original:
+        return PATCH_SKIPPED
+    if _marker_present(spec["marker"], text):
+        return PATCH_ALREADY
+    if spec["requires"] is not None and not spec["requires"].search(text):
+        return PATCH_MISS
+    return None
 
-def _patch_setup_toolchain_py(v8_source_dir: str, env: dict) -> bool:
+def _apply_one_spec(spec, text, original, statuses):
+    """Applies a single spec to `text`. Returns (new_text, status, replacements)."""
+    gate = _spec_gate(spec, text, original, statuses)
+    if gate is not None:
+        return text, gate, 0
+
+    kind, replacement = spec["kind"], spec["replacement"]
+    if kind == "sub":
+        start = 0
+        if spec["anchor"] is not None:
+            anchor_match = spec["anchor"].search(text)
+            if not anchor_match:
+                return text, PATCH_MISS, 0
+            start = anchor_match.end()
+        region, count = spec["pattern"].subn(replacement, text[start:])
+        if not count:
+            return text, PATCH_MISS, 0
+        new_text = text[:start] + region
+        return new_text, PATCH_APPLIED if new_text != text else PATCH_ALREADY, count
+    if kind in ("insert_after", "insert_before"):
+        match = spec["pattern"].search(text)
+        if not match:
+            return text, PATCH_MISS, 0
+        insert = replacement(match) if callable(replacement) else replacement
+        point = match.end() if kind == "insert_after" else match.start()
+        return text[:point] + insert + text[point:], PATCH_APPLIED, 1
+    if kind == "prepend":
+        return replacement + text, PATCH_APPLIED, 1
+    if kind == "append":
+        return text.rstrip() + "\n" + replacement, PATCH_APPLIED, 1
+    new_text = spec["transform"](text)
+    return new_text, PATCH_APPLIED if new_text != text else PATCH_ALREADY, int(new_text != text)
+
+def run_patch_specs(specs: list, original: str, path: Path):
     """
-    Patches V8_SRC/build/toolchain/win/setup_toolchain.py to bypass
-    calls to vs_toolchain.DetectVisualStudioPath, vs_toolchain.GetVisualStudioVersion,
-    and _LoadToolchainEnv to return a dummy environment for MinGW.
+    Text-only core of apply_patch_specs(): runs `specs` over `original` (`path` is only used in messages).
+    Returns (text, statuses, results); text is None when a spec raised or a required spec missed.
     """
-    setup_toolchain_path = Path(v8_source_dir) / "build" / "toolchain" / "win" / "setup_toolchain.py"
-    if not setup_toolchain_path.exists():
-        log("WARN", f"'{setup_toolchain_path.name}' not found at {setup_toolchain_path}. Skipping patch.", to_console=True)
-        return False
+    text, statuses, results = original, {}, []
+    gn_session = None # (tree, editor) shared by a run of consecutive "gn" specs
+    for index, spec in enumerate(specs):
+        try:
+            with patch_time_budget(PATCH_SPEC_TIME_BUDGET):
+                if spec["kind"] == "gn":
+                    if gn_session is None:
+                        gn_session = (gn_parse(text), GnEditor(text))
+                    status, count = _spec_gate(spec, text, original, statuses), 0
+                    if status is None:
+                        count = spec["transform"](*gn_session)
+                        status = PATCH_APPLIED if count else PATCH_MISS
+                    if index + 1 == len(specs) or specs[index + 1]["kind"] != "gn":
+                        text, gn_session = gn_session[1].apply(), None
+                else:
+                    text, status, count = _apply_one_spec(spec, text, original, statuses)
+        except PatchBudgetExceeded as e:
+            target = _pattern_token(spec["pattern"]) or getattr(spec["transform"], "__name__", spec["kind"])
+            log("ERROR", f"Patch spec '{spec['name']}' exceeded its {PATCH_SPEC_TIME_BUDGET:g} s time budget on '{path}' ({e}). "
+                         f"'{path.name}' probably has a layout the spec was not written for, and {target!r} backtracks on it. "
+                         f"The file is left unchanged.", to_console=True)
+            return None, statuses, results
+        except GnSyntaxError as e:
+            log("ERROR", f"Could not parse '{path}' as GN: {e}. The file is left unchanged; if it was damaged by an "
+                         f"earlier patch, restore it with 'git checkout -- {path.name}' in its directory and re-run.", to_console=True)
+            return None, statuses, results
+        except Exception as e:
+            log("ERROR", f"Patch spec '{spec['name']}' failed on '{path.name}': {e}", to_console=True)
+            return None, statuses, results
+        statuses[spec["name"]] = status
+        results.append((spec["name"], status, count))
+        log("DEBUG", f"Patch '{path.name}' :: {spec['name']}: {status}" + (f" ({count}x)" if count > 1 else ""), to_console=False)
+        if status == PATCH_MISS and spec["required"]:
+            log("ERROR", f"Required patch spec '{spec['name']}' did not match in '{path.name}'. File left unchanged.", to_console=True)
+            return None, statuses, results
+    return text, statuses, results
+
+def apply_patch_specs(path: Path, specs: list) -> dict:
+    """
+    Applies `specs` to `path` in a single read-transform-write pass.
+    Returns {"ok", "changed", "results": [(name, status, count), ...]}. ok is False when the file is
+    missing, unreadable or a required spec missed; the file is left untouched in that case.
+    A pristine copy is kept next to the file as <name>.cerebrumlux.bak the first time it is changed.
+    """
+    result = {"ok": False, "changed": False, "results": []}
+    try:
+        raw = path.read_bytes()
+        original = raw.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n") # Same newline handling as read_text()
+    except Exception as e:
+        log("ERROR", f"Could not read '{path}' for patching: {e}", to_console=True)
+        return result
+
+    specs_digest = spec_set_digest(specs)
+    if _patch_cache_lookup(path, hashlib.sha256(raw).hexdigest(), specs_digest):
+        result["ok"] = True
+        result["results"].append(("(patch cache)", PATCH_CACHED, 0))
+        with _patch_report_lock:
+            _patch_report[path.as_posix()] = {"(patch cache)": PATCH_CACHED}
+        log("INFO", f"'{path.name}' is byte-identical to its last patched output; skipping (patch cache).", to_console=False)
+        return result
+
+    text, statuses, result["results"] = run_patch_specs(specs, original, path)
+    if text is None:
+        return result
+
+    with _patch_report_lock:
+        _patch_report[path.as_posix()] = dict(statuses)
+    tally = collections.Counter(statuses.values())
+    summary = ", ".join(f"{tally[s]} {s}" for s in (PATCH_APPLIED, PATCH_ALREADY, PATCH_MISS) if tally[s])
+    result["ok"] = True
+    if text == original:
+        log("INFO", f"'{path.name}' already patched or no changes needed ({summary}).", to_console=False)
+        _patch_cache_store(path, hashlib.sha256(raw).hexdigest(), specs_digest)
+        return result
 
-    log("INFO", f"Patching '{setup_toolchain_path.name}' to completely replace _LoadToolchainEnv and create dummy paths (using .as_posix()).", to_console=True)
     try:
-        content = setup_toolchain_path.read_text(encoding="utf-8")
-        patched_content = content
-        modified = False
+        bak_path = path.with_suffix(path.suffix + ".cerebrumlux.bak")
+        if not bak_path.exists():
+            bak_path.write_bytes(original.encode("utf-8", errors="replace"))
+            log("DEBUG", f"Created backup of original '{path.name}' at '{bak_path.name}'.", to_console=False)
+    except Exception as e:
+        log("WARN", f"Could not write backup of '{path.name}': {e}", to_console=False)
+    path.write_text(text, encoding="utf-8")
+    _patch_cache_store(path, _sha256_file(path), specs_digest) # Hash what is on disk (write_text translates newlines)
+    result["changed"] = True
+    log("INFO", f"'{path.name}' patched successfully ({summary}).", to_console=True)
+    return result
+
+# Patch cache: file path -> {"sha256": hash of the file as last left by the engine, "specs": spec_set_digest}.
+# A file whose bytes still hash to that value under the same spec set needs no work at all; anything
+# gclient rewrote hashes differently and is patched normally.
+_patch_cache_lock = threading.Lock()
+_patch_cache = None
+
+def _load_patch_cache() -> dict:
+    global _patch_cache
+    if _patch_cache is None:
+        _patch_cache = {}
+        try:
+            with open(PATCH_CACHE_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == PATCH_CACHE_FORMAT_VERSION:
+                _patch_cache = data.get("files", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log("WARN", f"Could not read patch cache {PATCH_CACHE_FILE}: {e}. Starting with an empty cache.", to_console=False)
+    return _patch_cache
+
+def _patch_cache_lookup(path: Path, content_sha256: str, specs_digest: str) -> bool:
+    with _patch_cache_lock:
+        entry = _load_patch_cache().get(path.as_posix())
+    return bool(entry) and entry.get("sha256") == content_sha256 and entry.get("specs") == specs_digest
+
+def _patch_cache_store(path: Path, content_sha256: str, specs_digest: str):
+    """Records `path`'s patched content hash and rewrites PATCH_CACHE_FILE atomically."""
+    with _patch_cache_lock:
+        cache = _load_patch_cache()
+        entry = {"sha256": content_sha256, "specs": specs_digest}
+        if cache.get(path.as_posix()) == entry:
+            return
+        cache[path.as_posix()] = entry
+        try:
+            os.makedirs(os.path.dirname(PATCH_CACHE_FILE), exist_ok=True)
+            tmp_path = PATCH_CACHE_FILE + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": PATCH_CACHE_FORMAT_VERSION, "files": cache}, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, PATCH_CACHE_FILE)
+        except Exception as e:
+            log("WARN", f"Could not write patch cache {PATCH_CACHE_FILE}: {e}", to_console=False)
+
+def patch_report() -> dict:
+    with _patch_report_lock:
+        return {name: dict(statuses) for name, statuses in _patch_report.items()}
+
+def _normalize_gn_list_text(content: str) -> str:
+    """Text transform behind normalize_gn_lists()."""
+    # 1) Remove lines that are only a comma (leftovers from prior aggressive line deletions)
+    #    Example problematic sequence that could be left behind:
+    #      "..., \n    ,\n  ],"
+    content = re.sub(r"(?m)^[ \t]*,[ \t]*\r?\n", "", content)
+
+    # 2) Remove a trailing comma that sits immediately before a closing bracket or brace.
+    #    This pattern fixes cases like:
+    #      "  elem,\n]"
+    #    -> becomes:
+    #      "  elem\n]"
+    content = re.sub(r",\s*(\r?\n)([ \t]*[\]\}])", r"\1\2", content)
+
+    # 3) Also collapse sequences where a comma remains directly before closing on the same line:
+    #    Example: "elem,]" -> "elem]"
+    content = re.sub(r",([ \t]*[\]\}])", r"\1", content)
+    return content
 
-        original_text = "" # FIX (v7.37.18): Initialize original_text here.
+def _neutralize_line(m):
+    """Comments out a matched (possibly multi-line) statement, keeping its indentation."""
+    statement = m.group(0).strip().replace('\\', '/')
+    return m.group('indent') + "# CerebrumLux neutralized: " + statement.replace("\n", "\n" + m.group('indent').lstrip("\r\n") + "# ") + "\n"
+
+# --- build/vs_toolchain.py ---
+VS_TOOLCHAIN_SHIM_MARKER = "# --- CerebrumLux injected shim START (v7.36) ---"
+VS_TOOLCHAIN_SHIM_END = "# --- CerebrumLux injected shim END ---\n"
+_VS_TOOLCHAIN_SHIM = (
+    VS_TOOLCHAIN_SHIM_MARKER + "\n"
+    "import sys\n"
+    "import subprocess\n"
+    "from types import SimpleNamespace\n"
+    "\n"
+    "# The 'pipes' module is removed in Python 3.13+. Provide a compatibility shim.\n"
+    "if 'pipes' not in sys.modules:\n"
+    "    pipes = SimpleNamespace(quote=lambda s: subprocess.list2cmdline([s]))\n"
+    "else:\n"
+    "    pipes = sys.modules['pipes']\n"
+    "\n"
+    "def DetectVisualStudioPath():\n"
+    "    return r'C:\\FakeVS'\n"
+    "\n"
+    "def GetVisualStudioVersion():\n"
+    "    return '16.0'\n"
+    "\n"
+    "def SetEnvironmentAndGetRuntimeDllDirs():\n"
+    "    # CerebrumLux shim: bypass all VS runtime detection for MinGW builds.\n"
+    "    # Return a dummy scope for GN scripts, defining expected variables.\n"
+    "    import os\n"
+    "    os.environ['GYP_MSVS_OVERRIDE_PATH'] = DetectVisualStudioPath()\n"
+    "    os.environ['DEPOT_TOOLS_WIN_TOOLCHAIN'] = '0'\n"
+    "    return {\n"
+    "        'path': DetectVisualStudioPath(),\n"
+    "        'vs_path': DetectVisualStudioPath(),\n"
+    "        'sdk_path': r'C:\\FakeSDK',\n"
+    "        'wdk_path': r'C:\\FakeWDK',\n"
+    "        'runtime_dirs': [r'C:\\FakeVS\\VC\\Tools\\MSVC\\14.16.27023\\bin\\Hostx64\\x64'],\n"
+    "        'version': GetVisualStudioVersion(),\n"
+    "    }\n"
+    + VS_TOOLCHAIN_SHIM_END + "\n"
+)
 
-        pattern_load_toolchain_env = re.compile(
-            r"^(?P<func_def>def\s+_LoadToolchainEnv\([^)]*\):)(?P<body>(?:\n\s+.*)*?)(?=\n^def|\Z)", # Matches the entire function body
-            re.MULTILINE | re.DOTALL
-        )
-        if pattern_load_toolchain_env.search(patched_content):
-            fake_vs_root_for_py = Path(V8_ROOT) / "FakeVS_Toolchain"
-            
-            replacement_func_body = f"""def _LoadToolchainEnv(cpu, toolchain_root, win_sdk_path, target_store):
+VS_TOOLCHAIN_PATCH_SPECS = [
+    # Shims injected by older script versions are dropped so the current one can take their place.
+    patch_spec("drop_outdated_shim",
+               pattern=ScanPattern(r"# --- CerebrumLux injected shim START \(v(?!7\.36\))[\d.]+\) ---\n", re.escape(VS_TOOLCHAIN_SHIM_END) + r"\n")),
+    patch_spec("inject_shim", kind="prepend", replacement=_VS_TOOLCHAIN_SHIM, marker=VS_TOOLCHAIN_SHIM_MARKER),
+    # The original definitions (below the shim) would override the shim's, so they are deleted.
+    # A body is every following line that is empty or indented; alternatives are disjoint so the
+    # pattern cannot backtrack exponentially.
+    patch_spec("remove_vs_detection_functions",
+               pattern=r"^def[ \t]+(?:DetectVisualStudioPath|GetVisualStudioVersion|SetEnvironmentAndGetRuntimeDllDirs)[ \t]*\([^()]*\):[^\n]*\n(?:(?:[ \t][^\n]*)?\n)*?(?=\S|\Z)",
+               anchor=re.escape(VS_TOOLCHAIN_SHIM_END)),
+    patch_spec("replace_import_pipes", pattern=r"^([ \t]*)import pipes[ \t]*$",
+               replacement=r"\1# import pipes (replaced by CerebrumLux shim)", anchor=re.escape(VS_TOOLCHAIN_SHIM_END)),
+    patch_spec("neutralize_no_vs_exception",
+               pattern=ScanPattern(r"raise\s+Exception\s*\(\s*['\"]No supported Visual Studio can be found", r"\)[ \t]*"),
+               replacement="# CerebrumLux neutralized original exception: No supported Visual Studio can be found."),
+]
+
+# --- build/dotfile_settings.gni ---
+DOTFILE_SETTINGS_PATCH_SPECS = [
+    patch_spec("exec_script_whitelist", kind="insert_after",
+               pattern=r"^(?P<indent>[ \t]*)build_dotfile_settings\s*=\s*\{",
+               replacement=lambda m: f"\n{m.group('indent')}  exec_script_whitelist = []",
+               marker="exec_script_whitelist", required=True),
+    patch_spec("filter_gn_comments", kind="transform", transform=_filter_gn_comments, when_changed=True),
+]
+
+# --- build/config/win/visual_studio_version.gni ---
+_VS_VERSION_GNI_VALUES = {
+    "visual_studio_path": '"C:/FakeVS"',
+    "visual_studio_version": '"16.0"',
+    "visual_studio_runtime_dirs": '"C:/FakeVS/VC/Tools/MSVC/14.16.27023/bin/Hostx64/x64"',
+    "windows_sdk_path": '"C:/FakeSDK"',
+    "wdk_path": '"C:/FakeWDK"',
+}
+VS_VERSION_GNI_PATCH_SPECS = [
+    patch_spec("neutralize_toolchain_data_import",
+               pattern=r"^[ \t]*import\s*\(\"//build/toolchain/win/toolchain_data\.gni\"\)[ \t]*\n",
+               replacement=r"# CerebrumLux neutralized: \g<0>"),
+    patch_spec("neutralize_vs_toolchain_exec_script",
+               pattern=ScanPattern(r"^(?P<indent>[ \t]*)(?:toolchain_data\s*=\s*)?exec_script\s*\(\"\.\.\s*/\.\./vs_toolchain\.py\"", r"\)\s*\n"),
+               replacement=_neutralize_line),
+] + [
+    # Variables the file never assigns get a default inside declare_args().
+    patch_spec(f"default_{var}", kind="insert_after",
+               pattern=r"^(?P<indent>[ \t]*)declare_args\s*\(\s*\)\s*\{\n",
+               replacement=lambda m, var=var, value=value: f"{m.group('indent')}  {var} = {value} # CerebrumLux MinGW injected default\n",
+               marker=re.compile(rf"^[ \t]*{re.escape(var)}\s*=", re.MULTILINE))
+    for var, value in _VS_VERSION_GNI_VALUES.items()
+] + [
+    # One pass replaces every assignment of the five variables with its dummy value.
+    patch_spec("dummy_vs_assignments",
+               pattern=r"^(?P<indent>[ \t]*)(?P<var>" + "|".join(_VS_VERSION_GNI_VALUES) + r")\s*=\s*.*$",
+               replacement=lambda m: f"{m.group('indent')}{m.group('var')} = {_VS_VERSION_GNI_VALUES[m.group('var')]} # CerebrumLux MinGW patch"),
+    patch_spec("filter_gn_comments", kind="transform", transform=_filter_gn_comments, when_changed=True),
+]
+
+# --- build/toolchain/win/setup_toolchain.py ---
+_FAKE_VS_ROOT_POSIX = fake_vs_base_path_obj.as_posix()
+_LOAD_TOOLCHAIN_ENV_REPLACEMENT = f"""def _LoadToolchainEnv(cpu, toolchain_root, win_sdk_path, target_store):
     # CerebrumLux MinGW patch: Bypassed vcvarsall.bat check and returning a dummy env.
     # The actual toolchain paths are provided in args.gn or directly configured by build_v8.py.
     # Dummy directories created by _create_fake_vs_toolchain_dirs in main().
     from pathlib import Path # Ensure Path is available within the injected function
     import os # Ensure os is available for checking/creating directories
     # Ensure dummy directories are created for the paths returned
-    Path(r"{fake_vs_root_for_py.as_posix()}/VC/bin").mkdir(parents=True, exist_ok=True)
-    Path(r"{fake_vs_root_for_py.as_posix()}/VC/lib").mkdir(parents=True, exist_ok=True)
-    Path(r"{fake_vs_root_for_py.as_posix()}/VC/include").mkdir(parents=True, exist_ok=True)
-    Path(r"{fake_vs_root_for_py.as_posix()}/SDK").mkdir(parents=True, exist_ok=True)
-    Path(r"{fake_vs_root_for_py.as_posix()}/SDK/lib").mkdir(parents=True, exist_ok=True)
-    Path(r"{fake_vs_root_for_py.as_posix()}/SDK/include").mkdir(parents=True, exist_ok=True)
-    Path(r"{fake_vs_root_for_py.as_posix()}/redist").mkdir(parents=True, exist_ok=True)
+    Path(r"{_FAKE_VS_ROOT_POSIX}/VC/bin").mkdir(parents=True, exist_ok=True)
+    Path(r"{_FAKE_VS_ROOT_POSIX}/VC/lib").mkdir(parents=True, exist_ok=True)
+    Path(r"{_FAKE_VS_ROOT_POSIX}/VC/include").mkdir(parents=True, exist_ok=True)
+    Path(r"{_FAKE_VS_ROOT_POSIX}/SDK").mkdir(parents=True, exist_ok=True)
+    Path(r"{_FAKE_VS_ROOT_POSIX}/SDK/lib").mkdir(parents=True, exist_ok=True)
+    Path(r"{_FAKE_VS_ROOT_POSIX}/SDK/include").mkdir(parents=True, exist_ok=True)
+    Path(r"{_FAKE_VS_ROOT_POSIX}/redist").mkdir(parents=True, exist_ok=True)
     
     return {{
-        "vc_bin_dir": (Path(r"{fake_vs_root_for_py.as_posix()}") / "VC" / "Tools" / "Bin" / "Hostx64" / "x64").as_posix(),
-        "vc_lib_path": (Path(r"{fake_vs_root_for_py.as_posix()}") / "VC" / "lib").as_posix(),
-        "vc_include_path": (Path(r"{fake_vs_root_for_py.as_posix()}") / "VC" / "include").as_posix(),
-        "sdk_dir": (Path(r"{fake_vs_root_for_py.as_posix()}") / "SDK").as_posix(),
-        "sdk_lib_path": (Path(r"{fake_vs_root_for_py.as_posix()}") / "SDK" / "lib").as_posix(),
-        "sdk_include_path": (Path(r"{fake_vs_root_for_py.as_posix()}") / "SDK" / "include").as_posix(),
-        "runtime_dirs": (Path(r"{fake_vs_root_for_py.as_posix()}") / "redist").as_posix()
+        "vc_bin_dir": (Path(r"{_FAKE_VS_ROOT_POSIX}") / "VC" / "Tools" / "Bin" / "Hostx64" / "x64").as_posix(),
+        "vc_lib_path": (Path(r"{_FAKE_VS_ROOT_POSIX}") / "VC" / "lib").as_posix(),
+        "vc_include_path": (Path(r"{_FAKE_VS_ROOT_POSIX}") / "VC" / "include").as_posix(),
+        "sdk_dir": (Path(r"{_FAKE_VS_ROOT_POSIX}") / "SDK").as_posix(),
+        "sdk_lib_path": (Path(r"{_FAKE_VS_ROOT_POSIX}") / "SDK" / "lib").as_posix(),
+        "sdk_include_path": (Path(r"{_FAKE_VS_ROOT_POSIX}") / "SDK" / "include").as_posix(),
+        "runtime_dirs": (Path(r"{_FAKE_VS_ROOT_POSIX}") / "redist").as_posix()
     }}
 """
-            patched_content = pattern_load_toolchain_env.sub(replacement_func_body, patched_content)
-            modified = True
-            log("INFO", f"Replaced '_LoadToolchainEnv' function body in '{setup_toolchain_path.name}' with full dummy environment (using .as_posix()).", to_console=False)
-        else:
-            # Fallback for older structures (should not be hit with current _LoadToolchainEnv replacement)
-            # Patch _DetectVisualStudioPath
-            pattern_detect_vs_path = re.compile(r"^(?P<indent>\s*)return\s+vs_toolchain\.DetectVisualStudioPath\(\)\s*$", re.MULTILINE)
-            if pattern_detect_vs_path.search(patched_content):
-                patched_content = pattern_detect_vs_path.sub(
-                    lambda m: f"{m.group('indent')}return 'C:/FakeVS' # CerebrumLux MinGW patch", # Use / for consistency
-                    patched_content
-                )
-                modified = True
-                log("INFO", f"Patched '_DetectVisualStudioPath' call in '{setup_toolchain_path.name}' (fallback).", to_console=False)
-            
-            # Patch _GetVisualStudioVersion
-            pattern_get_vs_version = re.compile(r"^(?P<indent>\s*)return\s+vs_toolchain\.GetVisualStudioVersion\(\)\s*$", re.MULTILINE)
-            if pattern_get_vs_version.search(patched_content):
-                patched_content = pattern_get_vs_version.sub(
-                    lambda m: f"{m.group('indent')}return '16.0' # CerebrumLux MinGW patch",
-                    patched_content
-                )
-                modified = True
-                log("INFO", f"Patched '_GetVisualStudioVersion' call in '{setup_toolchain_path.name}' (fallback).", to_console=False)
-
-        if modified:
-            patched_content = _filter_gn_comments(patched_content) # Apply general comment filter
-            try:
-                bak_path = setup_toolchain_path.with_suffix(setup_toolchain_path.suffix + ".cerebrumlux.bak")
-                if not bak_path.exists() or original_text != text:
-                    bak_path.write_bytes(original_text.encode("utf-8", errors="replace"))
-                    log("DEBUG", f"Created backup of original '{setup_toolchain_path.name}' at '{bak_path.name}'.", to_console=False)
-            except Exception as e:
-                log("WARN", f"Could not write backup of '{setup_toolchain_path.name}': {e}", to_console=False)
-
-            setup_toolchain_path.write_text(patched_content, encoding="utf-8")
-            log("INFO", f"'{setup_toolchain_path.name}' patched successfully.", to_console=True)
-            run(["git", "add", str(setup_toolchain_path)], cwd=v8_source_dir, env=env, check=False)
-            log("INFO", f"Staged '{setup_toolchain_path.name}' changes with 'git add'.", to_console=True)
-            return True
-        else:
-            log("INFO", f"'{setup_toolchain_path.name}' already patched or no changes needed.", to_console=False)
-            run(["git", "add", str(setup_toolchain_path)], cwd=v8_source_dir, env=env, check=False)
-            log("INFO", f"Ensured '{setup_toolchain_path.name}' is staged with 'git add'.", to_console=True)
-            return True
-
-    except Exception as e:
-        log("ERROR", f"Failed to patch '{setup_toolchain_path.name}': {e}", to_console=True)
-        return False
-
-def _patch_build_gn(v8_source_dir: str, env: dict) -> bool:
-    """
-    Patches V8_SRC/build/config/win/BUILD.gn to aggressively neutralize the 'exec_script' call
-    that populates vcvars_toolchain_data, and replaces ALL references to vcvars_toolchain_data members
-    with hardcoded dummy paths. This removes the dependency on vcvars_toolchain_data from this file
-    to prevent syntax errors like "Expecting assignment or function call. ]," (from v7.30 log).
-    """
-    build_gn_path = Path(v8_source_dir) / "build" / "config" / "win" / "BUILD.gn"
-    if not build_gn_path.exists():
-        log("WARN", f"'{build_gn_path.name}' not found at {build_gn_path}. Skipping patch.", to_console=True)
-        return False
+SETUP_TOOLCHAIN_PATCH_SPECS = [
+    patch_spec("replace_load_toolchain_env",
+               pattern=r"^def\s+_LoadToolchainEnv\([^()]*\):[^\n]*\n(?:(?:[ \t][^\n]*)?\n)*?(?=\S|\Z)",
+               replacement=lambda m: _LOAD_TOOLCHAIN_ENV_REPLACEMENT + "\n\n"),
+    # Older setup_toolchain.py layouts without _LoadToolchainEnv.
+    patch_spec("detect_vs_path_fallback", fallback_for="replace_load_toolchain_env",
+               pattern=r"^(?P<indent>[ \t]*)return\s+vs_toolchain\.DetectVisualStudioPath\(\)\s*$",
+               replacement=lambda m: f"{m.group('indent')}return 'C:/FakeVS' # CerebrumLux MinGW patch"),
+    patch_spec("get_vs_version_fallback", fallback_for="replace_load_toolchain_env",
+               pattern=r"^(?P<indent>[ \t]*)return\s+vs_toolchain\.GetVisualStudioVersion\(\)\s*$",
+               replacement=lambda m: f"{m.group('indent')}return '16.0' # CerebrumLux MinGW patch"),
+]
 
-    log("INFO", f"Patching '{build_gn_path.name}' to aggressively neutralize 'exec_script' and replace ALL vcvars_toolchain_data accesses with dummy paths to fix syntax errors.", to_console=True)
-    try:
-        content = build_gn_path.read_text(encoding="utf-8")
-        patched_content = content
-        modified = False
+# --- build/config/win/BUILD.gn ---
+_DUMMY_VCVARS_PATHS = {
+    "vc_lib_path": (fake_vs_base_path_obj / "VC" / "lib").as_posix(),
+    "vc_lib_atlmfc_path": (fake_vs_base_path_obj / "VC" / "atlmfc" / "lib").as_posix(),
+    "vc_lib_um_path": (fake_vs_base_path_obj / "VC" / "um" / "lib").as_posix(),
+    "vc_lib_ucrt_path": (fake_vs_base_path_obj / "VC" / "ucrt" / "lib").as_posix(),
+    "vc_bin_dir": (fake_vs_base_path_obj / "VC" / "Tools" / "Bin" / "Hostx64" / "x64").as_posix(),
+    "vc_include_path": (fake_vs_base_path_obj / "VC" / "include").as_posix(),
+    "sdk_dir": (fake_vs_base_path_obj / "SDK").as_posix(),
+    "sdk_lib_path": (fake_vs_base_path_obj / "SDK" / "lib").as_posix(),
+    "sdk_include_path": (fake_vs_base_path_obj / "SDK" / "include").as_posix(),
+    "runtime_dirs": (fake_vs_base_path_obj / "redist").as_posix(),
+}
 
-        # --- 1. Neutralize the exec_script call for vcvars_toolchain_data ---
-        exec_script_vcvars_pattern = re.compile(
-            r"^(?P<indent>\s*)vcvars_toolchain_data\s*=\s*exec_script\(\s*\"../../toolchain/win/setup_toolchain\.py\"[\s\S]*?\)\s*\n",
-            re.MULTILINE | re.DOTALL
-        )
-        if exec_script_vcvars_pattern.search(patched_content):
-            # FIX (v7.37.1): Use lambda to correctly apply the backreference and comment out the original line
-            patched_content = exec_script_vcvars_pattern.sub(
-                lambda m: m.group('indent') + "# CerebrumLux neutralized: " + m.group(0).strip().replace('\\', '/') + "\n",
-                patched_content
-            )
-            modified = True
-            log("INFO", f"Neutralized 'exec_script' call for 'vcvars_toolchain_data' in '{build_gn_path.name}'.", to_console=False)
-        else:
-            log("INFO", f"No 'exec_script' call for 'vcvars_toolchain_data' found in '{build_gn_path.name}' or already neutralized. Skipping.", to_console=False)
-
-        # --- 2. Aggressively replace ALL references to vcvars_toolchain_data.<field> with hardcoded dummy paths or 'true' ---
-        fake_vs_base_path_for_gn_obj = fake_vs_base_path_obj # Use the module-level one
-        dummy_vcvars_paths = {
-            "vc_lib_path": (fake_vs_base_path_for_gn_obj / "VC" / "lib").as_posix(),
-            "vc_lib_atlmfc_path": (fake_vs_base_path_for_gn_obj / "VC" / "atlmfc" / "lib").as_posix(),
-            "vc_lib_um_path": (fake_vs_base_path_for_gn_obj / "VC" / "um" / "lib").as_posix(),
-            "vc_lib_ucrt_path": (fake_vs_base_path_for_gn_obj / "VC" / "ucrt" / "lib").as_posix(),
-            "vc_bin_dir": (fake_vs_base_path_for_gn_obj / "VC" / "Tools" / "Bin" / "Hostx64" / "x64").as_posix(),
-            "vc_include_path": (fake_vs_base_path_for_gn_obj / "VC" / "include").as_posix(),
-            "sdk_dir": (fake_vs_base_path_for_gn_obj / "SDK").as_posix(),
-            "sdk_lib_path": (fake_vs_base_path_for_gn_obj / "SDK" / "lib").as_posix(),
-            "sdk_include_path": (fake_vs_base_path_for_gn_obj / "SDK" / "include").as_posix(),
-            "runtime_dirs": (fake_vs_base_path_for_gn_obj / "redist").as_posix(),
-        }
+def _field_alternation(fields) -> str:
+    # Longest first so no field name can shadow a longer one sharing its prefix.
+    return "|".join(re.escape(f) for f in sorted(fields, key=len, reverse=True))
+
+_GN_INTERPOLATION = r"(?<!\\)\$\{\s*%s\.(?P<field>%s)\s*\}"
+
+def _gn_neutralize_exec_script(tree, editor, variable) -> int:
+    """Comments out `<variable> = exec_script(...)` statements."""
+    return sum(editor.comment_out(node) for node in gn_walk(tree)
+               if gn_target_name(node) == variable and node["value"]["type"] == "call" and node["value"]["name"] == "exec_script")
+
+def _gn_replace_scope_fields(tree, editor, scope_name, values) -> int:
+    """Replaces `scope.field` expressions, and ${scope.field} inside strings, with the literal dummy value."""
+    interpolation = re.compile(_GN_INTERPOLATION % (re.escape(scope_name), _field_alternation(values)))
+    count = 0
+    for node in gn_walk(tree):
+        if gn_is_access(node, (scope_name,), values):
+            count += editor.replace(node["start"], node["end"], gn_quote(values[node["member"]]))
+        elif node["type"] == "string" and interpolation.search(node["value"]):
+            expanded = interpolation.sub(lambda m: gn_quote(values[m.group("field")])[1:-1], node["value"])
+            count += editor.replace(node["start"], node["end"], expanded)
+    return count
+
+def _gn_remove_scope_assignments(tree, editor, variable) -> int:
+    return sum(editor.remove_statement(node) for node in gn_walk(tree)
+               if gn_target_name(node) == variable and node["value"]["type"] == "scope")
+
+def _gn_vcvars_defined_checks(tree, editor) -> int:
+    return sum(editor.replace(node["start"], node["end"], "true") for node in gn_walk(tree)
+               if node["type"] == "call" and node["name"] == "defined" and len(node["args"]) == 1
+               and gn_is_access(node["args"][0], ("vcvars_toolchain_data",), _DUMMY_VCVARS_PATHS))
+
+BUILD_GN_PATCH_SPECS = [
+    patch_spec("neutralize_vcvars_exec_script", kind="gn",
+               transform=lambda tree, editor: _gn_neutralize_exec_script(tree, editor, "vcvars_toolchain_data")),
+    # defined() checks go first: the access replacement below then falls inside an edit already made and is dropped.
+    patch_spec("vcvars_defined_checks", kind="gn", transform=_gn_vcvars_defined_checks),
+    patch_spec("vcvars_field_accesses", kind="gn",
+               transform=lambda tree, editor: _gn_replace_scope_fields(tree, editor, "vcvars_toolchain_data", _DUMMY_VCVARS_PATHS)),
+    patch_spec("remove_vcvars_scope", kind="gn",
+               transform=lambda tree, editor: _gn_remove_scope_assignments(tree, editor, "vcvars_toolchain_data")),
+]
 
-        # First, replace defined(vcvars_toolchain_data.<field>) with 'true'
-        for field in dummy_vcvars_paths.keys():
-            defined_pattern = re.compile(
-                r"(?P<prefix>defined\(\s*vcvars_toolchain_data\." + re.escape(field) + r"\s*\))",
-                re.MULTILINE
-            )
-            initial_defined_replace_text = patched_content
-            # Replace defined() call with 'true'.
-            replacement_str = r'true'
-            log("DEBUG", f"Pattern: {defined_pattern.pattern}, Replacement: {replacement_str}", to_console=False)
-            patched_content = defined_pattern.sub(replacement_str, patched_content)
-            if initial_defined_replace_text != patched_content:
-                modified = True
-                log("INFO", f"Replaced 'defined(vcvars_toolchain_data.{field})' with 'true' in '{build_gn_path.name}'.", to_console=False)
-
-        # Then, replace all other accesses/assignments to vcvars_toolchain_data.<field> with dummy paths
-        # FIX (v7.36): Explicitly handle pre_assign and ensure dummy_path is quoted correctly.
-        for field, dummy_path in dummy_vcvars_paths.items():
-            access_pattern = re.compile(
-                r"(?P<pre_assign>\b[a-zA-Z0-9_]+\s*=\s*)?(?P<vcvars_ref>vcvars_toolchain_data\." + re.escape(field) + r")",
-                re.MULTILINE
-            )
-            initial_access_replace_text = patched_content
-
-            def create_replacement_string_for_vcvars(m, current_dummy_path=dummy_path):
-                pre_assign_part = m.group('pre_assign') or ''
-                # Sanitize current_dummy_path for safe use in regex replacement string.
-                sanitized_dummy_path = current_dummy_path.replace('\\', '/')
-                return pre_assign_part + '"' + sanitized_dummy_path + '"'
-
-            log("DEBUG", f"Pattern: {access_pattern.pattern}, Replacement Logic: create_replacement_string_for_vcvars", to_console=False)
-            patched_content = access_pattern.sub(create_replacement_string_for_vcvars, patched_content)
-
-            if initial_access_replace_text != patched_content:
-                modified = True
-                log("INFO", f"Replaced all direct accesses/assignments for 'vcvars_toolchain_data.{field}' with hardcoded dummy path in '{build_gn_path.name}'.", to_console=False)
-        
-        # --- Critical: Remove any remaining `vcvars_toolchain_data` object definitions that might cause syntax errors ---
-        # FIX (v7.37.14): Reverting to replace with a valid empty scope and aggressive inline cleanup.
-        vcvars_data_object_pattern = re.compile(
-            r"^(?P<indent>\s*)vcvars_toolchain_data\s*=\s*\{[\s\S]*?^\s*\}\s*$", # The vcvars_data block
-            re.MULTILINE | re.DOTALL
-        )
-        if vcvars_data_object_pattern.search(patched_content):
-            initial_sub_content = patched_content
-            # Replace the entire block with an empty string to ensure full removal and no residual tokens.
-            patched_content = vcvars_data_object_pattern.sub("", patched_content)
-            if initial_sub_content != patched_content:
-                modified = True
-            log("INFO", "Neutralized direct 'vcvars_toolchain_data' object definition by completely removing its block from 'BUILD.gn'.", to_console=False)
-
-        # --- Aggressively strip any orphaned commas or square brackets that might cause syntax errors (e.g., from removing items from a list) ---
-        orphaned_punctuation_pattern = re.compile(r"^\s*,\s*$", re.MULTILINE) 
-        initial_orphaned_content = patched_content
-        replacement_str = r""
-        log("DEBUG", f"Pattern: {orphaned_punctuation_pattern.pattern}, Replacement: {replacement_str}", to_console=False)
-        patched_content = orphaned_punctuation_pattern.sub(replacement_str, patched_content)
-        if initial_orphaned_content != patched_content:
-            modified = True
-            log("INFO", "Removed orphaned commas to prevent syntax errors.", to_console=False)
-
-        # FIX (v7.37.14): Aggressive inline cleanup of orphaned lines before list/scope terminators
-        # This loop removes any empty or comment-only lines that immediately precede a closing ']', '}', or ')'.
-        # This is CRITICAL for resolving persistent GN parsing errors.
-        lines = patched_content.split('\n')
-        cleaned_lines = []
-        for i in range(len(lines)):
-            line = lines[i]
-            stripped_line = line.strip()
-            
-            # Check if the next non-empty/non-comment line is a closing delimiter ']', '}', or ')'
-            next_line_is_terminator = False
-            for j in range(i + 1, len(lines)):
-                stripped_next_line = lines[j].strip()
-                if stripped_next_line and not stripped_next_line.startswith('#'):
-                    if stripped_next_line in (']', '}', ')'):
-                        next_line_is_terminator = True
-                    break # Found next non-empty/non-comment line
-            
-            # If current line is only whitespace/comment AND the next significant line is a terminator, skip it.
-            if (not stripped_line or stripped_line.startswith('#')):
-                if next_line_is_terminator:
-                    modified = True # Indicate content was changed
-                    continue # Skip this line
-            
-            cleaned_lines.append(line)
-        
-        patched_content = '\n'.join(cleaned_lines)
-        if modified: # Only log if changes were actually made by this loop
-            log("INFO", "Aggressively cleaned blank/comment lines before list/scope closures in 'BUILD.gn' (inline cleanup).", to_console=False)
+# --- build/toolchain/win/BUILD.gn ---
+_SYS_FLAGS_MARKER = "# CerebrumLux injected for MinGW compatibility"
+_OLD_WIN_TOOLCHAIN_DATA_MARKER = "# CerebrumLux Injected win_toolchain_data Block"
+_MINGW_TOOLS = {"cl": "gcc.exe", "link": "g++.exe", "lib": "ar.exe", "rc": "windres.exe"}
+_MINGW_TOOL_OVERRIDE = "# CerebrumLux MinGW tool override"
+
+def _gn_find_template(tree, template_name):
+    """The top-level `template("<template_name>") { ... }` call node, or None."""
+    for node in tree["statements"]:
+        if (node["type"] == "call" and node["name"] == "template" and node["block"] is not None and node["args"]
+                and node["args"][0]["type"] == "string" and node["args"][0]["value"] == f'"{template_name}"'):
+            return node
+    return None
 
-        if modified:
-            patched_content = _filter_gn_comments(patched_content)
-            try:
-                bak_path = build_gn_path.with_suffix(build_gn_path.suffix + ".cerebrumlux.bak")
-                if not bak_path.exists():
-                    bak_path.write_bytes(content.encode("utf-8", errors="replace"))
-                    log("DEBUG", f"Created backup of original '{build_gn_path.name}' at '{bak_path.name}'.", to_console=False)
-            except Exception as e:
-                log("WARN", f"Could not write backup of '{build_gn_path.name}': {e}", to_console=False)
+def _gn_inject_invoker_local(tree, editor) -> int:
+    # Works around GN's "May only subscript identifiers" for invoker.toolchain_arch.
+    template = _gn_find_template(tree, "msvc_toolchain")
+    if template is None:
+        return 0
+    indent = editor.indent_of(template)
+    return int(editor.insert(template["block"]["start"] + 1,
+                             f"\n{indent}  # CerebrumLux: Workaround for GN \\\"May only subscript identifiers\\\"\n{indent}  _invoker_local = invoker\n"))
+
+def _gn_toolchain_arch_tmp_variable(tree, editor) -> int:
+    count = 0
+    for node in gn_walk(tree):
+        if gn_target_name(node) == "toolchain_arch" and gn_is_access(node["value"], ("invoker", "_invoker_local"), ("toolchain_arch",)):
+            indent = editor.indent_of(node)
+            count += editor.replace(node["start"], node["end"],
+                                    f"_cerebrum_tmp_toolchain_arch = {node['value']['base']['name']}.toolchain_arch\n{indent}toolchain_arch = _cerebrum_tmp_toolchain_arch")
+    return count
+
+def _gn_remove_old_win_toolchain_data_block(tree, editor) -> int:
+    """Drops the win_toolchain_data scope (and its marker comment) injected by old script versions."""
+    count = 0
+    for node in gn_walk(tree):
+        if gn_target_name(node) == "win_toolchain_data" and node["value"]["type"] == "scope":
+            start, end = editor.line_span(node)
+            marker_line = editor.text.rfind("\n", 0, max(start - 1, 0)) + 1
+            if editor.text[marker_line:start].strip() == _OLD_WIN_TOOLCHAIN_DATA_MARKER:
+                count += editor.replace(marker_line, end, "")
+    return count
+
+def _gn_remove_sys_flags_assignments(tree, editor) -> int:
+    # Upstream sys_*_flags assignments are dropped; the injected "= []" definitions are kept.
+    return sum(editor.remove_statement(node) for node in gn_walk(tree)
+               if gn_target_name(node) in ("sys_include_flags", "sys_lib_flags")
+               and not (node["value"]["type"] == "list" and not node["value"]["items"]))
+
+def _gn_inject_sys_flags(tree, editor) -> int:
+    template = _gn_find_template(tree, "msvc_toolchain")
+    if template is None:
+        return 0
+    indent = editor.indent_of(template)
+    return int(editor.insert(editor.line_span(template)[0],
+                             f"\n{indent}{_SYS_FLAGS_MARKER}\n{indent}sys_include_flags = []\n{indent}sys_lib_flags = []\n"))
+
+def _gn_neutralize_clang_prefix(tree, editor) -> int:
+    count = 0
+    for node in gn_walk(tree):
+        value = node.get("value") if gn_target_name(node) == "prefix" else None
+        if (value and value["type"] == "call" and value["name"] == "rebase_path" and value["args"]
+                and value["args"][0]["type"] == "string" and value["args"][0]["value"].startswith('"$clang_base_path/bin"')):
+            start, end = editor.line_span(node)
+            count += editor.replace(start, end, editor.indent_of(node) + "# [CerebrumLux-MinGW] Commented out redundant clang prefix to avoid GN fatal error\n")
+    return count
+
+def _gn_mingw_tool_overrides(tree, editor) -> int:
+    count = 0
+    for node in gn_walk(tree):
+        tool = gn_target_name(node)
+        if tool in _MINGW_TOOLS and node["value"]["type"] == "string":
+            line_end = editor.text.find("\n", node["end"])
+            line_end = len(editor.text) if line_end == -1 else line_end
+            if _MINGW_TOOL_OVERRIDE in editor.text[node["end"]:line_end]:
+                continue
+            override = gn_quote(f"{Path(MINGW_BIN).as_posix()}/{_MINGW_TOOLS[tool]}")
+            count += editor.replace(node["start"], line_end, f"{tool} = {override} {_MINGW_TOOL_OVERRIDE}")
+    return count
+
+TOOLCHAIN_BUILD_GN_PATCH_SPECS = [
+    patch_spec("inject_invoker_local", kind="gn", transform=_gn_inject_invoker_local,
+               requires=r"(?:invoker|_invoker_local)\.toolchain_arch", marker="_invoker_local = invoker"),
+    patch_spec("toolchain_arch_tmp_variable", kind="gn", transform=_gn_toolchain_arch_tmp_variable,
+               marker="_cerebrum_tmp_toolchain_arch"),
+    patch_spec("neutralize_win_toolchain_exec_script", kind="gn",
+               transform=lambda tree, editor: _gn_neutralize_exec_script(tree, editor, "win_toolchain_data")),
+    patch_spec("remove_old_win_toolchain_data_block", kind="gn", transform=_gn_remove_old_win_toolchain_data_block),
+    patch_spec("remove_sys_flags_assignments", kind="gn", transform=_gn_remove_sys_flags_assignments),
+    patch_spec("inject_sys_flags", kind="gn", transform=_gn_inject_sys_flags, marker=_SYS_FLAGS_MARKER),
+    patch_spec("neutralize_clang_prefix", kind="gn", transform=_gn_neutralize_clang_prefix),
+    patch_spec("mingw_tool_overrides", kind="gn", transform=_gn_mingw_tool_overrides),
+    patch_spec("win_toolchain_data_accesses", kind="gn",
+               transform=lambda tree, editor: _gn_replace_scope_fields(tree, editor, "win_toolchain_data", dummy_win_toolchain_paths)),
+    # Runs after the gn specs so they share a single parse; only needed when there is no msvc_toolchain template.
+    patch_spec("inject_sys_flags_at_end", kind="append", fallback_for="inject_sys_flags",
+               marker="# CerebrumLux injected as fallback for MinGW compatibility",
+               replacement="# CerebrumLux injected as fallback for MinGW compatibility\nsys_include_flags = []\nsys_lib_flags = []\n"),
+]
 
-            build_gn_path.write_text(patched_content, encoding="utf-8")
-            log("INFO", f"'{build_gn_path.name}' patched successfully.", to_console=True)
-            run(["git", "add", str(build_gn_path)], cwd=v8_source_dir, env=env, check=False)
-            log("INFO", f"Staged '{build_gn_path.name}' changes with 'git add'.", to_console=True)
-            return True
-        else:
-            log("INFO", f"'{build_gn_path.name}' already patched or no changes needed.", to_console=False)
-            run(["git", "add", str(build_gn_path)], cwd=v8_source_dir, env=env, check=False)
-            log("INFO", f"Ensured '{build_gn_path.name}' is staged with 'git add'.", to_console=True)
-            return True
+# --- DEPS ---
+DEPS_PATCH_SPECS = [
+    # Evaluates DEPS and removes what DEPS_PRUNE_MODE prunes (see "DEPS evaluation and pruning").
+    patch_spec("prune_deps", kind="transform", transform=prune_deps_text,
+               settings=lambda: [DEPS_PRUNE_MODE, DEPS_PRUNE_DENY, DEPS_PRUNE_ALLOW]),
+]
 
-    except Exception as e:
-        log("ERROR", f"Failed to patch '{build_gn_path.name}': {e}", to_console=True)
-        return False
+# Relative path (under V8_SRC) -> specs, in patch order.
+MINGW_PATCH_SPECS = {
+    "DEPS": DEPS_PATCH_SPECS,
+    "build/dotfile_settings.gni": DOTFILE_SETTINGS_PATCH_SPECS,
+    "build/config/win/visual_studio_version.gni": VS_VERSION_GNI_PATCH_SPECS,
+    "build/toolchain/win/setup_toolchain.py": SETUP_TOOLCHAIN_PATCH_SPECS,
+    "build/config/win/BUILD.gn": BUILD_GN_PATCH_SPECS,
+    "build/toolchain/win/BUILD.gn": TOOLCHAIN_BUILD_GN_PATCH_SPECS,
+}
 
+def _const_token(value, seen):
+    if isinstance(value, types.CodeType):
+        return _code_token(value, seen)
+    if isinstance(value, frozenset):
+        return sorted(repr(item) for item in value) # Set order depends on the process's hash seed
+    return repr(value)
 
-def _patch_toolchain_win_build_gn(v8_source_dir: str, env: dict) -> bool:
+def _code_token(code, seen) -> list:
+    """
+    Token of a code object that is the same in every process: bytecode, constants (nested code objects expanded,
+    not repr()'d with their address), names, and the tokens of the module-level functions and classes it uses,
+    so editing a helper a spec calls changes the digest too. `seen` holds the helpers already included.
     """
-    Patches V8_SRC/build/toolchain/win/BUILD.gn to neutralize the 'exec_script' call
-    that populates win_toolchain_data, ensures tool definitions are set for MinGW,
-    and reliably defines sys_lib_flags/sys_include_flags right before msvc_toolchain() definitions,
-    and also neutralizes the problematic 'prefix' assignment.
-    The core win_toolchain_data object itself will be injected via args.gn.
+    helpers = []
+    for name in code.co_names:
+        helper = globals().get(name)
+        if name in seen or getattr(helper, "__module__", None) != __name__:
+            continue
+        seen.add(name)
+        if isinstance(helper, types.FunctionType):
+            helpers.append([name, _code_token(helper.__code__, seen)])
+        elif isinstance(helper, type):
+            helpers.append([name, [[attr, _code_token(member.__code__, seen)] for attr, member in sorted(vars(helper).items())
+                                   if isinstance(member, types.FunctionType)]])
+    return [code.co_code.hex(), [_const_token(value, seen) for value in code.co_consts], list(code.co_names), helpers]
+
+def _callable_token(fn) -> list:
+    code = getattr(fn, "__code__", None)
+    if code is None:
+        return repr(fn)
+    return [_code_token(code, set()), [_const_token(value, set()) for value in getattr(fn, "__defaults__", None) or ()]]
+
+def _pattern_token(pattern):
+    return pattern.pattern if isinstance(pattern, (re.Pattern, ScanPattern)) else pattern
+
+_spec_set_digests = {} # id(spec list) -> digest; spec lists are module-level and never mutated, settings are fixed once main() parsed the command line
+
+def spec_set_digest(specs: list) -> str:
+    """Digest ("patch-set version") of a spec list: everything that can influence its output."""
+    digest = _spec_set_digests.get(id(specs))
+    if digest is None:
+        parts = [PATCH_SET_VERSION]
+        for spec in specs:
+            replacement = spec["replacement"]
+            parts.append((spec["name"], spec["kind"], _pattern_token(spec["pattern"]), _pattern_token(spec["anchor"]),
+                          _pattern_token(spec["marker"]), _pattern_token(spec["requires"]), spec["fallback_for"],
+                          spec["required"], spec["when_changed"],
+                          _callable_token(replacement) if callable(replacement) else replacement,
+                          _callable_token(spec["transform"]) if spec["transform"] else None,
+                          spec["settings"]() if spec["settings"] else None))
+        digest = _spec_set_digests[id(specs)] = _sha256_text(json.dumps(parts, default=str))
+    return digest
+
+def patch_specs_digest() -> str:
+    """Digest of every spec set, so checkpoints notice when patches change."""
+    return _sha256_text(json.dumps([spec_set_digest(specs) for specs in list(MINGW_PATCH_SPECS.values()) + [VS_TOOLCHAIN_PATCH_SPECS]]))
+
+def _patch_source_file(v8_source_dir: str, env: dict, rel_path: str, staging=None) -> bool:
     """
-    toolchain_build_gn_path = Path(v8_source_dir) / "build" / "toolchain" / "win" / "BUILD.gn"
-    if not toolchain_build_gn_path.exists():
-        log("WARN", f"'{toolchain_build_gn_path.name}' not found at {toolchain_build_gn_path}. Skipping patch.", to_console=True)
+    Applies MINGW_PATCH_SPECS[rel_path] to the file and registers it with `staging` (a GitStagingBatch).
+    False if the file is missing or a required spec missed.
+    """
+    path = Path(v8_source_dir) / rel_path
+    if not path.exists():
+        log("WARN", f"'{path.name}' not found at {path}. Skipping patch.", to_console=True)
         return False
+    log("INFO", f"Patching '{rel_path}' ({len(MINGW_PATCH_SPECS[rel_path])} specs).", to_console=True)
+    if not apply_patch_specs(path, MINGW_PATCH_SPECS[rel_path])["ok"]:
+        return False
+    if staging is not None:
+        staging.add(path)
+    return True
 
-    log("INFO", f"Patching '{toolchain_build_gn_path.name}' to neutralize 'exec_script', handle tool definitions/flags, define sys_flags, and neutralize 'prefix'. win_toolchain_data via args.gn.", to_console=True)
-    try:
-        content = toolchain_build_gn_path.read_text(encoding="utf-8")
-        patched_content = content
-        modified = False
-
-        fake_vs_base_path_obj_local = Path(V8_ROOT) / "FakeVS_Toolchain" # Local definition for clarity
-
-        # FIX (v7.37.14): Handle 'May only subscript identifiers' error.
-        # This replaces `toolchain_arch = _invoker_local.toolchain_arch` with a temporary variable.
-        invoker_patch_needed = False
-        # FIX (v7.37.19): Robustly apply temporary variable assignment for toolchain_arch.
-        # This ensures that `toolchain_arch = (invoker|_invoker_local).toolchain_arch` is correctly transformed.
-        # It now accounts for both original 'invoker' and already patched '_invoker_local'.
-        
-        # Check if 'invoker.toolchain_arch' is present and '_invoker_local = invoker' is not yet injected
-        if re.search(r'(?:invoker|_invoker_local)\.toolchain_arch', patched_content) and '_invoker_local = invoker' not in patched_content:
-            invoker_patch_needed = True
-            template_start_pattern = re.compile(r"^(?P<indent_tmpl>\s*)template\s*\(\s*\"msvc_toolchain\"\s*\)\s*\{", re.MULTILINE)
-            match_template = template_start_pattern.search(patched_content)
-            if match_template:
-                insert_point = match_template.end()
-                indent_level_tmpl = match_template.group('indent_tmpl')
-                # FIX (v7.37.19): Corrected docstring escape.
-                invoker_injection_text = f"\n{indent_level_tmpl}  # CerebrumLux: Workaround for GN \\\"May only subscript identifiers\\\"\n{indent_level_tmpl}  _invoker_local = invoker\n"
-                patched_content = patched_content[:insert_point] + invoker_injection_text + patched_content[insert_point:]
-                modified = True
-                log("INFO", "Injected '_invoker_local = invoker' into 'msvc_toolchain' template.", to_console=False)
-
-        if invoker_patch_needed:
-            initial_replace_content = patched_content
-           
-            # FIX (v7.37.19): Robustly apply temporary variable assignment for toolchain_arch.
-            # Look for the target line: 'toolchain_arch = X.toolchain_arch' where X can be 'invoker' or '_invoker_local'
-            # We explicitly replace the *entire line* with the two-step assignment.
-            toolchain_arch_assignment_pattern = re.compile(
-                r"^(?P<indent>\s*)toolchain_arch\s*=\s*(?P<invoker_ref>(?:invoker|_invoker_local))\.toolchain_arch",
-                re.MULTILINE
-            )
-            
-            match_assignment = toolchain_arch_assignment_pattern.search(patched_content)
-            
-            # Only proceed if a direct assignment to toolchain_arch from an invoker-like object is found
-            # and our temporary variable is not already explicitly used for toolchain_arch.
-            if match_assignment and '_cerebrum_tmp_toolchain_arch' not in patched_content:
-                indent_level = match_assignment.group('indent')
-                invoker_ref_used = match_assignment.group('invoker_ref')
-                
-                # Construct the replacement with a temporary variable
-                replacement_text = (
-                    f"{indent_level}_cerebrum_tmp_toolchain_arch = {invoker_ref_used}.toolchain_arch\n"
-                    f"{indent_level}toolchain_arch = _cerebrum_tmp_toolchain_arch"
-                )
-                
-                # Perform the substitution, replacing the original single line with the new two lines.
-                patched_content = toolchain_arch_assignment_pattern.sub(replacement_text, patched_content)
-                modified = True
-                log("INFO", "Applied robust 'May only subscript identifiers' fix for 'toolchain_arch' using a temporary variable.", to_console=False)
-            elif '_cerebrum_tmp_toolchain_arch' in patched_content and \
-                 re.search(r"toolchain_arch\s*=\s*_cerebrum_tmp_toolchain_arch", patched_content):
-                log("INFO", "'toolchain_arch' already uses the temporary variable, skipping transformation.", to_console=False)
-            else:
-                log("WARN", "Could not find a suitable 'toolchain_arch = ...' assignment for transformation or already patched.", to_console=False)
-
-            if initial_replace_content != patched_content: # Check if changes were made by this block
-                modified = True # Update modified flag
-                log("INFO", f"Applied 'May only subscript identifiers' fix in '{toolchain_build_gn_path.name}'.", to_console=False)
-            else:
-                log("INFO", f"No further 'invoker.toolchain_arch' references found for replacement after primary fix in '{toolchain_build_gn_path.name}'.", to_console=False)
-
-        # --- 1. Neutralize the exec_script call for win_toolchain_data ---
-        exec_script_win_toolchain_pattern = re.compile(
-            r"^(?P<indent>\s*)win_toolchain_data\s*=\s*exec_script\(\"setup_toolchain\.py\"[\s\S]*?\)\s*\n",
-            re.MULTILINE | re.DOTALL
-        )
-        if exec_script_win_toolchain_pattern.search(patched_content):
-            # FIX (v7.36): Escape captured group for safety before using in replacement
-            patched_content = exec_script_win_toolchain_pattern.sub(lambda m: m.group('indent') + "# CerebrumLux neutralized: " + m.group(0).strip().replace('\\', '/') + "\n", patched_content)
-            modified = True
-            log("INFO", f"Neutralized 'exec_script' call for 'win_toolchain_data' in '{toolchain_build_gn_path.name}'.", to_console=False)
-
-        # --- 2. Remove any old injected direct 'win_toolchain_data' definition (CRITICAL for this fix) ---
-        win_toolchain_data_block_marker = "# CerebrumLux Injected win_toolchain_data Block"
-        old_injected_block_pattern = re.compile(
-            r"^(?P<indent>\s*)# CerebrumLux Injected win_toolchain_data Block[\s\S]*?(?P=indent)\}\s*\n",
-            re.MULTILINE | re.DOTALL
-        )
-        if old_injected_block_pattern.search(patched_content):
-            patched_content = old_injected_block_pattern.sub("", patched_content)
-            modified = True
-            log("INFO", f"Removed old injected 'win_toolchain_data' definition from '{toolchain_build_gn_path.name}'.", to_console=False)
-
-        # --- 3. Remove existing (problematic) assignments for sys_include_flags and sys_lib_flags from the original file ---
-        flags_assignment_removal_pattern = re.compile(
-            r"^(?P<indent>\s*)(sys_include_flags|sys_lib_flags)\s*=\s*.*?$",
-            re.MULTILINE
-        )
-        initial_flags_content_before_removal = patched_content
-        patched_content = flags_assignment_removal_pattern.sub(r'', patched_content) # Remove the line entirely
-        if initial_flags_content_before_removal != patched_content:
-            modified = True
-            log("INFO", "Removed existing direct assignments for 'sys_include_flags' and 'sys_lib_flags' from 'BUILD.gn'.", to_console=False)
-
-
-        # --- 4. Inject sys_include_flags and sys_lib_flags right before the msvc_toolchain() definitions ---
-        msvc_toolchain_template_pattern = re.compile(
-            r"^(?P<indent>\s*)template\s*\(\s*\"msvc_toolchain\"\s*\)\s*\{",
-            re.MULTILINE
-        )
-        match_msvc_toolchain = msvc_toolchain_template_pattern.search(patched_content)
-        
-        if match_msvc_toolchain:
-            insert_point = match_msvc_toolchain.start()
-            indent_level = match_msvc_toolchain.group('indent')
-
-            new_flags_injection = (
-                f"\n{indent_level}# CerebrumLux injected for MinGW compatibility\n"
-                f"{indent_level}sys_include_flags = []\n"
-                f"{indent_level}sys_lib_flags = []\n"
-            )
-
-            if f"{indent_level}sys_include_flags = []" not in patched_content[insert_point:match_msvc_toolchain.end()] and \
-               f"{indent_level}sys_lib_flags = []" not in patched_content[insert_point:match_msvc_toolchain.end()]:
-                
-                patched_content = patched_content[:insert_point] + new_flags_injection + patched_content[insert_point:]
-                modified = True
-                log("INFO", f"Injected 'sys_include_flags' and 'sys_lib_flags' before 'msvc_toolchain' template in '{toolchain_build_gn_path.name}'.", to_console=False)
-            else:
-                log("INFO", "'sys_include_flags' and 'sys_lib_flags' already present before 'msvc_toolchain' template. Skipping injection.", to_console=False)
-        else:
-            log("WARN", "Could not find 'template(\"msvc_toolchain\") {' pattern in 'BUILD.gn'. Cannot inject sys_flags before it.", to_console=True)
-            # Fallback to appending at the end if msvc_toolchain template is not found (less ideal but prevents "Undefined identifier")
-            if not re.search(r"sys_include_flags\s*=\s*\[\]\s*# CerebrumLux injected", patched_content) and \
-               not re.search(r"sys_lib_flags\s*=\s*\[\]\s*# CerebrumLux injected", patched_content):
-                
-                fallback_flags_injection = (
-                    "\n\n# CerebrumLux injected as fallback for MinGW compatibility\n"
-                    "sys_include_flags = []\n"
-                    "sys_lib_flags = []\n"
-                )
-                patched_content = patched_content.rstrip() + "\n" + fallback_flags_injection.strip() + "\n"
-                modified = True
-                log("INFO", "Injected 'sys_include_flags' and 'sys_lib_flags' at the end of 'BUILD.gn' as fallback.", to_console=False)
-
-
-        # --- 5. Neutralize the problematic 'prefix' assignment to prevent "Assignment had no effect" error ---
-        prefix_assignment_pattern = re.compile(
-            r"^(?P<indent>\s*)prefix\s*=\s*rebase_path\(\"\$clang_base_path/bin\"[^\)]*\)\s*$",
-            re.MULTILINE
-        )
-        initial_prefix_content = patched_content
-        if prefix_assignment_pattern.search(patched_content):
-            patched_content = prefix_assignment_pattern.sub(lambda m: m.group('indent') + "# [CerebrumLux-MinGW] Commented out redundant clang prefix to avoid GN fatal error", patched_content)
-            modified = True
-            log("INFO", "'prefix' assignment neutralized to prevent 'Assignment had no effect' error.", to_console=False)
-        else:
-            log("INFO", "No 'prefix = rebase_path(...clang_base_path...)' assignment found in 'BUILD.gn' or already neutralized. Skipping.", to_console=False)
-
+def _apply_vs_toolchain_patch_logic(vs_toolchain_path: Path) -> bool:
+    """Patches vs_toolchain.py: injects the CerebrumLux shim and removes the original VS detection."""
+    if not vs_toolchain_path.exists():
+        log("DEBUG", f"'{vs_toolchain_path.name}' not found at {vs_toolchain_path}, cannot patch.", to_console=False)
+        return False
+    return apply_patch_specs(vs_toolchain_path, VS_TOOLCHAIN_PATCH_SPECS)["ok"]
 
-        # --- 6. Replace MSVC tool definitions with MinGW tools (as direct strings) ---
-        mingw_bin_posix = Path(MINGW_BIN).as_posix() # Using the module-level MINGW_BIN
-        
-        tool_definitions_to_patch = {
-            r'^\s*cl\s*=\s*".*?"': f'cl = "{mingw_bin_posix}/gcc.exe"',
-            r'^\s*link\s*=\s*".*?"': f'link = "{mingw_bin_posix}/g++.exe"',
-            r'^\s*lib\s*=\s*".*?"': f'lib = "{mingw_bin_posix}/ar.exe"',
-            r'^\s*rc\s*=\s*".*?"': f'rc = "{mingw_bin_posix}/windres.exe"', 
-        }
-        
-        for pattern_str, replacement_str in tool_definitions_to_patch.items():
-            tool_assignment_pattern = re.compile(pattern_str, re.MULTILINE)
-            initial_tool_content = patched_content
-            patched_content = tool_assignment_pattern.sub(r'  ' + replacement_str + ' # CerebrumLux MinGW tool override', patched_content)
-            if initial_tool_content != patched_content:
-                modified = True
-                log("INFO", f"Replaced tool assignment (pattern: {pattern_str[:min(len(pattern_str), 50)]}...) with MinGW path in '{toolchain_build_gn_path.name}'.", to_console=False)
-        
-        # --- 7. Generic replacement for any unhandled win_toolchain_data.<field> access ---
-        for field, dummy_path in dummy_win_toolchain_paths.items(): # Using the module-level dummy_win_toolchain_paths
-            generic_access_pattern = re.compile(r"win_toolchain_data\." + re.escape(field), re.MULTILINE)
-            initial_generic_replace_text = patched_content
-            patched_content = generic_access_pattern.sub(f'"{dummy_path}"', patched_content)
-            if initial_generic_replace_text != patched_content:
-                modified = True
-                log("INFO", f"Replaced generic access to 'win_toolchain_data.{field}' with hardcoded dummy path in '{toolchain_build_gn_path.name}' (final fallback).", to_console=False)
-
-        # FIX (v7.37.14): Aggressive inline cleanup of orphaned lines before list/scope terminators
-        lines = patched_content.split('\n')
-        cleaned_lines = []
-        for i in range(len(lines)):
-            line = lines[i]
-            stripped_line = line.strip()
-            
-            next_line_is_terminator = False
-            for j in range(i + 1, len(lines)):
-                stripped_next_line = lines[j].strip()
-                if stripped_next_line and not stripped_next_line.startswith('#'):
-                    if stripped_next_line in (']', '}', ')'):
-                        next_line_is_terminator = True
-                    break
-            
-            if (not stripped_line or stripped_line.startswith('#')):
-                if next_line_is_terminator:
-                    modified = True
-                    continue
-            
-            cleaned_lines.append(line)
-        
-        patched_content = '\n'.join(cleaned_lines)
-        if modified:
-            log("INFO", "Aggressively cleaned blank/comment lines before list/scope closures in 'BUILD.gn' (inline cleanup).", to_console=False)
+# --- In-process GN validation ---
+def _gn_validation_targets() -> list:
+    """The patched .gn/.gni files, relative to v8_source_dir, in MINGW_PATCH_SPECS order."""
+    return [rel_path for rel_path in MINGW_PATCH_SPECS if rel_path.endswith((".gn", ".gni"))]
 
-        if modified:
-            patched_content = _filter_gn_comments(patched_content)
+def validate_gn_files(v8_source_dir: str, rel_paths=None) -> list:
+    """
+    Parses each GN file with gn_parse() and returns one error dict per unparsable file
+    ({"file", "line", "column", "message", "source_line"}); an empty list means all files are valid.
+    Files that do not exist are skipped (the patch phase reports those). Takes milliseconds, so a
+    broken patch is caught here instead of by a full `gn gen` start-up, error matching and retry.
+    """
+    errors = []
+    with trace_span("validate_gn_files", "validate"):
+        for rel_path in rel_paths if rel_paths is not None else _gn_validation_targets():
+            path = Path(v8_source_dir) / rel_path
+            if not path.exists():
+                continue
             try:
-                bak_path = toolchain_build_gn_path.with_suffix(toolchain_build_gn_path.suffix + ".cerebrumlux.bak")
-                if not bak_path.exists() or content != patched_content: # Only create backup if content has changed
-                    bak_path.write_bytes(content.encode("utf-8", errors="replace"))
-                    log("DEBUG", f"Created backup of original '{toolchain_build_gn_path.name}' at '{bak_path.name}'.", to_console=False)
+                text = path.read_text(encoding="utf-8")
+                gn_parse(text)
+            except GnSyntaxError as e:
+                source_line = text.split("\n")[e.line - 1] if e.line <= text.count("\n") + 1 else ""
+                errors.append({"file": rel_path, "line": e.line, "column": e.column, "message": e.reason, "source_line": source_line})
             except Exception as e:
-                log("WARN", f"Could not write backup of '{toolchain_build_gn_path.name}': {e}", to_console=False)
-
-            toolchain_build_gn_path.write_text(patched_content, encoding="utf-8")
-            log("INFO", f"'{toolchain_build_gn_path.name}' patched successfully.", to_console=True)
-            run(["git", "add", str(toolchain_build_gn_path)], cwd=v8_source_dir, env=env, check=False)
-            log("INFO", f"Ensured '{toolchain_build_gn_path.name}' is staged with 'git add'.", to_console=True)
-            return True
-        else:
-            log("INFO", f"'{toolchain_build_gn_path.name}' already patched or no changes needed.", to_console=False)
-            run(["git", "add", str(toolchain_build_gn_path)], cwd=v8_source_dir, env=env, check=False)
-            log("INFO", f"Ensured '{toolchain_build_gn_path.name}' is staged with 'git add'.", to_console=True)
-            return True
-
-    except Exception as e:
-        log("ERROR", f"Failed to patch '{toolchain_build_gn_path.name}': {e}", to_console=True)
-        return False
+                errors.append({"file": rel_path, "line": 0, "column": 0, "message": f"Could not read file: {e}", "source_line": ""})
+    return errors
+
+def report_gn_validation(v8_source_dir: str, rel_paths=None, context: str = "patched") -> bool:
+    """Runs validate_gn_files(), logs each error with a caret under the offending column and records the result in the run summary."""
+    targets = [rel_path for rel_path in (rel_paths if rel_paths is not None else _gn_validation_targets())
+               if (Path(v8_source_dir) / rel_path).exists()]
+    errors = validate_gn_files(v8_source_dir, targets)
+    record_run_summary("gn_validation", {"files": targets, "errors": errors})
+    if not errors:
+        log("INFO", f"GN validation: {len(targets)} {context} file(s) parsed cleanly.", to_console=True)
+        return True
+    for error in errors:
+        location = f"{error['file']}:{error['line']}:{error['column']}"
+        detail = ""
+        if error["source_line"]:
+            detail = f"\n    {error['source_line']}\n    {' ' * (error['column'] - 1)}^"
+        log("ERROR", f"GN validation: {location}: {error['message']}{detail}", to_console=True)
+    log("ERROR", f"GN validation: {len(errors)} of {len(targets)} {context} file(s) are not valid GN.", to_console=True)
+    return False
 
+# ----------------------------
+# === gclient helpers ===
+# ----------------------------
+def write_gclient_file(root_dir: str, url: str):
+    """Writes a .gclient file in the root directory (with cache_dir when the git cache is enabled)."""
+    gclient_content = (
+        "solutions = [\n"
+        "  {\n"
+        f"    'name': 'v8',\n"
+        f"    'url': '{url}',\n"
+        "    'deps_file': 'DEPS',\n"
+        "    'managed': False,\n"
+        "  },\n"
+        "]\n"
+    )
+    if GIT_CACHE_DIR:
+        os.makedirs(GIT_CACHE_DIR, exist_ok=True)
+        gclient_content += f"cache_dir = {GIT_CACHE_DIR!r}\n"
+    path = Path(root_dir) / ".gclient" # Use Path for consistency
+    with path.open("w", encoding="utf-8") as f:
+        f.write(gclient_content)
+    log("INFO", f".gclient written to: {path} with name 'v8'.")
 
 def normalize_gn_lists(file_path: Path):
     """
@@ -1243,24 +2926,8 @@ def normalize_gn_lists(file_path: Path):
     Returns True if file was modified.
     """
     try:
-        content = file_path.read_text(encoding="utf-8")
-        original = content
-
-        # 1) Remove lines that are only a comma (leftovers from prior aggressive line deletions)
-        #    Example problematic sequence that could be left behind:
-        #      "..., \n    ,\n  ],"
-        content = re.sub(r"(?m)^[ \t]*,[ \t]*\r?\n", "", content)
-
-        # 2) Remove a trailing comma that sits immediately before a closing bracket or brace.
-        #    This pattern fixes cases like:
-        #      "  elem,\n]"
-        #    -> becomes:
-        #      "  elem\n]"
-        content = re.sub(r",\s*(\r?\n)([ \t]*[\]\}])", r"\1\2", content)
-
-        # 3) Also collapse sequences where a comma remains directly before closing on the same line:
-        #    Example: "elem,]" -> "elem]"
-        content = re.sub(r",([ \t]*[\]\}])", r"\1", content)
+        original = file_path.read_text(encoding="utf-8")
+        content = _normalize_gn_list_text(original)
 
         if content != original:
             # backup original before overwriting (safety)
@@ -1280,190 +2947,390 @@ def normalize_gn_lists(file_path: Path):
         return False
 
     
-def patch_v8_deps_for_mingw(v8_source_dir: str, env: dict):
+def _patch_build_files(v8_source_dir: str, env: dict, verb: str = "patch", max_workers: int = None):
     """
-    Patches the DEPS file to remove problematic dependencies for MinGW build.
-    Also calls to patch all relevant .gni and .gn files.
+    Applies the MINGW_PATCH_SPECS of every build file (all but DEPS, see patch_v8_deps_for_mingw()) and exits on failure.
+    The files are independent, so each one is a job on a pool of up to `max_workers` threads (default
+    PATCH_MAX_WORKERS). Results are gathered in MINGW_PATCH_SPECS order, so the FATAL message always names
+    the first failing file in patch order; the patched files are then staged with one batched `git add`.
     """
-    deps_path = Path(v8_source_dir) / "DEPS" # Use Path
-    if not deps_path.exists():
-        log("WARN", f"DEPS file not found at {deps_path}. Skipping DEPS patch.", to_console=True)
-        return
-
-    log("INFO", f"Patching DEPS file at {deps_path} for MinGW compatibility.", to_console=True)
-    
-    content = deps_path.read_text(encoding='utf-8') # Use Path.read_text
-    patched_content = content
-    deps_modified = False
-    
-    log("INFO", "Removing 'buildtools/win' from DEPS.", to_console=False)
-    if re.search(r"\'buildtools/win\':\s*Var\(.*?\),?\n?", patched_content, flags=re.DOTALL) or \
-       re.search(r"\'buildtools/win\':\s*\'[^\n]*\',?\n?", patched_content, flags=re.DOTALL):
-        patched_content = re.sub(r"\'buildtools/win\':\s*Var\(.*?\),?\n?", "", patched_content, flags=re.DOTALL)
-        patched_content = re.sub(r"\'buildtools/win\':\s*\'[^\n]*\',?\n?", "", patched_content, flags=re.DOTALL)
-        deps_modified = True
-
-    log("INFO", "Removing 'third_party/llvm-build' from DEPS.", to_console=False)
-    # FIX (v7.36): Refined regex to avoid 'multiple repeat' error. Use non-greedy and explicit match.
-    # The original regex `Var\(.*?\),?` combined with `flags=re.DOTALL` could cause issues.
-    # We explicitly look for a single-line string literal, or a Var() call.
-    llvm_pattern_str = r"\'third_party/llvm-build\':\s*(?:Var\([^\)]*\)|'[^\n]*'),?\n?"
-    llvm_pattern = re.compile(llvm_pattern_str, flags=re.MULTILINE) # DOTALL removed as not needed for single line.
-    
-    if llvm_pattern.search(patched_content):
-        log("DEBUG", f"Found llvm-build pattern: {llvm_pattern_str}", to_console=False)
-        patched_content = llvm_pattern.sub("", patched_content)
-        deps_modified = True
-    else:
-        log("DEBUG", f"No llvm-build pattern found in DEPS: {llvm_pattern_str}", to_console=False)
+    rel_paths = [rel_path for rel_path in MINGW_PATCH_SPECS if rel_path != "DEPS"]
+    max_workers = max(1, min(max_workers or PATCH_MAX_WORKERS, len(rel_paths)))
 
-
-    log("INFO", "Removing 'tools/win' from DEPS.", to_console=False)
-    if re.search(r"['\"]tools/win['\"]\s*:\s*['\"][^'\"]*['\"],?\n?", patched_content):
-        patched_content = re.sub(r"['\"]tools/win['\"]\s*:\s*['\"][^'\"]*['\"],?\n?", "", patched_content)
-        deps_modified = True
-    
-    log("INFO", "Removing 'tools/clang' from DEPS.", to_console=False)
-    if re.search(r"['\"]tools/clang['\"]\s*:\s*['\"][^'\"]*['\"],?\n?", patched_content):
-        patched_content = re.sub(r"['\"]tools/clang['\"]\s*:\s*['\"][^'\"]*['\"],?\n?", "", patched_content)
-        deps_modified = True
-
-    log("INFO", "Removing problematic cipd packages from DEPS.", to_console=False)
-    initial_cipd_content = patched_content
-    # FIX (v7.36): Ensure non-greedy match to avoid "multiple repeat"
-    cipd_pattern = re.compile(r"\'infra/tools/win\S*?\'[^}]*?},\n", flags=re.MULTILINE)
-    if cipd_pattern.search(patched_content):
-        log("DEBUG", f"Found cipd pattern: {cipd_pattern.pattern}", to_console=False)
-        patched_content = cipd_pattern.sub("", patched_content)
-        deps_modified = True
-    else:
-        log("DEBUG", f"No cipd pattern found in DEPS: {cipd_pattern.pattern}", to_console=False)
-
-
-    log("INFO", "Replaced 'simdutf' source with GitHub mirror in DEPS.", to_console=True)
-    if "https://chromium.googlesource.com/chromium/src/third_party/simdutf" in patched_content:
-        patched_content = patched_content.replace(
-            "https://chromium.googlesource.com/chromium/src/third_party/simdutf",
-            "https://github.com/simdutf/simdutf.git"
-        )
-        deps_modified = True
-
-    log("INFO", "Replaced 'zlib' source with GitHub mirror in DEPS.", to_console=True)
-    if "https://chromium.googlesource.com/chromium/src/third_party/zlib.git" in patched_content:
-        patched_content = patched_content.replace(
-            "https://chromium.googlesource.com/chromium/src/third_party/zlib.git",
-            "https://github.com/madler/zlib.git"
-        )
-        deps_modified = True
-
-    if deps_modified:
-        deps_path.write_text(patched_content, encoding="utf-8") # Use Path.read_text
-        log("INFO", f"DEPS file patched successfully to remove problematic MinGW dependencies and apply mirrors.", to_console=True)
-    else:
-        log("INFO", f"DEPS file already patched or no problematic dependencies found.", to_console=True)
-
-    log("INFO", "Calling patch for 'build/dotfile_settings.gni'.", to_console=True)
-    if not _patch_dotfile_settings_gni(v8_source_dir, env):
-        log("FATAL", "Failed to patch 'build/dotfile_settings.gni'. Aborting.", to_console=True)
-        sys.exit(1)
-    
-    log("INFO", "Calling patch for 'build/config/win/visual_studio_version.gni'.", to_console=True)
-    if not _patch_visual_studio_version_gni(v8_source_dir, env):
-        log("FATAL", "Failed to patch 'build/config/win/visual_studio_version.gni'. Aborting.", to_console=True)
-        sys.exit(1)
-
-    # NEW: Call to patch setup_toolchain.py
-    log("INFO", "Calling patch for 'build/toolchain/win/setup_toolchain.py'.", to_console=True)
-    if not _patch_setup_toolchain_py(v8_source_dir, env):
-        log("FATAL", "Failed to patch 'build/toolchain/win/setup_toolchain.py'. Aborting.", to_console=True)
-        sys.exit(1)
-    
-    # NEW: Call to patch build/config/win/BUILD.gn
-    log("INFO", "Calling patch for 'build/config/win/BUILD.gn'.", to_console=True)
-    if not _patch_build_gn(v8_source_dir, env):
-        log("FATAL", "Failed to patch 'build/config/win/BUILD.gn'. Aborting.", to_console=True)
-        sys.exit(1)
-    build_config_win_build_gn_path = Path(v8_source_dir) / "build" / "config" / "win" / "BUILD.gn"
-    # FIX (v7.37.13): Apply cleanup before normalization.
-    if normalize_gn_lists(build_config_win_build_gn_path):
-        run(["git", "add", str(build_config_win_build_gn_path)], cwd=v8_source_dir, env=env, check=False)
-        log("INFO", f"Staged '{build_config_win_build_gn_path.name}' changes with 'git add' after GN list normalization.", to_console=True)
+    staging = GitStagingBatch(v8_source_dir, env)
+
+    def patch_job(rel_path):
+        return _patch_source_file(v8_source_dir, env, rel_path, staging=staging)
+
+    if max_workers == 1:
+        results = {}
+        for rel_path in rel_paths: # Sequential mode stops at the first failure, like the original loop.
+            results[rel_path] = patch_job(rel_path)
+            if not results[rel_path]:
+                break
     else:
-        run(["git", "add", str(build_config_win_build_gn_path)], cwd=v8_source_dir, env=env, check=False)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="patch") as pool:
+            futures = {rel_path: pool.submit(patch_job, rel_path) for rel_path in rel_paths}
+        results = {}
+        for rel_path, future in futures.items():
+            try:
+                results[rel_path] = future.result()
+            except Exception as e:
+                log("ERROR", f"Patch job for '{rel_path}' raised: {e}", to_console=True)
+                results[rel_path] = False
 
-    # NEW: Call to patch build/toolchain/win/BUILD.gn
-    log("INFO", "Calling patch for 'build/toolchain/win/BUILD.gn'.", to_console=True)
-    if not _patch_toolchain_win_build_gn(v8_source_dir, env):
-        log("FATAL", "Failed to patch 'build/toolchain/win/BUILD.gn'. Aborting.", to_console=True)
+    for rel_path in rel_paths:
+        if not results.get(rel_path, False):
+            log("FATAL", f"Failed to {verb} '{rel_path}'. Aborting.", to_console=True)
+            sys.exit(1)
+    if not report_gn_validation(v8_source_dir, [rel_path for rel_path in _gn_validation_targets() if rel_path in rel_paths]):
+        log("FATAL", f"{verb.capitalize()}ed GN files do not parse; not running gn gen on them. Aborting.", to_console=True)
         sys.exit(1)
-    toolchain_build_gn_path = Path(v8_source_dir) / "build" / "toolchain" / "win" / "BUILD.gn"
-    # FIX (v7.37.13): Apply cleanup before normalization.
-    if normalize_gn_lists(toolchain_build_gn_path):
-        run(["git", "add", str(toolchain_build_gn_path)], cwd=v8_source_dir, env=env, check=False)
-        log("INFO", f"Staged '{toolchain_build_gn_path.name}' changes with 'git add' after GN list normalization.", to_console=True)
-    else:
-        run(["git", "add", str(toolchain_build_gn_path)], cwd=v8_source_dir, env=env, check=False)
+    staging.flush()
 
-def gclient_sync_with_retry(env: dict, root_dir: str, v8_src_dir: str, retries: int = MAX_GCLIENT_RETRIES):
-    """Runs gclient sync with retries and error handling, aggressively patching vs_toolchain.py before each attempt and after if needed."""
+def patch_v8_deps_for_mingw(v8_source_dir: str, env: dict):
+    """
+    Patches the DEPS file to remove problematic dependencies for MinGW build, before the dependency sync.
+    The .gni and .gn files come from DEPS entries (build/), so they are patched after it (_patch_build_files()).
+    """
+    deps_path = Path(v8_source_dir) / "DEPS" # Use Path
+    if not deps_path.exists():
+        log("WARN", f"DEPS file not found at {deps_path}. Skipping DEPS patch.", to_console=True)
+        return
+
+    log("INFO", f"Patching DEPS file at {deps_path} for MinGW compatibility.", to_console=True)
+    apply_patch_specs(deps_path, DEPS_PATCH_SPECS) # Not fatal: a DEPS that cannot be pruned is synced as it is.
+    report_deps_pruning(v8_source_dir, str(Path(v8_source_dir).parent), env)
+
+def _gclient_fetch_flags() -> list:
+    # The solution is always pinned: without --revision, gclient (with -D/--force) would move the bootstrapped
+    # checkout to its default branch head, dropping V8_REF and the pruned DEPS, and no later step moves it back.
+    flags = ["--revision", f"v8@{V8_REF}"]
+    if GIT_FETCH_MODE == "lean":
+        # Every DEPS entry at its pinned revision without history. DEPS is still resolved by gclient from the
+        # pinned commit, so the dependency set is the same as in full mode.
+        return flags + ["--no-history"]
+    return flags + ["--with_branch_heads", "--with_tags"]
+
+def _gclient_command() -> list:
+    """The gclient invocation: depot_tools' gclient.py run by this interpreter, else gclient(.bat) from PATH."""
     gclient_py_path = Path(DEPOT_TOOLS) / "gclient.py"
+    if gclient_py_path.exists():
+        # If gclient.py exists directly, we'll use sys.executable to run it.
+        return [sys.executable, str(gclient_py_path)]
     # Check if gclient is in PATH as gclient.bat or gclient
-    gclient_to_use = []
-    if not gclient_py_path.exists():
-        gclient_cmd_in_path = shutil.which("gclient") or shutil.which("gclient.bat")
-        if gclient_cmd_in_path:
-            log("INFO", f"Found gclient in PATH: {gclient_cmd_in_path}", to_console=False)
-            gclient_to_use = [str(gclient_cmd_in_path)]
-        else:
-            raise RuntimeError(f"gclient.py not found at {gclient_py_path} nor in system PATH. Ensure depot_tools is correctly cloned and configured.")
+    gclient_cmd_in_path = shutil.which("gclient") or shutil.which("gclient.bat")
+    if gclient_cmd_in_path:
+        log("INFO", f"Found gclient in PATH: {gclient_cmd_in_path}", to_console=False)
+        return [str(gclient_cmd_in_path)]
+    raise RuntimeError(f"gclient.py not found at {gclient_py_path} nor in system PATH. Ensure depot_tools is correctly cloned and configured.")
+
+# ----------------------------
+# === Parallel DEPS fetcher ===
+# ----------------------------
+# gclient sync fetches the DEPS entries itself, but a single entry that keeps failing fails the whole sync,
+# and the next attempt starts over on every entry. The prefetcher asks gclient for the resolved entries
+# (`gclient revinfo`: DEPS of the checked-out V8 with Var()s and conditions applied), then fetches each git
+# entry on its own, DEPS_FETCH_JOBS at a time, with DEPS_FETCH_RETRIES attempts and DEPS_FETCH_BACKOFF per
+# entry. With the git cache enabled the entries' mirrors are populated (gclient then clones from them);
+# without it the checkouts themselves are created or updated. Either way gclient sync finds every pinned
+# revision present. Entries the prefetcher gave up on are left to gclient sync and its own retries.
+_deps_prefetch_runs = []
+
+def gclient_revinfo(env, root_dir: str, solution: str):
+    """
+    {checkout path relative to root_dir: (url, revision or None)} for the git DEPS entries of the solutions
+    in root_dir, without `solution` itself; None (after a WARN) when gclient cannot resolve them.
+    """
+    json_path = Path(root_dir) / ".cerebrumlux-revinfo.json"
+    try:
+        run(_gclient_command() + ["revinfo", "--output-json", str(json_path), "--ignore-dep-type", "cipd"], cwd=root_dir, env=env)
+        with open(json_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except Exception as e:
+        log("WARN", f"gclient revinfo failed ({e}); the DEPS entries are left to gclient sync.", to_console=True)
+        return None
+    finally:
+        try:
+            os.remove(json_path)
+        except OSError:
+            pass
+    return {path: (entry["url"], entry.get("rev")) for path, entry in entries.items() if path != solution and entry.get("url")}
+
+def _fetch_dep_checkout(env, checkout: Path, url: str, revision) -> str:
+    """Brings `revision` of `url` into the git checkout at `checkout`, creating it if needed. Returns "fetched" or "present"."""
+    if (checkout / ".git").exists():
+        if _is_commit_sha(revision) and run(['git', 'cat-file', '-e', f'{revision}^{{commit}}'], cwd=str(checkout), env=env, check=False).returncode == 0:
+            return "present"
+        # Unborn HEAD: the leftover of an attempt that failed between init and checkout.
+        needs_checkout = run(['git', 'rev-parse', '--quiet', '--verify', 'HEAD'], cwd=str(checkout), env=env, check=False).returncode != 0
     else:
-        # If gclient.py exists directly, we'll use sys.executable to run it.
-        gclient_to_use = [sys.executable, str(gclient_py_path)]
-    
+        checkout.mkdir(parents=True, exist_ok=True)
+        run(['git', 'init', '--quiet'], cwd=str(checkout), env=env)
+        run(['git', 'remote', 'add', 'origin', url], cwd=str(checkout), env=env)
+        needs_checkout = True
+    # From the URL rather than 'origin': gclient switches a checkout whose DEPS URL changed itself.
+    ref = revision[len("origin/"):] if revision and revision.startswith("origin/") else (revision or "HEAD")
+    run(['git', 'fetch', '--no-tags', '--no-recurse-submodules', '--quiet'] + (['--depth=1'] if GIT_FETCH_MODE == "lean" else []) + [url, ref],
+        cwd=str(checkout), env=env)
+    if needs_checkout:
+        run(['git', 'checkout', '--quiet', '--detach', 'FETCH_HEAD'], cwd=str(checkout), env=env)
+    return "fetched"
+
+def _fetch_dep(env, root_dir: str, path: str, url: str, revision) -> dict:
+    """
+    Fetches one DEPS entry over its best route (select_git_routes(): local mirror, GIT_URL_REWRITES mirrors,
+    proxies), falling back to the next route; each route gets its own retries and back-off (retry_call(), so
+    a permanent failure or a tripped host ends them early). Never raises; returns the entry's report.
+    """
+    report = {"path": path, "url": url, "revision": revision, "status": "failed", "attempts": 0, "seconds": 0.0, "bytes": 0}
+    mirror = git_cache_mirror_path(url) if GIT_CACHE_DIR else None
+    checkout = Path(root_dir) / path
+    objects = (mirror if mirror else checkout / ".git") / "objects"
+    start = time.perf_counter()
+
+    def fetch(routed):
+        if mirror:
+            if git_cache_populate(routed, url, revision, strict=True) is None:
+                raise RuntimeError(f"git cache mirror {mirror} is locked by another process")
+            return "fetched" if _dir_size(objects) != bytes_before else "present"
+        return _fetch_dep_checkout(routed, checkout, url, revision)
+
+    with trace_span(f"deps {path}", "deps", url=url, revision=revision) as span:
+        bytes_before = _dir_size(objects)
+        # A revision that is already here needs no route, so resuming does not probe anything.
+        present = _is_commit_sha(revision) and (mirror or checkout / ".git").exists() and \
+            run(['git', 'cat-file', '-e', f'{revision}^{{commit}}'], cwd=str(mirror or checkout), env=env, check=False).returncode == 0
+        for route in [{"url": url, "proxy": "", "source": "origin"}] if present else select_git_routes(env, url, revision):
+            attempts = {}
+            try:
+                report["status"] = retry_call(lambda: fetch(route_env(env, url, route)), f"DEPS fetch of '{path}' over {_route_label(route)}",
+                                              DEPS_FETCH_RETRIES, DEPS_FETCH_BACKOFF, host=failure_host(route["url"], route["proxy"]), report=attempts)
+                report["route"] = route["source"]
+                report.pop("error", None)
+                report.pop("failure", None)
+                break
+            except Exception as e:
+                report["error"] = str(e)[:500]
+                report["failure"] = classify_failure(e)[0] if not isinstance(e, CircuitOpenError) else "circuit_open"
+                forget_git_route(url, route)
+            finally:
+                report["attempts"] += attempts.get("attempts", 0)
+        report["bytes"] = max(0, _dir_size(objects) - bytes_before)
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        span.update(status=report["status"], attempts=report["attempts"], bytes=report["bytes"])
+    log("INFO" if report["status"] != "failed" else "WARN",
+        f"DEPS {report['status']}: '{path}' @ {revision or 'HEAD'} in {report['seconds']:.2f}s, {report['bytes'] / 1024:.0f} KiB, "
+        f"{report['attempts']} attempt(s)" + (f", route {report['route']}" if report.get("route") else "") + ".", to_console=False)
+    return report
+
+def prefetch_deps(env, root_dir: str, v8_src_dir: str, jobs: int = None):
+    """
+    Fetches the git DEPS entries of the V8 checkout in parallel (see above), logs the slowest ones and adds
+    per-entry time, bytes and attempts to the run summary. Returns the summary, or None if nothing was
+    prefetched (no DEPS checked out yet, or gclient could not resolve it).
+    """
+    if not (Path(v8_src_dir) / "DEPS").exists():
+        return None
+    entries = gclient_revinfo(env, root_dir, Path(v8_src_dir).name)
+    if not entries:
+        return None
+    jobs = max(1, min(jobs or DEPS_FETCH_JOBS, len(entries)))
+    paths = sorted(entries)
+    # An entry nested in another one waits for it, so the outer checkout never lands on top of the inner one.
+    nesting = {path: sum(1 for other in paths if path.startswith(other.rstrip("/") + "/")) for path in paths}
+    log("INFO", f"Prefetching {len(paths)} DEPS entries with {jobs} job(s) ({'git cache mirrors' if GIT_CACHE_DIR else 'checkouts'}).", to_console=True)
+    start = time.perf_counter()
+    reports = []
+    with trace_span("deps prefetch", "deps", entries=len(paths), jobs=jobs):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="deps") as pool:
+            for level in sorted(set(nesting.values())):
+                futures = [pool.submit(_fetch_dep, env, root_dir, path, *entries[path]) for path in paths if nesting[path] == level]
+                reports.extend(future.result() for future in futures)
+    counts = collections.Counter(report["status"] for report in reports)
+    summary = {"jobs": jobs, "entries": len(reports), "fetched": counts["fetched"], "present": counts["present"], "failed": counts["failed"],
+               "wall_seconds": round(time.perf_counter() - start, 3), "bytes": sum(report["bytes"] for report in reports),
+               "retried": sum(1 for report in reports if report["attempts"] > 1), "deps": reports}
+    log("INFO", f"DEPS prefetch: {summary['fetched']} fetched, {summary['present']} already present, {summary['failed']} failed, "
+                f"{summary['bytes'] / (1024 * 1024):.1f} MiB in {summary['wall_seconds']:.2f}s.", to_console=True)
+    for report in sorted(reports, key=lambda r: r["seconds"], reverse=True)[:SLOWEST_COMMANDS_REPORTED]:
+        log("INFO", f"  {report['seconds']:>9.2f}s {report['bytes'] / 1024:>10.0f} KiB  x{report['attempts']}  {report['status']:<7}  {report['path']}", to_console=True)
+    if summary["failed"]:
+        log("WARN", "DEPS entries left to gclient sync after failing every attempt: "
+                    + ", ".join(report["path"] for report in reports if report["status"] == "failed"), to_console=True)
+    _deps_prefetch_runs.append(summary)
+    record_run_summary("deps_prefetch", _deps_prefetch_runs)
+    return summary
+
+def _refresh_local_mirror(env, checkout: Path, url: str) -> int:
+    """Adds `checkout`'s HEAD commit to the local mirror of `url` (created if needed). Returns the bytes the mirror grew by."""
+    mirror = local_git_mirror_path(url)
+    head = run(['git', 'rev-parse', 'HEAD'], cwd=str(checkout), env=env).stdout.strip()
+    size_before = _dir_size(mirror)
+    if not (mirror / "HEAD").is_file():
+        if mirror.exists():
+            aggressive_rmtree(str(mirror)) # Leftover of an interrupted refresh
+        run(['git', 'init', '--bare', '--quiet', str(mirror)], env=env)
+        run(['git', 'config', 'remote.origin.url', url], cwd=str(mirror), env=env)
+        run(['git', 'config', 'uploadpack.allowReachableSHA1InWant', 'true'], cwd=str(mirror), env=env) # Pinned SHAs for protocol v0 clients
+    if run(['git', 'cat-file', '-e', f'{head}^{{commit}}'], cwd=str(mirror), env=env, check=False).returncode != 0:
+        # Straight from the checkout (a shallow one makes a shallow mirror), so no network is involved.
+        run(['git', 'fetch', '--quiet', '--no-tags', str(checkout), f'+HEAD:refs/cerebrumlux/{head}'], cwd=str(mirror), env=env)
+    return max(0, _dir_size(mirror) - size_before)
+
+def refresh_local_mirrors(env, root_dir: str, v8_src_dir: str):
+    """
+    Creates or refreshes a bare mirror in LOCAL_GIT_MIRROR_DIR for depot_tools, V8 and every git DEPS entry of
+    the last sync, from the checkouts themselves. Each checked-out commit is kept as refs/cerebrumlux/<sha>,
+    so every V8 version refreshed so far can be served from the mirrors. Returns the summary, or None when
+    local mirrors are disabled.
+    """
+    if not LOCAL_GIT_MIRROR_DIR:
+        log("ERROR", "LOCAL_GIT_MIRROR_DIR is not set; there is nowhere to put local mirrors.", to_console=True)
+        return None
+    os.makedirs(LOCAL_GIT_MIRROR_DIR, exist_ok=True)
+    entries = {Path(DEPOT_TOOLS): DEPOT_TOOLS_GIT_URL, Path(v8_src_dir): V8_GIT_URL}
+    entries.update({Path(root_dir) / path: url for path, (url, _) in (gclient_revinfo(env, root_dir, Path(v8_src_dir).name) or {}).items()})
+    checkouts = {checkout: url for checkout, url in entries.items() if (checkout / ".git").exists()}
+    log("INFO", f"Refreshing {len(checkouts)} local mirror(s) in {LOCAL_GIT_MIRROR_DIR} ({len(entries) - len(checkouts)} entries not checked out).", to_console=True)
+
+    def refresh(checkout):
+        try:
+            return checkout, _refresh_local_mirror(env, checkout, checkouts[checkout]), None
+        except Exception as e:
+            return checkout, 0, str(e)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(DEPS_FETCH_JOBS, len(checkouts) or 1)), thread_name_prefix="mirror") as pool:
+        results = list(pool.map(refresh, sorted(checkouts)))
+    failed = [str(checkout) for checkout, _, error in results if error]
+    for checkout, _, error in results:
+        if error:
+            log("ERROR", f"Could not refresh the local mirror of {checkouts[checkout]} from {checkout}: {error}", to_console=True)
+    summary = {"mirrors": len(results) - len(failed), "failed": failed, "bytes": sum(grown for _, grown, _ in results)}
+    log("INFO", f"Local mirrors refreshed: {summary['mirrors']} ok, {len(failed)} failed, {summary['bytes'] / (1024 * 1024):.1f} MiB added.", to_console=True)
+    record_run_summary("local_mirrors", summary)
+    return summary
+
+def run_selected_hooks(env, root_dir: str, v8_src_dir: str) -> dict:
+    """
+    Runs the hooks of the synced V8 DEPS that GCLIENT_HOOK_ALLOWLIST names and whose condition holds, in DEPS
+    order and each timed on its own, after a `gclient sync --nohooks` (the hooks of recursed DEPS files are
+    not run). The commands are prepared the way gclient prepares them: python* is this interpreter, the cwd is
+    the gclient root (the solution with use_relative_hooks) plus the hook's own cwd. A failing hook raises,
+    failing the sync attempt like a failing gclient hook. Returns the summary recorded as "gclient_hooks",
+    or None when DEPS could not be evaluated and `gclient runhooks` ran every hook instead.
+    """
+    try:
+        graph = evaluate_deps((Path(v8_src_dir) / "DEPS").read_text(encoding="utf-8"))
+    except Exception as e:
+        log("WARN", f"Could not evaluate DEPS to select its hooks ({e}); running all of them with gclient runhooks.", to_console=True)
+        run(_gclient_command() + ["runhooks"], cwd=root_dir, env=env)
+        return None
+    cwd_base = Path(v8_src_dir) if graph["use_relative_hooks"] else Path(root_dir)
+    summary = {"mode": GCLIENT_HOOK_MODE, "hooks": len(graph["hooks"]), "ran": [], "skipped": [], "seconds": 0.0}
+    try:
+        for index, hook in enumerate(graph["hooks"]):
+            name = hook["name"] or f"#{index}"
+            if not any(fnmatch.fnmatchcase(name, pattern) for pattern in GCLIENT_HOOK_ALLOWLIST):
+                summary["skipped"].append({"name": name, "reason": "not allowed"})
+                continue
+            if not hook["active"]:
+                summary["skipped"].append({"name": name, "reason": "condition false" if hook["active"] is False else "condition not evaluated"})
+                continue
+            command = list(hook["action"])
+            if command and command[0] in ("python", "python3", "vpython", "vpython3"):
+                command[0] = sys.executable
+            elif command:
+                command[0] = shutil.which(command[0], path=env.get("PATH")) or command[0] # .bat/.exe wrappers from depot_tools
+            start = time.perf_counter()
+            with trace_span(f"hook {name}", "hooks", action=" ".join(hook["action"])):
+                run(command, cwd=str(cwd_base / hook["cwd"] if hook["cwd"] else cwd_base), env=env)
+            seconds = time.perf_counter() - start
+            summary["ran"].append({"name": name, "seconds": round(seconds, 3)})
+            summary["seconds"] = round(summary["seconds"] + seconds, 3)
+            log("INFO", f"Hook '{name}' finished in {seconds:.2f}s.", to_console=True)
+    finally:
+        record_run_summary("gclient_hooks", summary)
+    log("INFO", f"DEPS hooks: ran {len(summary['ran'])} of {summary['hooks']} in {summary['seconds']:.2f}s"
+                + ("; skipped " + ", ".join(f"{hook['name']} ({hook['reason']})" for hook in summary["skipped"]) if summary["skipped"] else "") + ".", to_console=True)
+    return summary
+
+def _git_borrow_objects(checkout: Path, mirror: Path):
+    """Lets `checkout` read the objects of `mirror` (objects/info/alternates, what `git clone --reference` sets up)."""
+    alternates = checkout / ".git" / "objects" / "info" / "alternates"
+    entry = (mirror / "objects").resolve().as_posix()
+    existing = alternates.read_text(encoding="utf-8").splitlines() if alternates.exists() else []
+    if entry not in existing:
+        alternates.parent.mkdir(parents=True, exist_ok=True)
+        alternates.write_text("\n".join(existing + [entry]) + "\n", encoding="utf-8")
+
+def bootstrap_v8_checkout(env, v8_src_dir: str):
+    """
+    Makes `v8_src_dir` a checkout of exactly V8_REF: the V8 repository alone, with no DEPS entry fetched and no
+    hook run, so DEPS can be pruned before the one gclient sync that fetches the dependencies. The commit is
+    fetched over the best route (select_git_routes()), falling back to the others, and through the git cache
+    mirror when there is one (borrowed via alternates, like gclient's cache clones). A checkout that already
+    has V8_REF is only reset to it.
+    """
+    checkout = Path(v8_src_dir)
+    initialized = (checkout / ".git").exists()
+    # No commit yet (new, or left by a bootstrap that failed before its first fetch): fetch shallow in lean mode.
+    fresh = not initialized or run(['git', 'rev-parse', '--verify', '--quiet', 'HEAD^{commit}'], cwd=str(checkout), env=env, check=False).returncode != 0
+    if initialized:
+        if _is_commit_sha(V8_REF) and run(['git', 'cat-file', '-e', f'{V8_REF}^{{commit}}'], cwd=str(checkout), env=env, check=False).returncode == 0:
+            git_fetch_and_reset(env, str(checkout), V8_REF)
+            return
+    else:
+        log("INFO", f"Bootstrapping {checkout} with V8 alone; its DEPS entries come with the dependency sync.", to_console=True)
+        checkout.mkdir(parents=True, exist_ok=True)
+        run(['git', 'init', '--quiet'], cwd=str(checkout), env=env)
+        run(['git', 'remote', 'add', 'origin', V8_GIT_URL], cwd=str(checkout), env=env)
+    last_error = None
+    for route in select_git_routes(env, V8_GIT_URL, V8_REF):
+        routed = route_env(env, V8_GIT_URL, route) # 'origin' is V8_GIT_URL; a mirror route rewrites it with insteadOf
+        try:
+            mirror = git_cache_populate(routed, V8_GIT_URL, V8_REF, strict=True)
+            if mirror:
+                _git_borrow_objects(checkout, mirror)
+            git_fetch_and_reset(routed, str(checkout), V8_REF, fresh=fresh)
+            return
+        except Exception as e:
+            last_error = e
+            log("ERROR", f"Fetching V8 {V8_REF} over {_route_label(route)} failed: {e}")
+            forget_git_route(V8_GIT_URL, route)
+    raise RuntimeError(f"Could not fetch V8 {V8_REF} on any route: {last_error}")
+
+def gclient_sync_with_retry(env: dict, root_dir: str, v8_src_dir: str, retries: int = MAX_GCLIENT_RETRIES):
+    """
+    Runs gclient sync with retries and error handling, patching vs_toolchain.py after each attempt. With
+    GCLIENT_HOOK_MODE "selected" the sync runs no hooks and run_selected_hooks() follows it; with "all",
+    gclient's hooks run vs_toolchain.py, so it is patched before each attempt as well.
+    """
     vs_toolchain_path = Path(v8_src_dir) / "build" / "vs_toolchain.py"
 
-    cmd_base = gclient_to_use + ["sync", "-D", "--with_branch_heads", "--with_tags", "--force"]
+    cmd_base = _gclient_command() + ["sync", "-D", "--jobs", str(DEPS_FETCH_JOBS)] + _gclient_fetch_flags() + ["--force"]
+    if GCLIENT_HOOK_MODE == "selected":
+        cmd_base.append("--nohooks")
+
+    # The solution's URL (V8_GIT_URL in .gclient) is reached over the best route; a transient failure moves to the next one.
+    routes = select_git_routes(env, V8_GIT_URL, V8_REF)
+    route_index = 0
+    base_env = _git_config_env(env, git_rewrite_settings()) # DEPS entries gclient fetches itself honour GIT_URL_REWRITES too
+    env = route_env(base_env, V8_GIT_URL, routes[0])
+
+    if DEPS_PREFETCH:
+        prefetch_deps(env, root_dir, v8_src_dir)
     
     for attempt in range(1, retries + 1):
         try:
-            log("INFO", f"gclient sync attempt {attempt}/{retries}.")
+            log("INFO", f"gclient sync attempt {attempt}/{retries} over {_route_label(routes[route_index])}.")
             
-            patch_tries = 0
-            MAX_PATCH_LOOP_TRIES_INNER = 5 # User suggested 5 retries for patching loop
-            
-            while True:
-                current_vs_toolchain_exists = vs_toolchain_path.exists()
-                if not current_vs_toolchain_exists:
-                    log("DEBUG", f"'{vs_toolchain_path.name}' does not exist yet. Cannot apply pre-sync patch. Continuing...", to_console=False)
-                    break
-
-                if patch_tries >= MAX_PATCH_LOOP_TRIES_INNER:
-                    log("FATAL", f"'{vs_toolchain_path.name}' still contains problematic VS detection logic or missing shim after {MAX_PATCH_LOOP_TRIES_INNER} pre-sync patch attempts. Aborting.", to_console=True)
+            if GCLIENT_HOOK_MODE == "all" and vs_toolchain_path.exists():
+                # gclient's hooks run vs_toolchain.py, so the shim has to be in place before the sync.
+                if not _apply_vs_toolchain_patch_logic(vs_toolchain_path):
+                    log("FATAL", f"Pre-sync patch of '{vs_toolchain_path.name}' failed before attempt {attempt}. Aborting.", to_console=True)
                     sys.exit(1)
-                
-                content_before_patch = ""
-                if vs_toolchain_path.exists():
-                    content_before_patch = vs_toolchain_path.read_text(encoding='utf-8')
-
-                # Combined check for critical strings (pipes, VS exception) and v7.36 shim content
-                if f"# --- CerebrumLux injected shim START (v7.36) ---" not in content_before_patch:
-                    needs_patch = True
-                else:
-                    needs_patch = False # Assume patched if latest shim marker is present
-
-                if not needs_patch:
-                    log("INFO", f"'{vs_toolchain_path.name}' does not contain critical strings and shim (v7.36) is present and correct. Pre-sync patch skipped (already fine).", to_console=False)
-                    break
 
-                log("INFO", f"Pre-sync patch loop: Attempting to patch '{vs_toolchain_path.name}' (pipes, VS exception, or shim v7.36 content issue detected). Try {patch_tries+1}/{MAX_PATCH_LOOP_TRIES_INNER}.", to_console=False)
-                if _apply_vs_toolchain_patch_logic(vs_toolchain_path):
-                    log("INFO", f"Pre-sync patch of '{vs_toolchain_path.name}' successful on try {patch_tries+1}.", to_console=False)
-                    break
-                else:
-                    log("WARN", f"Pre-sync patch of '{vs_toolchain_path.name}' failed on try {patch_tries+1}. Retrying patch...", to_console=False)
-                    time.sleep(1)
-                patch_tries += 1
-            
             run(cmd_base, cwd=root_dir, env=env)
             log("INFO", "gclient sync completed successfully.")
 
@@ -1473,11 +3340,14 @@ def gclient_sync_with_retry(env: dict, root_dir: str, v8_src_dir: str, retries:
                 if not _apply_vs_toolchain_patch_logic(vs_toolchain_path):
                     log("FATAL", f"Post-sync patch of '{vs_toolchain_path.name}' failed after attempt {attempt}. Aborting.", to_console=True)
                     sys.exit(1)
-            
+
+            if GCLIENT_HOOK_MODE == "selected":
+                run_selected_hooks(env, root_dir, v8_src_dir)
             return
 
         except Exception as e:
-            log("ERROR", f"gclient sync attempt {attempt} failed: {e}")
+            kind, reason = note_failure(e)
+            log("ERROR", f"gclient sync attempt {attempt} failed ({kind}: {reason}): {e}")
             
             if vs_toolchain_path.exists():
                 log("INFO", f"Error-recovery patch attempt for '{vs_toolchain_path.name}' after failed gclient sync attempt {attempt}.", to_console=False)
@@ -1485,9 +3355,16 @@ def gclient_sync_with_retry(env: dict, root_dir: str, v8_src_dir: str, retries:
                     log("FATAL", f"Error-recovery patch of '{vs_toolchain_path.name}' failed after attempt {attempt}. Aborting.", to_console=True)
                     sys.exit(1)
 
+            if kind == "permanent":
+                log("ERROR", f"gclient sync failure is permanent ({reason}); not retrying.", to_console=True)
+                raise
+            if kind == "transient" and len(routes) > 1:
+                forget_git_route(V8_GIT_URL, routes[route_index])
+                route_index = (route_index + 1) % len(routes)
+                env = route_env(base_env, V8_GIT_URL, routes[route_index])
             if attempt < retries:
-                sleep_for = GCLIENT_RETRY_BACKOFF[min(attempt-1, len(GCLIENT_RETRY_BACKOFF)-1)]
-                log("INFO", f"Retrying gclient sync in {sleep_for}s (attempt {attempt+1}/{retries})...")
+                sleep_for = retry_delay(GCLIENT_RETRY_BACKOFF, attempt)
+                log("INFO", f"Retrying gclient sync in {sleep_for:.1f}s (attempt {attempt+1}/{retries})...")
                 time.sleep(sleep_for)
             else:
                 raise
@@ -1553,15 +3430,13 @@ def ensure_depot_tools(env):
         return
     log("STEP", f"Cloning depot_tools into {DEPOT_TOOLS}")
     os.makedirs(Path(DEPOT_TOOLS).parent, exist_ok=True) # Use Path
-    git_clone_with_retry(env, DEPOT_TOOLS, "https://chromium.googlesource.com/chromium/tools/depot_tools.git")
+    git_clone_with_retry(env, DEPOT_TOOLS, DEPOT_TOOLS_GIT_URL)
     log("INFO", "depot_tools cloned.")
 
-def write_args_gn(out_dir):
-    """Writes the args.gn file for the GN build configuration."""
-    out_dir_path = Path(out_dir) # Use Path
-    os.makedirs(out_dir_path, exist_ok=True)
+def _args_gn_content() -> str:
+    """Returns the base args.gn content for the MinGW build (run_gn_gen may append to it later)."""
     mingw_for = Path(MINGW_BIN).as_posix() # Use Path.as_posix() directly for consistency
-    args_content = (
+    return (
         "is_debug = false\n"
         "target_os = \"win\"\n"
         "target_cpu = \"x64\"\n"
@@ -1581,13 +3456,32 @@ def write_args_gn(out_dir):
         "v8_target_cpu = \"x64\"\n"
         "v8_target_os = \"win\"\n"
     )
+
+def write_args_gn(out_dir):
+    """Writes the args.gn file for the GN build configuration."""
+    out_dir_path = Path(out_dir) # Use Path
+    os.makedirs(out_dir_path, exist_ok=True)
+    args_content = _args_gn_content()
     p = out_dir_path / "args.gn" # Use Path for robust path handling
     with p.open("w", encoding="utf-8") as f:
         f.write(args_content)
     log("INFO", f"args.gn written to {p}")
 
+def _dump_failing_gn_files():
+    """On GN failure, capture the current BUILD.gn contents for debugging."""
+    ts = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    for rel in ["build/config/win/BUILD.gn", "build/toolchain/win/BUILD.gn"]:
+        p = Path(V8_SRC) / rel
+        if p.exists():
+            try:
+                err_dump = Path(LOG_DIR) / f"{p.name}.gnfail.{ts}.txt"
+                err_dump.write_text(p.read_text(encoding='utf-8'), encoding='utf-8')
+                log("ERROR", f"Saved failing GN file to '{err_dump}' for inspection.", to_console=True)
+            except Exception as e2:
+                log("WARN", f"Failed to save failing GN file {p}: {e2}", to_console=True)
+
 def run_gn_gen(env):
-    gn_tool = _find_tool("gn")
+    gn_bin = _find_tool(["gn", "gn.exe"])
     # Backup critical GN files before generation for easier debugging if GN fails
     for rel in ["build/config/win/BUILD.gn", "build/toolchain/win/BUILD.gn"]:
         p = Path(V8_SRC) / rel
@@ -1601,21 +3495,11 @@ def run_gn_gen(env):
             except Exception as e:
                 log("WARN", f"Could not backup {p}: {e}", to_console=True)
 
-    try:
-        run([str(gn_tool), "gen", OUT_DIR], cwd=V8_SRC, env=env, check=True)
-    except Exception as e:
-        # On GN failure, capture the current BUILD.gn contents for debugging.
-        ts = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-        for rel in ["build/config/win/BUILD.gn", "build/toolchain/win/BUILD.gn"]:
-            p = Path(V8_SRC) / rel
-            if p.exists():
-                try:
-                    err_dump = Path(LOG_DIR) / f"{p.name}.gnfail.{ts}.txt"
-                    err_dump.write_text(p.read_text(encoding='utf-8'), encoding='utf-8')
-                    log("ERROR", f"Saved failing GN file to '{err_dump}' for inspection.", to_console=True)
-                except Exception as e2:
-                    log("WARN", f"Failed to save failing GN file {p}: {e2}", to_console=True)
+    if not gn_bin:
         raise RuntimeError("gn binary not found in PATH nor in depot_tools.")
+    # The patched files may have been edited since the patch steps ran (e.g. their checkpoints were reused).
+    if not report_gn_validation(V8_SRC):
+        raise RuntimeError("Patched GN files do not parse (see GN validation errors above); fix or restore them before running gn gen.")
     
     gn_command = [gn_bin, "gen", OUT_DIR]
     max_attempts = 2 # Try once, then once more after potential args.gn patching
@@ -1629,8 +3513,10 @@ def run_gn_gen(env):
                 log("INFO", f"GN generated build files in {OUT_DIR}.")
                 return # Success!
             
-            error_output = (cp.stdout or "") + (cp.stderr or "")
+            # run() only keeps the last RUN_TAIL_LINES lines of each stream; GN's diagnostics are short, so that is enough for matching.
+            error_output = (cp.stdout or "") + "\n" + (cp.stderr or "")
             log("ERROR", f"GN gen failed on attempt {attempt}: \n{error_output}", to_console=False)
+            _dump_failing_gn_files()
 
             # Check for specific errors that indicate missing vcvars_toolchain_data or win_toolchain_data variables or GN syntax error
             
@@ -1695,12 +3581,8 @@ def run_gn_gen(env):
                 # Define the vcvars_toolchain_data block to inject (using pre-formatted paths)
                 vcvars_data_block = (
                     '\n# CerebrumLux Auto-patched vcvars_toolchain_data for MinGW build\n'
-                    'vcvars_toolchain_data = {\n'
-                    f'  vc_lib_path = "{(fake_vs_base_path_obj / "VC" / "lib").as_posix()}"\n'
-                    f'  vc_lib_atlmfc_path = "{(fake_vs_base_path_obj / "VC" / "atlmfc" / "lib").as_posix()}"\n'
-                    f'  vc_lib_um_path = "{(fake_vs_base_path_obj / "VC" / "um" / "lib").as_posix()}"\n'
-                    f'  vc_lib_ucrt_path = "{(fake_vs_base_path_obj / "VC" / "ucrt" / "lib").as_posix()}"\n'
-                    '}\n'
+                    'vcvars_toolchain_data = ' + gn_format_value({field: _DUMMY_VCVARS_PATHS[field] for field in
+                                                                  ("vc_lib_path", "vc_lib_atlmfc_path", "vc_lib_um_path", "vc_lib_ucrt_path")}) + '\n'
                 )
 
                 if 'vcvars_toolchain_data = {' not in current_args_content or \
@@ -1713,18 +3595,7 @@ def run_gn_gen(env):
                 # --- START: New win_toolchain_data injection logic for args.gn (now including sys_lib_flags and sys_include_flags) ---
                 win_toolchain_data_block = (
                     '\n# CerebrumLux Auto-patched win_toolchain_data for MinGW build\n'
-                    'win_toolchain_data = {\n'
-                    f'  vc_bin_dir = "{(fake_vs_base_path_obj / "VC" / "Tools" / "Bin" / "Hostx64" / "x64").as_posix()}"\n'
-                    f'  vc_lib_path = "{(fake_vs_base_path_obj / "VC" / "lib").as_posix()}"\n'
-                    f'  vc_include_path = "{(fake_vs_base_path_obj / "VC" / "include").as_posix()}"\n'
-                    f'  sdk_dir = "{(fake_vs_base_path_obj / "SDK").as_posix()}"\n'
-                    f'  sdk_lib_path = "{(fake_vs_base_path_obj / "SDK" / "lib").as_posix()}"\n'
-                    f'  sdk_include_path = "{(fake_vs_base_path_obj / "SDK" / "include").as_posix()}"\n'
-                    f'  runtime_dirs = "{(fake_vs_base_path_obj / "redist").as_posix()}"\n'
-                    f'  include_flags_imsvc = ""\n'
-                    f'  sys_lib_flags = []\n'
-                    f'  sys_include_flags = []\n'
-                    '}\n'
+                    'win_toolchain_data = ' + gn_format_value(dict(dummy_win_toolchain_paths, sys_lib_flags=[], sys_include_flags=[])) + '\n'
                 )
                 if needs_toolchain_data_patch and ('win_toolchain_data = {' not in current_args_content or
                                                       f'vc_bin_dir = "{(fake_vs_base_path_obj / "VC" / "Tools" / "Bin" / "Hostx64" / "x64").as_posix()}"' not in current_args_content or
@@ -1769,12 +3640,10 @@ def run_ninja_build(env):
     run([str(ninja_bin), "-C", OUT_DIR, NINJA_TARGET], cwd=V8_SRC, env=env)
     log("INFO", f"Ninja build of '{NINJA_TARGET}' completed.")
 
-def copy_to_vcpkg():
-    """Copies compiled V8 artifacts (lib and headers) to vcpkg's installed directory."""
+def copy_v8_library_to_vcpkg():
+    """Copies the compiled libv8_monolith.a to vcpkg's installed lib directory."""
     target_lib_dir = Path(VCPKG_ROOT) / "installed" / "x64-mingw-static" / "lib"
-    target_include_dir = Path(VCPKG_ROOT) / "installed" / "x64-mingw-static" / "include"
     os.makedirs(target_lib_dir, exist_ok=True)
-    os.makedirs(target_include_dir, exist_ok=True)
     
     lib_candidate = Path(OUT_DIR) / "obj" / "libv8_monolith.a"
     if not lib_candidate.exists():
@@ -1793,6 +3662,11 @@ def copy_to_vcpkg():
     shutil.copy2(lib_candidate, target_lib_dir)
     log("INFO", f"Copied '{lib_candidate.name}' to '{target_lib_dir}'")
 
+def copy_v8_headers_to_vcpkg():
+    """Copies the V8 public headers to vcpkg's installed include directory (independent of the ninja build)."""
+    target_include_dir = Path(VCPKG_ROOT) / "installed" / "x64-mingw-static" / "include"
+    os.makedirs(target_include_dir, exist_ok=True)
+
     src_include = Path(V8_SRC) / "include"
     if not src_include.is_dir():
         log("ERROR", f"Headers not found in source include path: {src_include}")
@@ -1800,7 +3674,13 @@ def copy_to_vcpkg():
     
     shutil.copytree(src_include, target_include_dir, dirs_exist_ok=True)
     log("INFO", f"V8 headers copied from '{src_include}' to '{target_include_dir}'")
-    log("INFO", f"V8 lib + headers copied into vcpkg installed tree ({target_lib_dir}, {target_include_dir})")
+
+def copy_to_vcpkg():
+    """Copies compiled V8 artifacts (lib and headers) to vcpkg's installed directory."""
+    copy_v8_library_to_vcpkg()
+    copy_v8_headers_to_vcpkg()
+    target_root = Path(VCPKG_ROOT) / "installed" / "x64-mingw-static"
+    log("INFO", f"V8 lib + headers copied into vcpkg installed tree ({target_root / 'lib'}, {target_root / 'include'})")
 
 def update_vcpkg_port(version, ref, homepage, license):
     """Updates or creates the vcpkg portfile and manifest for V8."""
@@ -1948,21 +3828,468 @@ def _patch_gerrit_util_py(depot_tools_dir: str, env: dict) -> bool:
 
             gerrit_util_path.write_text(patched_content, encoding="utf-8")
             log("INFO", f"'{gerrit_util_path.name}' patched successfully.", to_console=True)
-            # Staging changes to prevent gclient sync -D from reverting them
-            run(["git", "add", str(gerrit_util_path)], cwd=depot_tools_dir, env=env, check=False)
-            log("INFO", f"Staged '{gerrit_util_path.name}' changes with 'git add'.", to_console=True)
-            return True
         else:
             log("INFO", f"'{gerrit_util_path.name}' already patched or no changes needed.", to_console=False)
-            # Ensure it's staged even if no new changes, in case it was modified externally or by a previous failed attempt
-            run(["git", "add", str(gerrit_util_path)], cwd=depot_tools_dir, env=env, check=False)
-            log("INFO", f"Ensured '{gerrit_util_path.name}' is staged with 'git add'.", to_console=True)
-            return True
+        # Staging changes to prevent gclient sync -D from reverting them (a no-op if the index already matches)
+        staging = GitStagingBatch(depot_tools_dir, env)
+        staging.add(gerrit_util_path)
+        staging.flush()
+        return True
 
     except Exception as e:
         log("ERROR", f"Failed to patch '{gerrit_util_path.name}': {e}", to_console=True)
         return False
 
+# ----------------------------
+# === Pipeline steps & checkpoints ===
+# ----------------------------
+def _sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
+
+def _sha256_file(path) -> str:
+    """Returns the SHA-256 of a file's bytes, or None if it does not exist."""
+    p = Path(path)
+    if not p.is_file():
+        return None
+    h = hashlib.sha256()
+    with p.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _file_stat_token(path) -> str:
+    """Cheap size+mtime token for large build artifacts that are too expensive to hash on every run."""
+    try:
+        st = os.stat(path)
+        return f"{st.st_size}:{st.st_mtime_ns}"
+    except OSError:
+        return None
+
+def _git_head(repo_dir) -> str:
+    """Returns the checked-out commit of a git work tree, or None if it is not a git checkout."""
+    if not (Path(repo_dir) / ".git").exists():
+        return None
+    cp = run(["git", "rev-parse", "HEAD"], cwd=repo_dir, check=False, capture_output=True)
+    return cp.stdout.strip() if cp.returncode == 0 else None
+
+@functools.lru_cache(maxsize=None)
+def _toolchain_versions() -> dict:
+    """Versions of the external tools whose upgrade should invalidate build checkpoints. Probed once per run."""
+    versions = {"python": sys.version.split()[0]}
+    gcc = Path(MINGW_BIN) / "gcc.exe"
+    probes = {
+        "gcc": str(gcc) if gcc.exists() else shutil.which("gcc"),
+        "git": shutil.which("git"),
+    }
+    for name, exe in probes.items():
+        if not exe:
+            versions[name] = None # Not installed; probing would only log a spurious FATAL from run()
+            continue
+        try:
+            cp = run([exe, "--version"], check=False, capture_output=True)
+            versions[name] = (cp.stdout or "").splitlines()[0].strip() if cp.returncode == 0 and cp.stdout else None
+        except Exception:
+            versions[name] = None
+    return versions
+
+def _mingw_patch_targets(v8_source_dir: str) -> list:
+    """Files rewritten by the patch steps (DEPS first, then the build files), in patch order."""
+    return [Path(v8_source_dir) / rel_path for rel_path in MINGW_PATCH_SPECS]
+
+def _hash_files(paths) -> dict:
+    return {Path(p).relative_to(V8_ROOT).as_posix() if str(p).startswith(V8_ROOT) else str(p): _sha256_file(p) for p in paths}
+
+def _load_checkpoints() -> dict:
+    """Loads the checkpoint manifest from CHECKPOINT_FILE (empty manifest if missing or unreadable)."""
+    try:
+        with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == CHECKPOINT_FORMAT_VERSION:
+            return manifest
+        log("WARN", f"Checkpoint manifest {CHECKPOINT_FILE} has an unknown format; ignoring it.", to_console=True)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log("WARN", f"Could not read checkpoint manifest {CHECKPOINT_FILE}: {e}. Starting without checkpoints.", to_console=True)
+    return {"version": CHECKPOINT_FORMAT_VERSION, "steps": {}}
+
+def _save_checkpoints(manifest: dict):
+    """Atomically rewrites CHECKPOINT_FILE so an interrupted run never leaves a truncated manifest."""
+    try:
+        os.makedirs(os.path.dirname(CHECKPOINT_FILE), exist_ok=True)
+        tmp_path = CHECKPOINT_FILE + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, CHECKPOINT_FILE)
+    except Exception as e:
+        log("WARN", f"Could not write checkpoint manifest {CHECKPOINT_FILE}: {e}", to_console=False)
+
+def _fingerprint_digest(inputs: dict) -> str:
+    return _sha256_text(json.dumps(inputs, sort_keys=True, default=str))
+
+# --- Step implementations (bodies moved out of main() unchanged) ---
+def _step_prepare_root(env):
+    if Path(V8_ROOT).is_dir():
+        log("INFO", f"V8_ROOT '{V8_ROOT}' exists. Attempting incremental update. Manual deletion required for full fresh start.", to_console=True)
+    else:
+        log("INFO", f"Creating V8_ROOT for fresh start: {V8_ROOT}", to_console=True)
+    os.makedirs(V8_ROOT, exist_ok=True)
+    # Create dummy VS toolchain directories early
+    _create_fake_vs_toolchain_dirs(V8_ROOT)
+
+def _step_python_dependencies(env):
+    if not _install_python_dependencies(env):
+        sys.exit(1)
+
+def _step_patch_gerrit_util(env):
+    if not _patch_gerrit_util_py(DEPOT_TOOLS, env):
+        log("FATAL", "Failed to patch gerrit_util.py. Aborting.", to_console=True)
+        sys.exit(1)
+
+def _step_vs_toolchain_selftest(env):
+    try:
+        vs_toolchain_path_for_test = Path(V8_SRC) / "build" / "vs_toolchain.py"
+        if vs_toolchain_path_for_test.exists():
+            cp = run([sys.executable, str(vs_toolchain_path_for_test), "get_toolchain_dir"], 
+                     cwd=vs_toolchain_path_for_test.parent, env=env, check=False, capture_output=True)
+            
+            if cp.returncode != 0:
+                log("FATAL", f"vs_toolchain.py self-test FAILED (exit code {cp.returncode}). Stderr:\n{cp.stderr}", to_console=True)
+                sys.exit(1)
+            else:
+                log("INFO", "vs_toolchain.py self-test PASSED (exit code 0).", to_console=True)
+        else:
+            log("FATAL", "'vs_toolchain.py' not found after the dependency sync. Cannot run self-test. This indicates a deeper gclient issue.", to_console=True)
+            sys.exit(1)
+    except Exception as e:
+        log("FATAL", f"vs_toolchain.py self-test encountered an unexpected error: {e}", to_console=True)
+        sys.exit(1)
+
+def _step_patch_build_files(env):
+    # The patch specs detect patches that are already applied, so re-running them after a later sync is safe.
+    _patch_build_files(V8_SRC, env)
+
+# --- Step input fingerprints ---
+# Each function returns the inputs a step depends on. They are evaluated before the step (to decide
+# whether it can be skipped) and again after it succeeds (the recorded post-state), so a re-run skips
+# a step exactly when the world still looks the way that step left it.
+def _fp_depot_tools():
+    return {"depot_tools_head": _git_head(DEPOT_TOOLS)}
+
+def _fp_python_dependencies():
+    return {"python": sys.executable, "python_version": sys.version, "packages": ["pip", "setuptools", "httplib2", "PySocks"]}
+
+def _fp_patch_gerrit_util():
+    return {"gerrit_util": _sha256_file(Path(DEPOT_TOOLS) / "gerrit_util.py")}
+
+def _fp_write_gclient():
+    return {"url": V8_GIT_URL, "git_cache_dir": GIT_CACHE_DIR, "gclient_file": _sha256_file(Path(V8_ROOT) / ".gclient")}
+
+def _fp_vs_toolchain_selftest():
+    return {"vs_toolchain": _sha256_file(Path(V8_SRC) / "build" / "vs_toolchain.py"), "python": sys.version}
+
+def _fp_bootstrap_v8():
+    return {"v8_ref": V8_REF, "url": V8_GIT_URL, "head": _git_head(V8_SRC)}
+
+def _fp_patch_deps():
+    return {"v8_ref": V8_REF, "patch_specs": spec_set_digest(DEPS_PATCH_SPECS), "deps": _sha256_file(Path(V8_SRC) / "DEPS")}
+
+def _fp_gclient_sync_deps():
+    return {
+        "v8_ref": V8_REF,
+        "hooks": [GCLIENT_HOOK_MODE] + (GCLIENT_HOOK_ALLOWLIST if GCLIENT_HOOK_MODE == "selected" else []),
+        "deps": _sha256_file(Path(V8_SRC) / "DEPS"),
+        "gclient_file": _sha256_file(Path(V8_ROOT) / ".gclient"),
+        "depot_tools_head": _git_head(DEPOT_TOOLS),
+        "fetch_mode": GIT_FETCH_MODE,
+    }
+
+def _fp_patch_build_files():
+    return {"patch_specs": patch_specs_digest(), "files": _hash_files(_mingw_patch_targets(V8_SRC)[1:])}
+
+def _fp_write_args_gn():
+    # run_gn_gen() may append auto-patched toolchain scopes, so only the base content has to be intact.
+    args_gn_path = Path(OUT_DIR) / "args.gn"
+    base = _args_gn_content()
+    current = args_gn_path.read_text(encoding="utf-8") if args_gn_path.exists() else ""
+    return {"args_gn_base": _sha256_text(base), "args_gn_starts_with_base": current.startswith(base)}
+
+def _fp_gn_gen():
+    return {
+        "args_gn": _sha256_file(Path(OUT_DIR) / "args.gn"),
+        "files": _hash_files(_mingw_patch_targets(V8_SRC)),
+        "build_ninja": _file_stat_token(Path(OUT_DIR) / "build.ninja"),
+        "toolchain": _toolchain_versions(),
+    }
+
+def _fp_ninja_build():
+    return {
+        "v8_head": _git_head(V8_SRC),
+        "deps": _sha256_file(Path(V8_SRC) / "DEPS"),
+        "args_gn": _sha256_file(Path(OUT_DIR) / "args.gn"),
+        "build_ninja": _file_stat_token(Path(OUT_DIR) / "build.ninja"),
+        "target": NINJA_TARGET,
+        "library": _file_stat_token(Path(OUT_DIR) / "obj" / "libv8_monolith.a"),
+        "toolchain": _toolchain_versions(),
+    }
+
+def _fp_copy_library_to_vcpkg():
+    return {
+        "library": _file_stat_token(Path(OUT_DIR) / "obj" / "libv8_monolith.a"),
+        "installed_library": _file_stat_token(Path(VCPKG_ROOT) / "installed" / "x64-mingw-static" / "lib" / "libv8_monolith.a"),
+    }
+
+def _fp_copy_headers_to_vcpkg():
+    return {
+        "v8_head": _git_head(V8_SRC),
+        "installed_include": (Path(VCPKG_ROOT) / "installed" / "x64-mingw-static" / "include").is_dir(),
+    }
+
+def _fp_update_vcpkg_port():
+    port_v8_dir = Path(VCPKG_ROOT) / "ports" / "v8"
+    return {
+        "version": V8_VERSION,
+        "ref": V8_REF,
+        "portfile": _sha256_file(port_v8_dir / "portfile.cmake"),
+        "manifest": _sha256_file(port_v8_dir / "vcpkg.json"),
+    }
+
+def _fp_vcpkg_integrate():
+    return {"vcpkg": _file_stat_token(Path(VCPKG_ROOT) / "vcpkg.exe")}
+
+# The build pipeline as a DAG. Each step declares the resources it consumes ("inputs") and produces
+# ("outputs"); a step becomes runnable once the producers of all its inputs have finished.
+# Declaration order is the tie-breaker and the order used with --pipeline-jobs 1.
+# "fingerprint" is None for steps that are cheap enough to always run.
+PIPELINE_STEPS = [
+    {"name": "prepare_root", "title": "Preparing V8_ROOT and dummy Visual Studio toolchain directories.",
+     "run": _step_prepare_root, "fingerprint": None,
+     "inputs": [], "outputs": ["v8_root", "fake_vs_toolchain"]},
+    {"name": "depot_tools", "title": "Ensuring depot_tools is cloned and functional.",
+     "run": ensure_depot_tools, "fingerprint": _fp_depot_tools,
+     "inputs": [], "outputs": ["depot_tools"]},
+    {"name": "python_dependencies", "title": "Installing Python dependencies for depot_tools.",
+     "run": _step_python_dependencies, "fingerprint": _fp_python_dependencies,
+     "inputs": [], "outputs": ["python_packages"]},
+    {"name": "patch_gerrit_util", "title": "Patching gerrit_util.py for httplib2.socks compatibility.",
+     "run": _step_patch_gerrit_util, "fingerprint": _fp_patch_gerrit_util,
+     "inputs": ["depot_tools"], "outputs": ["gerrit_util_patched"]},
+    {"name": "write_gclient", "title": "Writing .gclient file in V8_ROOT for V8 repository configuration.",
+     "run": lambda env: write_gclient_file(V8_ROOT, V8_GIT_URL), "fingerprint": _fp_write_gclient,
+     "inputs": ["v8_root"], "outputs": ["gclient_file"]},
+    {"name": "bootstrap_v8", "title": f"Fetching the V8 repository alone at {V8_REF} (no DEPS entries, no hooks) into {V8_SRC}.",
+     "run": lambda env: bootstrap_v8_checkout(env, V8_SRC), "fingerprint": _fp_bootstrap_v8,
+     "inputs": ["v8_root"], "outputs": ["v8_ref_checked_out"]},
+    {"name": "patch_deps", "title": "Pruning V8's DEPS file for the MinGW build before the dependency sync.",
+     "run": lambda env: patch_v8_deps_for_mingw(V8_SRC, env), "fingerprint": _fp_patch_deps,
+     "inputs": ["v8_ref_checked_out"], "outputs": ["deps_patched"]},
+    {"name": "gclient_sync_deps", "title": "Running the gclient sync that fetches V8's (pruned) dependencies.",
+     "run": lambda env: gclient_sync_with_retry(env, V8_ROOT, V8_SRC), "fingerprint": _fp_gclient_sync_deps,
+     "inputs": ["depot_tools", "python_packages", "gerrit_util_patched", "gclient_file", "fake_vs_toolchain", "deps_patched"], "outputs": ["v8_dependencies"]},
+    {"name": "patch_build_files", "title": "Patching .gni, setup_toolchain.py and BUILD.gn files (from the synced build/ dependency) for MinGW compatibility.",
+     "run": _step_patch_build_files, "fingerprint": _fp_patch_build_files,
+     "inputs": ["v8_dependencies"], "outputs": ["build_files_patched"]},
+    {"name": "vs_toolchain_selftest", "title": "Running self-test for 'vs_toolchain.py' after the sync to ensure it runs correctly.",
+     "run": _step_vs_toolchain_selftest, "fingerprint": _fp_vs_toolchain_selftest,
+     "inputs": ["v8_dependencies"], "outputs": ["vs_toolchain_verified"]},
+    {"name": "write_args_gn", "title": "Writing args.gn configuration for MinGW build.",
+     "run": lambda env: write_args_gn(OUT_DIR), "fingerprint": _fp_write_args_gn,
+     "inputs": ["v8_ref_checked_out"], "outputs": ["args_gn"]},
+    {"name": "gn_gen", "title": "Generating Ninja build files with GN.",
+     "run": run_gn_gen, "fingerprint": _fp_gn_gen,
+     "inputs": ["args_gn", "build_files_patched", "vs_toolchain_verified"], "outputs": ["build_ninja"]},
+    {"name": "ninja_build", "title": "Starting the main V8 compilation with Ninja.",
+     "run": run_ninja_build, "fingerprint": _fp_ninja_build,
+     "inputs": ["build_ninja"], "outputs": ["v8_library"]},
+    {"name": "copy_headers_to_vcpkg", "title": "Copying V8 headers to vcpkg's installed directory.",
+     "run": lambda env: copy_v8_headers_to_vcpkg(), "fingerprint": _fp_copy_headers_to_vcpkg,
+     "inputs": ["v8_dependencies"], "outputs": ["vcpkg_headers"]},
+    {"name": "update_vcpkg_port", "title": "Updating vcpkg portfile and manifest for V8 integration.",
+     "run": lambda env: update_vcpkg_port(V8_VERSION, V8_REF, "https://chromium.googlesource.com/v8/v8", "BSD-3-Clause"),
+     "fingerprint": _fp_update_vcpkg_port,
+     "inputs": ["build_ninja"], "outputs": ["vcpkg_port"]},
+    {"name": "copy_library_to_vcpkg", "title": "Copying compiled V8 library to vcpkg's installed directory.",
+     "run": lambda env: copy_v8_library_to_vcpkg(), "fingerprint": _fp_copy_library_to_vcpkg,
+     "inputs": ["v8_library"], "outputs": ["vcpkg_library"]},
+    {"name": "vcpkg_integrate", "title": "Running 'vcpkg integrate install' for system-wide CMake integration.",
+     "run": vcpkg_integrate_install, "fingerprint": _fp_vcpkg_integrate,
+     "inputs": ["vcpkg_library", "vcpkg_headers", "vcpkg_port"], "outputs": ["vcpkg_integrated"]},
+]
+PIPELINE_STEP_NAMES = [step["name"] for step in PIPELINE_STEPS]
+
+def _pipeline_dependencies(steps) -> dict:
+    """Maps each step name to the set of step names producing its inputs. Raises ValueError for a malformed DAG."""
+    producers = {}
+    for step in steps:
+        for resource in step["outputs"]:
+            if resource in producers:
+                raise ValueError(f"Resource '{resource}' is produced by both '{producers[resource]}' and '{step['name']}'.")
+            producers[resource] = step["name"]
+    deps = {}
+    for step in steps:
+        missing = [r for r in step["inputs"] if r not in producers]
+        if missing:
+            raise ValueError(f"Step '{step['name']}' consumes unknown resource(s): {', '.join(missing)}")
+        deps[step["name"]] = {producers[r] for r in step["inputs"]}
+
+    # Reject cycles up front rather than deadlocking the scheduler.
+    visiting, done = set(), set()
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline dependency cycle through step '{name}'.")
+        visiting.add(name)
+        for dep in deps[name]:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+    for step in steps:
+        visit(step["name"])
+    return deps
+
+def _critical_path(steps, deps, durations) -> tuple:
+    """Longest duration-weighted dependency chain through the executed steps. Returns (step names, seconds)."""
+    finish, via = {}, {}
+    for step in steps: # Declaration order is a topological order (producers are declared before consumers).
+        name = step["name"]
+        best_dep = max(deps[name], key=lambda d: finish.get(d, 0.0), default=None)
+        finish[name] = durations.get(name, 0.0) + (finish.get(best_dep, 0.0) if best_dep else 0.0)
+        via[name] = best_dep
+    if not finish:
+        return [], 0.0
+    node = max(finish, key=finish.get)
+    total = finish[node]
+    path = []
+    while node:
+        path.append(node)
+        node = via[node]
+    return list(reversed(path)), total
+
+def _changed_inputs(old_inputs: dict, new_inputs: dict) -> list:
+    keys = set(old_inputs or {}) | set(new_inputs or {})
+    return sorted(k for k in keys if (old_inputs or {}).get(k) != (new_inputs or {}).get(k))
+
+def _execute_step(step, env, manifest, manifest_lock, forced) -> str:
+    """Runs one pipeline step with checkpoint handling. Returns 'ran' or 'skipped'."""
+    name = step["name"]
+    fingerprint_fn = step["fingerprint"]
+    if fingerprint_fn is not None and not forced:
+        with manifest_lock:
+            recorded = manifest["steps"].get(name)
+        current_inputs = fingerprint_fn()
+        if recorded and recorded.get("digest") == _fingerprint_digest(current_inputs):
+            log("INFO", f"Skipping step '{name}': inputs unchanged since {recorded.get('completed_at')} (checkpoint).", to_console=True)
+            return "skipped"
+        if recorded:
+            log("INFO", f"Step '{name}' inputs changed ({', '.join(_changed_inputs(recorded.get('inputs'), current_inputs))}); re-running.", to_console=False)
+
+    # Drop the old checkpoint first: a step that fails half-way must not be skipped next time.
+    with manifest_lock:
+        if manifest["steps"].pop(name, None) is not None:
+            _save_checkpoints(manifest)
+
+    log("STEP", step["title"])
+    try:
+        with trace_span(name, "step"):
+            step["run"](env)
+    finally:
+        _end_stage_span()
+
+    if fingerprint_fn is not None:
+        post_inputs = fingerprint_fn()
+        with manifest_lock:
+            manifest["steps"][name] = {
+                "digest": _fingerprint_digest(post_inputs),
+                "inputs": post_inputs,
+                "completed_at": timestamp(),
+            }
+            _save_checkpoints(manifest)
+    return "ran"
+
+def run_pipeline(env, steps=None, from_step=None, only_step=None, use_checkpoints=True, max_workers=None):
+    """
+    Runs the build pipeline DAG on a thread pool of at most `max_workers` (default PIPELINE_MAX_WORKERS)
+    steps, consulting the checkpoint manifest in CHECKPOINT_FILE.
+      - A step whose input fingerprint matches the one recorded after its last successful run is skipped.
+      - from_step: skip every step declared before it and force that step to run; later steps use checkpoints.
+      - only_step: run exactly that step (forced) and nothing else.
+      - use_checkpoints=False: run everything and only record fresh checkpoints.
+    The first failing step (exception or sys.exit) stops scheduling; steps already running are allowed to
+    finish and the failure is then re-raised unchanged. Step timings and the critical path are added to
+    the run summary.
+    """
+    steps = PIPELINE_STEPS if steps is None else steps
+    max_workers = max(1, max_workers or PIPELINE_MAX_WORKERS)
+    names = [step["name"] for step in steps]
+    for requested in (from_step, only_step):
+        if requested and requested not in names:
+            raise ValueError(f"Unknown pipeline step '{requested}'. Known steps: {', '.join(names)}")
+    deps = _pipeline_dependencies(steps)
+    from_index = names.index(from_step) if from_step else 0
+
+    manifest = _load_checkpoints()
+    manifest_lock = threading.Lock()
+    pending = []
+    completed = set()
+    results = {} # name -> {"status", "seconds"}
+    for index, step in enumerate(steps):
+        name = step["name"]
+        if (only_step and name != only_step) or index < from_index:
+            if not only_step:
+                log("INFO", f"Skipping step '{name}' (before --from-step '{from_step}').", to_console=True)
+            completed.add(name) # Treated as satisfied so its dependents can run.
+            continue
+        pending.append(step)
+
+    def timed(step, forced):
+        started = time.perf_counter()
+        status = _execute_step(step, env, manifest, manifest_lock, forced)
+        return status, time.perf_counter() - started
+
+    failure = None
+    running = {} # future -> step
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="CerebrumLux-Step") as pool:
+        while pending or running:
+            if failure is None:
+                for step in [s for s in pending if deps[s["name"]] <= completed]:
+                    if len(running) >= max_workers:
+                        break
+                    forced = step["name"] in (from_step, only_step) or not use_checkpoints
+                    running[pool.submit(timed, step, forced)] = step
+                    pending.remove(step)
+            if not running:
+                break
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                try:
+                    status, seconds = future.result()
+                except BaseException as e: # SystemExit from a step's FATAL path must propagate unchanged too.
+                    if failure is None:
+                        failure = e
+                        if running:
+                            log("INFO", f"Step '{step['name']}' failed; waiting for {len(running)} running step(s) to finish before aborting.", to_console=True)
+                    results[step["name"]] = {"status": "failed"}
+                    continue
+                results[step["name"]] = {"status": status, "seconds": round(seconds, 3)}
+                completed.add(step["name"])
+            if failure is not None:
+                pending = []
+
+    durations = {name: r.get("seconds", 0.0) for name, r in results.items()}
+    path, path_seconds = _critical_path(steps, deps, durations)
+    if path:
+        log("INFO", f"Pipeline critical path ({path_seconds:.2f}s): " + " -> ".join(f"{n} ({durations.get(n, 0.0):.2f}s)" for n in path), to_console=True)
+    record_run_summary("pipeline", {
+        "max_workers": max_workers,
+        "steps": results,
+        "critical_path": path,
+        "critical_path_seconds": round(path_seconds, 3),
+    })
+    if failure is not None:
+        raise failure
+
 # ----------------------------
 # === Main Workflow ===
 # ----------------------------
@@ -2031,129 +4358,671 @@ def _check_system_prerequisites():
             sys.exit(2)
 
 
-def main(): # CerebrumLux V8 Build v7.37.19
-    # Filter DeprecationWarnings, especially from Python's datetime module
-    warnings.filterwarnings("ignore", category=DeprecationWarning)
-
-    log("START", "=== CerebrumLux V8 Build v7.37.19 started ===", to_console=True) # Updated start message for 7.37.14
-    start_time = time.time()
-    env = prepare_subprocess_env()
-
+# ----------------------------
+# === Text-transform benchmarks (--benchmark) ===
+# ----------------------------
+# Times the patch-time text transforms on synthetic inputs of doubling size: realistic files scaled up,
+# and adversarial ones built to provoke regex backtracking (long whitespace runs, unterminated
+# constructs). A case fails when doubling its input multiplies its time by more than
+# BENCHMARK_SUPERLINEAR_RATIO, or when it is BENCHMARK_REGRESSION_FACTOR times slower than the baseline.
+def _bench_build_gn(n: int) -> str:
+    """build/config/win/BUILD.gn shaped input with n config() blocks."""
+    fields = list(_DUMMY_VCVARS_PATHS)
+    parts = ['import("//build/config/win/visual_studio_version.gni")\n\n',
+             'vcvars_toolchain_data = exec_script("../../toolchain/win/setup_toolchain.py",\n'
+             '                                    [ visual_studio_path, windows_sdk_path, "none" ],\n'
+             '                                    "scope")\n\n']
+    for i in range(n):
+        field = fields[i % len(fields)]
+        parts.append(f'config("config_{i}") {{\n'
+                     f'  cflags = [ "/Gy", "/FS", "/bigobj" ]  # comment {i}\n'
+                     f'  if (defined(vcvars_toolchain_data.{field}) && !is_clang) {{\n'
+                     f'    lib_dirs = [\n'
+                     f'      vcvars_toolchain_data.{field},\n'
+                     f'      "//third_party/lib_{i}",\n'
+                     f'    ]\n'
+                     f'  }}\n'
+                     f'  defines = [ "NAME_{i}=\\"value\\"", "_HAS_EXCEPTIONS=0" ]\n'
+                     f'}}\n\n')
+    return "".join(parts)
+
+def _bench_toolchain_build_gn(n: int) -> str:
+    """build/toolchain/win/BUILD.gn shaped input: the msvc_toolchain template with n tool() blocks."""
+    parts = ['win_toolchain_data = exec_script("setup_toolchain.py",\n'
+             '                                 [ visual_studio_path, windows_sdk_path, "x64" ],\n'
+             '                                 "scope")\n\n'
+             'sys_include_flags = win_toolchain_data.include_flags_imsvc\n'
+             'sys_lib_flags = "${win_toolchain_data.libpath_flags}"\n\n'
+             'template("msvc_toolchain") {\n'
+             '  toolchain(target_name) {\n'
+             '    toolchain_arch = invoker.toolchain_arch\n'
+             '    prefix = rebase_path("$clang_base_path/bin", root_build_dir)\n'
+             '    cl = "${prefix}/clang-cl.exe"\n'
+             '    link = "link.exe"\n'
+             '    lib = "lib.exe"\n'
+             '    rc = "rc.exe"\n']
+    for i in range(n):
+        parts.append(f'    tool("tool_{i}") {{\n'
+                     f'      command = "$cl /c {{{{source}}}} /Fo{{{{output}}}} ${{win_toolchain_data.vc_bin_dir}}"\n'
+                     f'      outputs = [ "$object_subdir/{{{{source_name_part}}}}_{i}.obj" ]\n'
+                     f'      description = "CC {{{{output}}}}"\n'
+                     f'    }}\n')
+    parts.append('  }\n}\n')
+    return "".join(parts)
+
+def _bench_vs_version_gni(n: int) -> str:
+    """visual_studio_version.gni shaped input: declare_args() with n unrelated arguments."""
+    body = "".join(f'  # Argument {i}.\n  arg_{i} = "value_{i}"\n\n' for i in range(n))
+    return ('import("//build/toolchain/win/toolchain_data.gni")\n\n'
+            'declare_args() {\n' + body + '  visual_studio_path = ""\n  visual_studio_version = ""\n}\n\n'
+            'toolchain_data = exec_script("../../vs_toolchain.py", [ "get_toolchain_dir" ], "scope")\n')
+
+def _bench_deps(n: int, chromium_url: str = "https://chromium.googlesource.com", revisions: list = None) -> str:
+    """
+    DEPS shaped input with n dependencies (at `revisions`, default made-up SHAs) and n CIPD package entries,
+    plus a few upstream entries DEPS pruning leaves out (by rule or by condition), a hook using one of them and
+    the hooks GCLIENT_HOOK_MODE "selected" runs or skips.
+    """
+    parts = [f"use_relative_paths = True\nuse_relative_hooks = True\n\nvars = {{\n  'chromium_url': '{chromium_url}',\n  'checkout_instrumented_libraries': False,\n}}\n\ndeps = {{\n",
+             "  'buildtools/win': {\n    'packages': [ { 'package': 'gn/gn/windows-amd64', 'version': 'git_revision:abc' } ],\n    'dep_type': 'cipd',\n"
+             "    'condition': 'host_os == \"win\"',\n  },\n",
+             "  'third_party/simdutf': 'https://chromium.googlesource.com/chromium/src/third_party/simdutf' + '@' + 'abc',\n",
+             "  'test/test262/data': 'https://chromium.googlesource.com/external/github.com/tc39/test262.git' + '@' + 'abc',\n",
+             "  'tools/clang': 'https://chromium.googlesource.com/chromium/src/tools/clang.git' + '@' + 'abc',\n",
+             "  'third_party/instrumented_libraries': {\n    'url': 'https://chromium.googlesource.com/chromium/src/third_party/instrumented_libraries.git@abc',\n"
+             "    'condition': 'checkout_instrumented_libraries',\n  },\n"]
+    for i in range(n):
+        parts.append(f"  'third_party/dep_{i}': Var('chromium_url') + '/external/dep_{i}.git' + '@' + '{revisions[i] if revisions else f'{i:040x}'}',\n")
+        parts.append(f"  'tools/pkg_{i}': {{\n    'packages': [\n      {{\n        'package': 'infra/tools/linux/pkg_{i}',\n"
+                     f"        'version': 'version:{i}',\n      }},\n    ],\n    'dep_type': 'cipd',\n  }},\n")
+    parts.append("}\n\nrecursedeps = [\n  'tools/clang',\n]\n\nhooks = [\n  {\n    # Update the prebuilt clang toolchain.\n    'name': 'clang',\n"
+                 "    'pattern': '.',\n    'action': ['python3', 'tools/clang/scripts/update.py'],\n  },\n"
+                 "  {\n    'name': 'lastchange',\n    'pattern': '.',\n"
+                 "    'action': ['python3', 'build/util/lastchange.py', '-o', 'build/util/LASTCHANGE'],\n  },\n"
+                 "  {\n    'name': 'win_toolchain',\n    'pattern': '.',\n    'condition': 'checkout_win',\n"
+                 "    'action': ['python3', 'build/vs_toolchain.py', 'update', '--force'],\n  },\n]\n")
+    return "".join(parts)
+
+def _bench_vs_toolchain_py(n: int) -> str:
+    """vs_toolchain.py shaped input with n unrelated functions around the three patched ones."""
+    functions = "".join(f"def helper_{i}(arg):\n    if arg:\n        return {i}\n\n    return None\n\n\n" for i in range(n))
+    return ("import os\nimport pipes\nimport sys\n\n\n" + functions +
+            "def DetectVisualStudioPath():\n    raise Exception('No supported Visual Studio can be found.'\n"
+            "                    ' Supported versions are: 2019')\n\n\n"
+            "def GetVisualStudioVersion():\n    return '2019'\n\n\n"
+            "def SetEnvironmentAndGetRuntimeDllDirs():\n    return []\n")
+
+def _bench_blank_runs(n: int) -> str:
+    """Adversarial: n-line runs of whitespace-only lines between statements (stresses ^\\s* and ,\\s* patterns)."""
+    return ("declare_args() {\n" + "  \n" * n + "}\n"
+            + "x = [\n  1,\n" + "   \n" * n + "  ,\n" + "\n" * n + "]\n")
+
+def _bench_unterminated(n: int) -> str:
+    """Adversarial: n openers of lazily matched constructs that never close (/*, exec_script(, CIPD entries)."""
+    return ("".join(f'/* note {i}\nexec_script("../../vs_toolchain.py", "a{i}"\n' for i in range(n))
+            + "".join(f"  'infra/tools/win/pkg_{i}': 'version' \n" for i in range(n)))
+
+def _bench_one_closer(n: int) -> str:
+    """Adversarial: n exec_script("../../vs_toolchain.py" openers sharing one closing parenthesis at the end."""
+    return "".join(f'exec_script("../../vs_toolchain.py", "a{i}",\n' for i in range(n)) + ")\n"
+
+BENCHMARK_CASES = [
+    # name, input generator, transform under test
+    ("normalize_gn_lists", _bench_build_gn, _normalize_gn_list_text),
+    ("normalize_gn_lists[blank-runs]", _bench_blank_runs, _normalize_gn_list_text),
+    ("filter_gn_comments", _bench_build_gn, _filter_gn_comments),
+    ("filter_gn_comments[unterminated]", _bench_unterminated, _filter_gn_comments),
+    ("gn_parse", _bench_build_gn, gn_parse),
+    ("specs:config/win/BUILD.gn", _bench_build_gn, BUILD_GN_PATCH_SPECS),
+    ("specs:toolchain/win/BUILD.gn", _bench_toolchain_build_gn, TOOLCHAIN_BUILD_GN_PATCH_SPECS),
+    ("specs:visual_studio_version.gni", _bench_vs_version_gni, VS_VERSION_GNI_PATCH_SPECS),
+    ("specs:visual_studio_version.gni[blank-runs]", _bench_blank_runs, VS_VERSION_GNI_PATCH_SPECS),
+    ("specs:visual_studio_version.gni[unterminated]", _bench_unterminated, VS_VERSION_GNI_PATCH_SPECS),
+    ("specs:visual_studio_version.gni[one-closer]", _bench_one_closer, VS_VERSION_GNI_PATCH_SPECS),
+    ("specs:DEPS", _bench_deps, DEPS_PATCH_SPECS),
+    ("specs:vs_toolchain.py", _bench_vs_toolchain_py, VS_TOOLCHAIN_PATCH_SPECS),
+]
 
+REGEX_HAZARD_CASES = [
+    # pattern, hazard regex_backtracking_hazards() must report (None: must report nothing)
+    (r"declare_args\(\)\s*\{[\s\S]*?\}", "sweep"),
+    (re.compile(r"Var\(.*?\)", re.DOTALL), "sweep"),
+    (r"'packages':\s*\[[^}]*?},", "sweep"),
+    (r"Var\(.*?\)", None),
+    (r"\([^()]*\)", None),
+    (r"^def\s+f\([^()]*\):[^\n]*\n(?:(?:[ \t][^\n]*)?\n)*?(?=\S|\Z)", None),
+]
 
+def _bench_time(transform, text: str) -> float:
+    """Best of BENCHMARK_REPEATS wall-clock timings of transform(text)."""
+    if isinstance(transform, list):
+        specs = transform
+        transform = lambda t: run_patch_specs(specs, t, Path("benchmark"))
+    best = float("inf")
+    for _ in range(BENCHMARK_REPEATS):
+        start = time.perf_counter()
+        transform(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def _bench_growth(input_bytes: list, timings: list):
+    """
+    Time factor per doubling of the input: 2 ** the least-squares slope of log(time) over log(bytes), fitted
+    across every size timed above BENCHMARK_MIN_SECONDS (None with fewer than two). One noisy size moves the
+    fit far less than it moves the ratio of a single pair.
+    """
+    points = [(math.log2(b), math.log2(t)) for b, t in zip(input_bytes, timings) if t >= BENCHMARK_MIN_SECONDS]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if spread == 0:
+        return None
+    return 2 ** (sum((x - mean_x) * (y - mean_y) for x, y in points) / spread)
+
+def run_benchmarks(baseline_path: str = None, update_baseline: bool = False, sizes=None) -> bool:
+    """
+    Runs BENCHMARK_CASES at each input size and logs a table. Returns False when any case grows
+    super-linearly or regressed against the baseline. The results become the baseline when none
+    exists yet or when update_baseline is set.
+    """
+    baseline_path = baseline_path or BENCHMARK_BASELINE_FILE
+    sizes = sizes or BENCHMARK_SIZES
+    baseline = {}
     try:
-        if Path(V8_ROOT).is_dir():
-            log("INFO", f"V8_ROOT '{V8_ROOT}' exists. Attempting incremental update. Manual deletion required for full fresh start.", to_console=True)
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("sizes") == list(sizes):
+            baseline = data.get("cases", {})
         else:
-            log("INFO", f"Creating V8_ROOT for fresh start: {V8_ROOT}", to_console=True)
-        os.makedirs(V8_ROOT, exist_ok=True)
+            log("WARN", f"Benchmark baseline {baseline_path} was recorded with other input sizes; ignoring it.", to_console=True)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log("WARN", f"Could not read benchmark baseline {baseline_path}: {e}", to_console=True)
+
+    results, failures = {}, []
+    for pattern, expected in REGEX_HAZARD_CASES:
+        kinds = {hazard.split(":")[0] for hazard in regex_backtracking_hazards(pattern)}
+        if (expected is None and kinds) or (expected is not None and expected not in kinds):
+            failures.append(f"hazards:{pattern}")
+            log("ERROR", f"  Hazard check of {pattern!r} reported {sorted(kinds) or 'nothing'}, expected {expected or 'nothing'}.", to_console=True)
+    log("INFO", f"Checked the backtracking hazard detector on {len(REGEX_HAZARD_CASES)} patterns.", to_console=True)
+    log("INFO", f"Benchmarking {len(BENCHMARK_CASES)} transforms at input sizes {list(sizes)} (best of {BENCHMARK_REPEATS}).", to_console=True)
+    for name, generate, transform in BENCHMARK_CASES:
+        timings, input_bytes = [], []
+        with trace_span(name, "benchmark"):
+            for size in sizes:
+                text = generate(size)
+                input_bytes.append(len(text))
+                timings.append(_bench_time(transform, text))
+        growth = _bench_growth(input_bytes, timings)
+        results[name] = {"seconds": timings, "bytes": input_bytes, "growth": growth}
+        problems = []
+        if growth is not None and growth > BENCHMARK_SUPERLINEAR_RATIO:
+            problems.append(f"super-linear: x{growth:.1f} time per doubling of input")
+        previous = baseline.get(name, {}).get("seconds")
+        if previous and timings[-1] >= BENCHMARK_MIN_SECONDS and timings[-1] > previous[-1] * BENCHMARK_REGRESSION_FACTOR:
+            problems.append(f"regressed: {timings[-1] * 1000:.1f} ms vs. baseline {previous[-1] * 1000:.1f} ms")
+        if problems:
+            failures.append(name)
+        log("ERROR" if problems else "INFO",
+            f"  {name:<46} {' '.join(f'{t * 1000:9.2f}' for t in timings)} ms  ({input_bytes[-1] // 1024} KiB max"
+            + (f", x{growth:.2f}/doubling" if growth is not None else "") + ")" + (" - " + "; ".join(problems) if problems else ""),
+            to_console=True)
+
+    if update_baseline or not baseline:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+            with open(baseline_path, "w", encoding="utf-8") as f:
+                json.dump({"script_version": SCRIPT_VERSION, "python": sys.version.split()[0], "sizes": list(sizes), "cases": results},
+                          f, indent=2, sort_keys=True)
+            log("INFO", f"Benchmark baseline written to {baseline_path}.", to_console=True)
+        except Exception as e:
+            log("WARN", f"Could not write benchmark baseline {baseline_path}: {e}", to_console=True)
+    if failures:
+        log("ERROR", f"{len(failures)} benchmark case(s) failed: {', '.join(failures)}", to_console=True)
+        return False
+    log("INFO", "All benchmark cases passed.", to_console=True)
+    return True
 
-        # Create dummy VS toolchain directories early
-        _create_fake_vs_toolchain_dirs(V8_ROOT)
 
-        log("STEP", "Ensuring depot_tools is cloned and functional.")
-        ensure_depot_tools(env)
-        
-        # --- Python Bağımlılıklarını Yükle ---
-        if not _install_python_dependencies(env):
-            sys.exit(1)
-        # --- Python Bağımlılıkları Son ---
+# ----------------------------
+# === End-to-end harness (--harness) ===
+# ----------------------------
+# Runs the whole main() pipeline without network access or a Windows toolchain, so orchestration
+# changes can be measured anywhere (including CI on Linux). Local bare git repos stand in for the V8
+# and depot_tools remotes, and small Python stubs stand in for gclient, gn, ninja and pip; the stubs
+# take their latency, failure rate and output volume from CEREBRUMLUX_HARNESS_* environment variables.
+# Each run is a child process (fresh module state, its own peak-memory figure) against a temporary
+# V8_ROOT; the report is assembled from that run's trace, run summary and log files.
+_HARNESS_STUB_PRELUDE = '''import os, random, subprocess, sys, time
+
+def _knob(name, default):
+    return type(default)(os.environ.get("CEREBRUMLUX_HARNESS_" + name, default))
+
+def stub_begin(tool):
+    """Counts the invocation, sleeps, prints the configured output volume and fails at the configured rate."""
+    counter = os.path.join(os.environ["CEREBRUMLUX_HARNESS_DIR"], "." + tool + ".count")
+    n = int(open(counter).read()) + 1 if os.path.exists(counter) else 1
+    with open(counter, "w") as f:
+        f.write(str(n))
+    time.sleep(_knob("LATENCY", 0.0))
+    for i in range(_knob("OUTPUT_LINES", 0)):
+        print(f"[{tool}] output line {i + 1} " + "." * 60)
+    sys.stdout.flush()
+    if random.Random(f"{_knob('SEED', 0)}:{tool}:{n}").random() < _knob("FAILURE_RATE", 0.0):
+        print(f"[{tool}] simulated failure (invocation {n}): Connection reset by peer", file=sys.stderr)
+        sys.exit(1)
 
-        # --- YENİ ADIM: gerrit_util.py'yi httplib2.socks uyumluluğu için yamala ---
-        log("STEP", "Patching gerrit_util.py for httplib2.socks compatibility.")
-        if not _patch_gerrit_util_py(DEPOT_TOOLS, env):
-            log("FATAL", "Failed to patch gerrit_util.py. Aborting.", to_console=True)
-            sys.exit(1)
-        # --- YENİ ADIM SONU ---
-        # --- YENİ ADIM SONU ---
-        
-        log("STEP", "Writing .gclient file in V8_ROOT for V8 repository configuration.")
-        write_gclient_file(V8_ROOT, V8_GIT_URL)
+'''
+
+# Only the file:// DEPS entries are checked out; the others stand for the upstream entries the DEPS patches
+# target and are not reachable offline. `revinfo --output-json` reports the same entries.
+_HARNESS_GCLIENT_STUB = _HARNESS_STUB_PRELUDE + '''import json
+stub_begin("gclient")
+
+def git_deps(solution):
+    """{path: (url, revision)} of the file:// git entries in the solution's DEPS, paths relative to the root."""
+    deps_scope = {"Str": str}
+    deps_scope["Var"] = lambda var: deps_scope["vars"][var]
+    exec(open(os.path.join(solution["name"], solution.get("deps_file", "DEPS"))).read(), deps_scope)
+    entries = {}
+    for path, value in deps_scope.get("deps", {}).items():
+        value = value.get("url") if isinstance(value, dict) else value
+        if value and value.startswith("file:"):
+            url, _, revision = value.partition("@")
+            entries[solution["name"] + "/" + path] = (url, revision or None)
+    return entries
+
+def checkout(path, url, revision, depth):
+    if not os.path.isdir(os.path.join(path, ".git")):
+        subprocess.check_call(["git", "clone", "-q", "--no-checkout"] + depth + [url, path])
+    if not revision:
+        subprocess.check_call(["git", "fetch", "-q"] + depth + ["origin"], cwd=path)
+        revision = "FETCH_HEAD"
+    elif subprocess.call(["git", "cat-file", "-e", revision + "^{commit}"], cwd=path, stderr=subprocess.DEVNULL):
+        subprocess.check_call(["git", "fetch", "-q"] + depth + ["origin", revision], cwd=path)
+    subprocess.check_call(["git", "checkout", "-q", "--detach", revision], cwd=path)
+
+command, args = sys.argv[1:2], sys.argv[2:]
+scope = {}
+exec(open(".gclient").read(), scope)
+if command == ["revinfo"]:
+    report = {}
+    for solution in scope["solutions"]:
+        report[solution["name"]] = {"url": solution["url"], "rev": None}
+        report.update({path: {"url": url, "rev": rev} for path, (url, rev) in git_deps(solution).items()})
+    if "--output-json" in args:
+        with open(args[args.index("--output-json") + 1], "w") as f:
+            json.dump(report, f)
+    sys.exit(0)
+if command != ["sync"]:
+    sys.exit(0)
+revisions = dict(args[i + 1].split("@", 1) for i, arg in enumerate(args[:-1]) if arg == "--revision")
+depth = ["--depth=1"] if "--no-history" in args else []
+for solution in scope["solutions"]:
+    name = solution["name"]
+    if os.path.isdir(os.path.join(name, ".git")):
+        subprocess.check_call(["git", "fetch", "-q"] + depth + ["origin"], cwd=name)
+    else:
+        subprocess.check_call(["git", "clone", "-q"] + depth + [solution["url"], name])
+    revision = revisions.get(name)
+    if revision:
+        if subprocess.call(["git", "cat-file", "-e", revision + "^{commit}"], cwd=name, stderr=subprocess.DEVNULL):
+            subprocess.check_call(["git", "fetch", "-q"] + depth + ["origin", revision], cwd=name)
+        subprocess.check_call(["git", "checkout", "-q", "--detach", revision], cwd=name)
+    for path, (url, rev) in sorted(git_deps(solution).items()):
+        print(f"________ syncing {path}")
+        checkout(path, url, rev, depth)
+'''
+
+_HARNESS_GN_STUB = _HARNESS_STUB_PRELUDE + '''stub_begin("gn")
+if sys.argv[1:2] == ["gen"]:
+    out_dir = sys.argv[2]
+    if not os.path.exists(os.path.join(out_dir, "args.gn")):
+        print("ERROR at //args.gn: missing args.gn", file=sys.stderr)
+        sys.exit(1)
+    with open(os.path.join(out_dir, "build.ninja"), "w") as f:
+        f.write("# CerebrumLux harness build.ninja\\n")
+    print("Done. Made 1 targets from 1 files in 1ms")
+'''
+
+_HARNESS_NINJA_STUB = _HARNESS_STUB_PRELUDE + '''stub_begin("ninja")
+out_dir = sys.argv[sys.argv.index("-C") + 1]
+os.makedirs(os.path.join(out_dir, "obj"), exist_ok=True)
+with open(os.path.join(out_dir, "obj", "libv8_monolith.a"), "wb") as f:
+    f.write(b"!<arch>\\n")
+'''
+
+_HARNESS_PIP_STUB = _HARNESS_STUB_PRELUDE + '''stub_begin("pip")
+print("Requirement already satisfied: " + " ".join(a for a in sys.argv[2:] if not a.startswith("-")))
+'''
+
+# `python -c` entry point of a harness child: imports this file as a module (so the __main__ log rotation
+# does not touch the real logs) and hands over to _harness_child_main().
+_HARNESS_CHILD_BOOTSTRAP = (
+    "import importlib.util, sys\n"
+    "spec = importlib.util.spec_from_file_location('build_v8', sys.argv[1])\n"
+    "module = importlib.util.module_from_spec(spec)\n"
+    "spec.loader.exec_module(module)\n"
+    "module._harness_child_main(sys.argv[2])\n"
+)
 
-        log("STEP", "Running initial gclient sync to clone V8 and fetch core dependencies.")
-        gclient_sync_with_retry(env, V8_ROOT, V8_SRC)
-        
-        log("STEP", "Running self-test for 'vs_toolchain.py' after initial sync to ensure it runs correctly.")
-        try:
-            vs_toolchain_path_for_test = Path(V8_SRC) / "build" / "vs_toolchain.py"
-            if vs_toolchain_path_for_test.exists():
-                cp = run([sys.executable, str(vs_toolchain_path_for_test), "get_toolchain_dir"], 
-                         cwd=vs_toolchain_path_for_test.parent, env=env, check=False, capture_output=True)
-                
-                if cp.returncode != 0:
-                    log("FATAL", f"vs_toolchain.py self-test FAILED (exit code {cp.returncode}). Stderr:\n{cp.stderr}", to_console=True)
-                    sys.exit(1)
-                else:
-                    log("INFO", "vs_toolchain.py self-test PASSED (exit code 0).", to_console=True)
-            else:
-                log("FATAL", "'vs_toolchain.py' not found after initial sync. Cannot run self-test. This indicates a deeper gclient issue.", to_console=True)
-                sys.exit(1)
-        except Exception as e:
-            log("FATAL", f"vs_toolchain.py self-test encountered an unexpected error: {e}", to_console=True)
-            sys.exit(1)
+def _harness_v8_sources(scale: int, chromium_url: str, dep_revisions: list) -> dict:
+    """Files of the stand-in V8 repository: every file the MinGW patches touch, at the given size."""
+    return {
+        "DEPS": _bench_deps(scale, chromium_url, dep_revisions),
+        "LICENSE": "Stand-in V8 checkout for the CerebrumLux end-to-end harness.\n",
+        "include/v8.h": "#pragma once\n",
+        "build/vs_toolchain.py": _bench_vs_toolchain_py(scale),
+        "build/dotfile_settings.gni": "build_dotfile_settings = {\n  exec_script_allowlist = [ \"//build/config/win/BUILD.gn\" ]\n}\n",
+        "build/config/win/visual_studio_version.gni": _bench_vs_version_gni(scale),
+        "build/toolchain/win/setup_toolchain.py": ("import sys\n\n\ndef _LoadToolchainEnv(cpu, toolchain_root, win_sdk_path, target_store):\n"
+                                                   "    raise Exception('vcvarsall.bat not found')\n\n\ndef main():\n    return 0\n"),
+        "build/config/win/BUILD.gn": _bench_build_gn(scale),
+        "build/toolchain/win/BUILD.gn": _bench_toolchain_build_gn(scale),
+        "build/util/lastchange.py": ("import sys\n\nout = sys.argv[sys.argv.index('-o') + 1]\n"
+                                     "open(out, 'w').write('LASTCHANGE=0000000000000000000000000000000000000000-refs/heads/main\\n')\n"
+                                     "open(out + '.committime', 'w').write('0')\n"),
+    }
 
-        log("STEP", f"Checking out specific V8 reference ({V8_REF}) in {V8_SRC}.")
-        run(["git", "checkout", V8_REF], cwd=V8_SRC, env=env)
-        run(["git", "reset", "--hard", V8_REF], cwd=V8_SRC, env=env)
-        log("INFO", f"Checked out V8 ref {V8_REF}.")
+def _harness_make_remote(work: Path, name: str, files: dict, env: dict, later_commits: int = 0) -> tuple:
+    """
+    Commits `files` to a seed repo, adds `later_commits` newer commits on top (so the returned commit is
+    not the branch tip, like a pinned V8_REF) and publishes it as a bare repo. Returns (file:// URL, commit).
+    """
+    seed = work / "seed" / name
+    for rel_path, content in files.items():
+        (seed / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (seed / rel_path).write_text(content, encoding="utf-8")
+    identity = ["-c", "user.name=CerebrumLux Harness", "-c", "user.email=harness@localhost"]
+    run(["git", "init", "-q"], cwd=seed, env=env)
+    run(["git", "add", "-A"], cwd=seed, env=env)
+    run(["git"] + identity + ["commit", "-q", "-m", f"Stand-in {name} for the harness"], cwd=seed, env=env)
+    commit = run(["git", "rev-parse", "HEAD"], cwd=seed, env=env).stdout.strip()
+    for index in range(later_commits):
+        (seed / "CHANGES").write_text(f"Upstream change {index + 1}\n" * 1000, encoding="utf-8")
+        run(["git", "add", "CHANGES"], cwd=seed, env=env)
+        run(["git"] + identity + ["commit", "-q", "-m", f"Upstream change {index + 1}"], cwd=seed, env=env)
+    bare = work / "remotes" / f"{name}.git"
+    run(["git", "clone", "-q", "--bare", str(seed), str(bare)], env=env)
+    return bare.as_uri(), commit
+
+def _harness_write_stub(bin_dir: Path, name: str, source: str):
+    """Writes `<name>.py` plus a launcher found by shutil.which(): a shebang script on POSIX, a .cmd on Windows."""
+    script = bin_dir / f"{name}.py"
+    script.write_text(source, encoding="utf-8")
+    if os.name == "nt":
+        (bin_dir / f"{name}.cmd").write_text(f'@"{sys.executable}" "{script}" %*\n', encoding="utf-8")
+    else:
+        launcher = bin_dir / name
+        launcher.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n', encoding="utf-8")
+        launcher.chmod(0o755)
+
+def _harness_install_python_dependencies(env):
+    """Harness stand-in for _install_python_dependencies(): the same three pip invocations, against the pip stub."""
+    pip_stub = Path(os.environ["CEREBRUMLUX_HARNESS_DIR"]) / "bin" / "pip.py"
+    try:
+        for packages in (["--upgrade", "pip", "setuptools"], ["httplib2"], ["PySocks"]):
+            run([sys.executable, str(pip_stub), "install"] + packages, env=env)
+        return True
+    except Exception as e:
+        log("FATAL", f"Failed to install Python dependencies: {e}", to_console=True)
+        return False
 
-        log("STEP", "Patching V8 DEPS file and build configuration files for MinGW compatibility.")
-        patch_v8_deps_for_mingw(V8_SRC, env)
+def _harness_child_main(config_path: str):
+    """Entry point of one harness run: points the module at the harness tree, runs main() and records peak memory."""
+    global _install_python_dependencies
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    globals().update(config["globals"])
+    _install_python_dependencies = _harness_install_python_dependencies
+    exit_code = 0
+    try:
+        main(config["argv"])
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else 1
+    finally:
+        close_log()
+        metrics = {"exit_code": exit_code, "peak_rss_kib": None, "children_peak_rss_kib": None}
+        try:
+            import resource # POSIX only
+            unit = 1024 if sys.platform == "darwin" else 1 # ru_maxrss is bytes on macOS, KiB elsewhere
+            metrics["peak_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // unit
+            metrics["children_peak_rss_kib"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // unit
+        except ImportError:
+            pass
+        with open(config["metrics_file"], "w", encoding="utf-8") as f:
+            json.dump(metrics, f)
+    sys.exit(exit_code)
+
+def _harness_run_report(config: dict, wall_seconds: float) -> dict:
+    """Builds the report of one harness run from the files its child left behind."""
+    paths = config["globals"]
+    def load(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    summary, trace, metrics = load(paths["RUN_SUMMARY_FILE"]), load(paths["TRACE_FILE"]), load(config["metrics_file"])
+    events = trace.get("traceEvents", [])
+    steps = {e["name"]: round(e["dur"] / 1e6, 3) for e in events if e.get("cat") == "step"}
+    commands = [e for e in events if e.get("cat") == "subprocess"]
+    by_tool = collections.Counter(Path((e["args"].get("command") or "?").split(" ")[0]).name for e in commands)
+    logged = {name: os.path.getsize(paths[name]) if os.path.exists(paths[name]) else 0 for name in ("LOG_FILE", "ERR_FILE")}
+    return {
+        "status": summary.get("status", "crashed"),
+        "exit_code": metrics.get("exit_code"),
+        "wall_seconds": round(wall_seconds, 3),
+        "steps": {name: steps[name] for name in PIPELINE_STEP_NAMES if name in steps},
+        "subprocesses": len(commands),
+        "subprocess_seconds": round(sum(e["dur"] for e in commands) / 1e6, 3),
+        "subprocesses_by_tool": dict(by_tool.most_common()),
+        "log_lines": summary.get("log_lines"),
+        "bytes_logged": logged["LOG_FILE"] + logged["ERR_FILE"],
+        "peak_rss_kib": metrics.get("peak_rss_kib"),
+        "children_peak_rss_kib": metrics.get("children_peak_rss_kib"),
+    }
 
-        log("STEP", "Running second gclient sync to apply DEPS changes and ensure consistency.")
-        gclient_sync_with_retry(env, V8_ROOT, V8_SRC)
+def run_harness(runs: int = 1, latency: float = 0.05, failure_rate: float = 0.0, output_lines: int = 200, scale: int = 50,
+                seed: int = 0, work_dir: str = None, child_argv=None, report_path: str = None) -> bool:
+    """
+    Runs main() `runs` times against a fresh harness tree (the first run is cold, later ones reuse its
+    checkpoints) and logs and writes a report per run. Returns False if any run failed. The tree is
+    deleted afterwards unless `work_dir` was given or a run failed.
+    """
+    work = Path(work_dir) if work_dir else Path(tempfile.mkdtemp(prefix="cerebrumlux-harness-"))
+    work.mkdir(parents=True, exist_ok=True)
+    log("INFO", f"Harness: building stand-in remotes and tool stubs in {work}.", to_console=True)
+    bin_dir = work / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    for name, source in (("gn", _HARNESS_GN_STUB), ("ninja", _HARNESS_NINJA_STUB), ("pip", _HARNESS_PIP_STUB)):
+        _harness_write_stub(bin_dir, name, source)
 
-        log("STEP", "Re-patching .gni, setup_toolchain.py and BUILD.gn files after sync to ensure changes persist.")
-        # The patching functions contain logic to check if patches are already applied
-        # and re-apply if needed, so calling them here is safe and ensures persistence.
-        if not _patch_dotfile_settings_gni(V8_SRC, env):
-            log("FATAL", "Failed to re-patch 'build/dotfile_settings.gni'. Aborting.", to_console=True)
+    env = os.environ.copy()
+    env.update({
+        "PATH": str(bin_dir) + os.pathsep + env.get("PATH", ""),
+        "GIT_CONFIG_GLOBAL": str(work / "gitconfig"), # Keeps the user's git config (proxies, insteadOf rules) out of the harness
+        "GIT_CONFIG_NOSYSTEM": "1",
+        "CEREBRUMLUX_HARNESS_DIR": str(work),
+        "CEREBRUMLUX_HARNESS_LATENCY": str(latency),
+        "CEREBRUMLUX_HARNESS_FAILURE_RATE": str(failure_rate),
+        "CEREBRUMLUX_HARNESS_OUTPUT_LINES": str(output_lines),
+        "CEREBRUMLUX_HARNESS_SEED": str(seed),
+    })
+    (work / "gitconfig").touch()
+    # One small remote per DEPS entry, under <work>/remotes/external/ where the DEPS `chromium_url` var points.
+    dep_revisions = [_harness_make_remote(work, f"external/dep_{i}", {"README": f"Stand-in DEPS entry {i}.\n"}, env, later_commits=1)[1]
+                     for i in range(scale)]
+    v8_url, v8_ref = _harness_make_remote(work, "v8", _harness_v8_sources(scale, (work / "remotes").as_uri(), dep_revisions), env, later_commits=3)
+    v8_mirror = work / "remotes" / "mirror" / "v8.git" # Stands in for V8_GITHUB_MIRROR_URL
+    run(["git", "clone", "-q", "--bare", v8_url, str(v8_mirror)], env=env)
+    v8_mirror_url = v8_mirror.as_uri()
+    depot_tools_url, _ = _harness_make_remote(work, "depot_tools", {"gclient.py": _HARNESS_GCLIENT_STUB, "gerrit_util.py": "import httplib2.socks\n"}, env)
+
+    v8_root = work / "v8-mingw"
+    v8_src = v8_root / "v8"
+    reports = []
+    for index in range(1, runs + 1):
+        log_dir = work / "logs" / f"run-{index}"
+        config = {
+            "globals": {
+                "V8_ROOT": str(v8_root), "V8_SRC": str(v8_src), "OUT_DIR": str(v8_src / "out.gn" / "mingw"),
+                "DEPOT_TOOLS": str(work / "depot_tools"), "GIT_CACHE_DIR": str(work / "git-cache"), "LOCAL_GIT_MIRROR_DIR": str(work / "local-mirrors"), "MINGW_BIN": str(work / "mingw" / "bin"),
+                "VCPKG_ROOT": str(work / "vcpkg"), "PORT_DIR": str(work / "vcpkg" / "ports" / "v8"),
+                "V8_GIT_URL": v8_url, "V8_REF": v8_ref, "DEPOT_TOOLS_GIT_URL": depot_tools_url,
+                "CHECKPOINT_FILE": str(v8_root / ".cerebrumlux-checkpoints.json"),
+                "PATCH_CACHE_FILE": str(v8_root / ".cerebrumlux-patch-cache.json"), "ROUTE_CACHE_FILE": str(v8_root / ".cerebrumlux-routes.json"),
+                "V8_GITHUB_MIRROR_URL": v8_mirror_url,
+                "LOG_DIR": str(log_dir), "LOG_FILE": str(log_dir / "build.log"), "ERR_FILE": str(log_dir / "build-error.log"),
+                "RUN_SUMMARY_FILE": str(log_dir / "summary.json"), "TRACE_FILE": str(log_dir / "trace.json"),
+                "GCLIENT_RETRY_BACKOFF": [0.1], "DEPS_FETCH_BACKOFF": [0.1], "GIT_RETRY_BACKOFF": [0.1], # Retries still happen, without the minutes of back-off
+            },
+            "argv": list(child_argv or []),
+            "metrics_file": str(log_dir / "metrics.json"),
+        }
+        log_dir.mkdir(parents=True, exist_ok=True)
+        config_path = log_dir / "harness-config.json"
+        config_path.write_text(json.dumps(config, indent=2), encoding="utf-8")
+        log("INFO", f"Harness run {index}/{runs} ({'cold' if index == 1 else 'warm, reusing checkpoints'}).", to_console=True)
+        start = time.perf_counter()
+        run([sys.executable, "-c", _HARNESS_CHILD_BOOTSTRAP, os.path.abspath(__file__), str(config_path)],
+            cwd=str(work), env=env, check=False, capture_output=False)
+        report = _harness_run_report(config, time.perf_counter() - start)
+        reports.append(report)
+        peak = f"{report['peak_rss_kib'] / 1024:.1f} MiB" if report["peak_rss_kib"] else "n/a"
+        log("ERROR" if report["status"] != "success" else "INFO",
+            f"Harness run {index}: {report['status']} in {report['wall_seconds']:.2f}s, {report['subprocesses']} subprocesses "
+            f"({report['subprocess_seconds']:.2f}s), {report['bytes_logged'] / 1024:.0f} KiB logged, peak RSS {peak}.", to_console=True)
+        for name, seconds in report["steps"].items():
+            log("INFO", f"    {name:<24} {seconds:8.3f}s", to_console=True)
+        log("INFO", "    subprocesses by tool: " + ", ".join(f"{tool} x{count}" for tool, count in report["subprocesses_by_tool"].items()), to_console=True)
+
+    ok = all(report["status"] == "success" for report in reports)
+    report_path = report_path or HARNESS_REPORT_FILE
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump({"script_version": SCRIPT_VERSION, "settings": {"runs": runs, "latency": latency, "failure_rate": failure_rate,
+                                                                      "output_lines": output_lines, "scale": scale, "seed": seed,
+                                                                      "argv": list(child_argv or [])},
+                       "runs": reports}, f, indent=2)
+        log("INFO", f"Harness report written to {report_path}.", to_console=True)
+    except Exception as e:
+        log("WARN", f"Could not write harness report {report_path}: {e}", to_console=True)
+    if work_dir or not ok:
+        log("INFO", f"Harness tree kept at {work}.", to_console=True)
+    else:
+        shutil.rmtree(work, onerror=onerror)
+    return ok
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CerebrumLux V8 MinGW build automation.")
+    parser.add_argument("--from-step", choices=PIPELINE_STEP_NAMES, metavar="STEP",
+                        help="Skip all steps before STEP and force STEP to run (e.g. resume at 'ninja_build' after a failed link).")
+    parser.add_argument("--only-step", choices=PIPELINE_STEP_NAMES, metavar="STEP",
+                        help="Run only STEP, ignoring its checkpoint.")
+    parser.add_argument("--no-checkpoints", action="store_true",
+                        help=f"Ignore the checkpoint manifest ({os.path.basename(CHECKPOINT_FILE)}) and run every step.")
+    parser.add_argument("--list-steps", action="store_true", help="Print the pipeline step names and exit.")
+    parser.add_argument("--pipeline-jobs", type=int, default=PIPELINE_MAX_WORKERS, metavar="N",
+                        help=f"Run up to N independent pipeline steps concurrently (default {PIPELINE_MAX_WORKERS}, 1 = sequential).")
+    parser.add_argument("--validate-patches", action="store_true",
+                        help="Parse the patched .gn/.gni files of the existing checkout, report syntax errors and exit (status 1 on errors).")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Time the patch text transforms on synthetic inputs, compare with the baseline and exit (status 1 on failures).")
+    parser.add_argument("--benchmark-baseline", default=BENCHMARK_BASELINE_FILE, metavar="PATH",
+                        help=f"Benchmark baseline JSON (default {BENCHMARK_BASELINE_FILE}); written when missing.")
+    parser.add_argument("--update-benchmark-baseline", action="store_true",
+                        help="With --benchmark: record this run's timings as the new baseline.")
+    parser.add_argument("--harness", action="store_true",
+                        help="Run the whole pipeline against local stand-in remotes and stub gclient/gn/ninja/pip in a temporary V8_ROOT, report timings and exit.")
+    parser.add_argument("--harness-runs", type=int, default=1, metavar="N", help="Harness: pipeline runs (the first is cold, later ones reuse checkpoints).")
+    parser.add_argument("--harness-latency", type=float, default=0.05, metavar="SECONDS", help="Harness: added latency per stub tool invocation.")
+    parser.add_argument("--harness-failure-rate", type=float, default=0.0, metavar="P", help="Harness: probability that a stub tool invocation fails.")
+    parser.add_argument("--harness-output-lines", type=int, default=200, metavar="N", help="Harness: lines of output per stub tool invocation.")
+    parser.add_argument("--harness-scale", type=int, default=50, metavar="N", help="Harness: size of the generated DEPS/GN/Python sources.")
+    parser.add_argument("--harness-seed", type=int, default=0, metavar="N", help="Harness: seed for the simulated failures.")
+    parser.add_argument("--harness-dir", metavar="PATH", help="Harness: build the tree here and keep it (default: a temporary directory, deleted on success).")
+    parser.add_argument("--fetch-mode", choices=("lean", "full"), default=GIT_FETCH_MODE,
+                        help=f"lean: only the pinned V8 commit and DEPS revisions, no history, branch heads or tags; full: everything (default {GIT_FETCH_MODE}).")
+    parser.add_argument("--deps-jobs", type=int, default=DEPS_FETCH_JOBS, metavar="N",
+                        help=f"Fetch up to N DEPS entries concurrently (default {DEPS_FETCH_JOBS}, the CPU count; 1 = one after another).")
+    parser.add_argument("--no-deps-prefetch", action="store_true",
+                        help="Leave fetching the DEPS entries entirely to gclient sync instead of prefetching them with per-entry retries.")
+    parser.add_argument("--prune-git-cache", action="store_true",
+                        help=f"At the end of the run, delete git cache mirrors unused for {GIT_CACHE_MAX_AGE_DAYS}+ days or beyond GIT_CACHE_MAX_BYTES "
+                             "(never those this V8_ROOT's checkouts borrow objects from). Other roots borrowing from a pruned mirror must be recreated.")
+    parser.add_argument("--refresh-local-mirrors", action="store_true",
+                        help="Create or refresh the bare mirrors in LOCAL_GIT_MIRROR_DIR from the checkouts of the last sync and exit.")
+    parser.add_argument("--gclient-hooks", choices=("selected", "all"), default=GCLIENT_HOOK_MODE,
+                        help=f"selected: sync with --nohooks and run only the DEPS hooks in GCLIENT_HOOK_ALLOWLIST; all: let gclient run every hook (default {GCLIENT_HOOK_MODE}).")
+    parser.add_argument("--deps-prune", choices=("deny", "allow", "off"), default=DEPS_PRUNE_MODE,
+                        help=f"deny: leave the DEPS entries in DEPS_PRUNE_DENY out of the sync; allow: sync only those in DEPS_PRUNE_ALLOW; off: sync all (default {DEPS_PRUNE_MODE}).")
+    parser.add_argument("--deps-graph", action="store_true",
+                        help="Print the evaluated DEPS of the existing checkout (every entry with its condition and pruning decision) and exit.")
+    parser.add_argument("--patch-jobs", type=int, default=PATCH_MAX_WORKERS, metavar="N",
+                        help=f"Patch up to N source files concurrently (default {PATCH_MAX_WORKERS}, 1 = sequential).")
+    args = parser.parse_args(argv)
+    if args.from_step and args.only_step:
+        parser.error("--from-step and --only-step are mutually exclusive.")
+    return args
+
+def main(argv=None): # CerebrumLux V8 Build v7.38.24
+    global PATCH_MAX_WORKERS, GIT_FETCH_MODE, DEPS_FETCH_JOBS, DEPS_PREFETCH, DEPS_PRUNE_MODE, GCLIENT_HOOK_MODE
+    args = _parse_args(argv)
+    PATCH_MAX_WORKERS = max(1, args.patch_jobs)
+    GIT_FETCH_MODE = args.fetch_mode
+    DEPS_FETCH_JOBS = max(1, args.deps_jobs)
+    DEPS_PREFETCH = DEPS_PREFETCH and not args.no_deps_prefetch
+    DEPS_PRUNE_MODE = args.deps_prune
+    GCLIENT_HOOK_MODE = args.gclient_hooks
+    if args.list_steps:
+        for step in PIPELINE_STEPS:
+            print(f"{step['name']:<24} {step['title']}")
+        return
+    if args.benchmark:
+        if not run_benchmarks(args.benchmark_baseline, update_baseline=args.update_benchmark_baseline):
             sys.exit(1)
-        if not _patch_visual_studio_version_gni(V8_SRC, env):
-            log("FATAL", "Failed to re-patch 'build/config/win/visual_studio_version.gni'. Aborting.", to_console=True)
+        return
+    if args.harness:
+        child_argv = ["--pipeline-jobs", str(args.pipeline_jobs), "--patch-jobs", str(args.patch_jobs), "--fetch-mode", args.fetch_mode,
+                      "--deps-jobs", str(args.deps_jobs), "--deps-prune", args.deps_prune, "--gclient-hooks", args.gclient_hooks] + (["--no-deps-prefetch"] if args.no_deps_prefetch else [])
+        if not run_harness(args.harness_runs, args.harness_latency, args.harness_failure_rate, args.harness_output_lines,
+                           args.harness_scale, args.harness_seed, args.harness_dir, child_argv):
             sys.exit(1)
-        if not _patch_setup_toolchain_py(V8_SRC, env):
-            log("FATAL", "Failed to re-patch 'build/toolchain/win/setup_toolchain.py'. Aborting.", to_console=True)
+        return
+    if args.validate_patches:
+        if not report_gn_validation(V8_SRC):
             sys.exit(1)
-        if not _patch_build_gn(V8_SRC, env): # Re-patch build/config/win/BUILD.gn as well
-            log("FATAL", "Failed to re-patch 'build/config/win/BUILD.gn'. Aborting.", to_console=True)
+        return
+    if args.deps_graph:
+        if not print_deps_graph(V8_SRC):
             sys.exit(1)
-        build_config_win_build_gn_path = Path(V8_SRC) / "build" / "config" / "win" / "BUILD.gn"
-        if normalize_gn_lists(build_config_win_build_gn_path):
-            run(["git", "add", str(build_config_win_build_gn_path)], cwd=V8_SRC, env=env, check=False)
-            log("INFO", f"Staged '{build_config_win_build_gn_path.name}' changes with 'git add' after GN list normalization.", to_console=True)
-        else:
-            run(["git", "add", str(build_config_win_build_gn_path)], cwd=V8_SRC, env=env, check=False)
-
-        if not _patch_toolchain_win_build_gn(V8_SRC, env): # Re-patch build/toolchain/win/BUILD.gn as well
-            log("FATAL", "Failed to re-patch 'build/toolchain/win/BUILD.gn'. Aborting.", to_console=True)
+        return
+    if args.refresh_local_mirrors:
+        summary = refresh_local_mirrors(prepare_subprocess_env(), V8_ROOT, V8_SRC)
+        if not summary or summary["failed"]:
             sys.exit(1)
-        toolchain_build_gn_path = Path(V8_SRC) / "build" / "toolchain" / "win" / "BUILD.gn"
-        if normalize_gn_lists(toolchain_build_gn_path):
-            run(["git", "add", str(toolchain_build_gn_path)], cwd=V8_SRC, env=env, check=False)
-            log("INFO", f"Staged '{toolchain_build_gn_path.name}' changes with 'git add' after GN list normalization.", to_console=True)
-        else:
-            run(["git", "add", str(toolchain_build_gn_path)], cwd=V8_SRC, env=env, check=False)
+        return
 
-        log("STEP", "Writing args.gn configuration for MinGW build.")
-        write_args_gn(OUT_DIR)
-        
-        log("STEP", "Generating Ninja build files with GN.")
-        run_gn_gen(env)
+    # Filter DeprecationWarnings, especially from Python's datetime module
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-        log("STEP", "Starting the main V8 compilation with Ninja.")
-        run_ninja_build(env)
+    log("START", f"=== CerebrumLux V8 Build v{SCRIPT_VERSION} started ===", to_console=True)
+    start_time = time.time()
+    env = prepare_subprocess_env()
+    build_succeeded = False
 
-        log("STEP", "Copying compiled V8 artifacts to vcpkg's installed directory.")
-        copy_to_vcpkg()
-        
-        log("STEP", "Updating vcpkg portfile and manifest for V8 integration.")
-        update_vcpkg_port(V8_VERSION, V8_REF, "https://chromium.googlesource.com/v8/v8", "BSD-3-Clause")
-        
-        log("STEP", "Running 'vcpkg integrate install' for system-wide CMake integration.")
-        vcpkg_integrate_install(env)
+    try:
+        run_pipeline(env, from_step=args.from_step, only_step=args.only_step,
+                     use_checkpoints=not args.no_checkpoints, max_workers=args.pipeline_jobs)
         
         log("SUCCESS", "V8 build + integration complete. Please inspect logs for details.", to_console=True)
+        build_succeeded = True
 
     except Exception as e:
         log("FATAL", f"Build process encountered a fatal error: {e}", to_console=True)
@@ -2162,12 +5031,29 @@ def main(): # CerebrumLux V8 Build v7.37.19
         end_time = time.time()
         duration = end_time - start_time
         log("INFO", f"Script finished. Total time: {duration:.2f} seconds. Check full log file for details: {LOG_FILE}", to_console=True)
-        with Path(LOG_FILE).open('r', encoding='utf-8') as f:
-            log_content = f.read()
-            if "FATAL" in log_content or "ERROR" in log_content:
-                log("SUMMARY_ERROR", f"Errors or Fatal issues detected in logs. Please check CerebrumLux-V8-Build-{V8_VERSION}.log and CerebrumLux-V8-Build-{V8_VERSION}-error.log", to_console=True)
-            else:
-                log("SUMMARY_SUCCESS", "No major errors detected. V8 build is likely successful!", to_console=True)
+        if subprocess_spans():
+            log("INFO", f"Slowest commands (of {len(subprocess_spans())} run):", to_console=True)
+            record_run_summary("slowest_commands", report_slowest_commands())
+        if patch_report():
+            record_run_summary("patches", patch_report())
+        retries_seen = retry_report()
+        if any(retries_seen["failures"].values()):
+            record_run_summary("retries", retries_seen)
+        if GIT_CACHE_DIR:
+            try:
+                record_run_summary("git_cache", report_git_cache(prune=args.prune_git_cache, root_dir=V8_ROOT))
+            except Exception as e:
+                log("WARN", f"Could not report on the git cache {GIT_CACHE_DIR}: {e}", to_console=True)
+        write_trace()
+        log("INFO", f"Timing trace written to {TRACE_FILE} (open in chrome://tracing or https://ui.perfetto.dev).", to_console=True)
+        counts = log_counts()
+        write_run_summary("success" if build_succeeded else "failed", duration)
+        if counts["FATAL"] or counts["ERROR"]:
+            first_error = _log_stats["first_error"]
+            log("SUMMARY_ERROR", f"{counts['FATAL']} FATAL and {counts['ERROR']} ERROR entries logged (first at line {first_error['line']} of the log: {first_error['message'][:200]}). "
+                                 f"Please check CerebrumLux-V8-Build-{V8_VERSION}.log, CerebrumLux-V8-Build-{V8_VERSION}-error.log and {Path(RUN_SUMMARY_FILE).name}", to_console=True)
+        else:
+            log("SUMMARY_SUCCESS", f"No major errors detected ({counts['WARN']} warnings). V8 build is likely successful! Run summary: {RUN_SUMMARY_FILE}", to_console=True)
 
 if __name__ == "__main__":
     os.makedirs(LOG_DIR, exist_ok=True)
@@ -2183,4 +5069,16 @@ if __name__ == "__main__":
             shutil.move(ERR_FILE, f"{ERR_FILE}.old-{timestamp_str}")
         except Exception as e:
             print(f"WARN: Could not move old error log file: {e}")
+    if Path(RUN_SUMMARY_FILE).exists():
+        try:
+            timestamp_str = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+            shutil.move(RUN_SUMMARY_FILE, f"{RUN_SUMMARY_FILE}.old-{timestamp_str}")
+        except Exception as e:
+            print(f"WARN: Could not move old run summary file: {e}")
+    if Path(TRACE_FILE).exists():
+        try:
+            timestamp_str = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+            shutil.move(TRACE_FILE, f"{TRACE_FILE}.old-{timestamp_str}")
+        except Exception as e:
+            print(f"WARN: Could not move old trace file: {e}")
     main()
\ No newline at end of file
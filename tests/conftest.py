@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import build_v8
+
+
+@pytest.fixture(autouse=True)
+def _logs_in_tmp(tmp_path, monkeypatch):
+    """Keeps log() output out of the repository's logs/ directory."""
+    monkeypatch.setattr(build_v8, "LOG_FILE", str(tmp_path / "build.log"))
+    monkeypatch.setattr(build_v8, "ERR_FILE", str(tmp_path / "error.log"))
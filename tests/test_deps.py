@@ -0,0 +1,122 @@
+import pytest
+
+import build_v8
+from build_v8 import DepsEvalError, eval_deps_condition, evaluate_deps, prune_deps_text
+
+DEPS = """use_relative_paths = True
+
+vars = {
+  'chromium_url': 'https://chromium.googlesource.com',
+  'checkout_instrumented_libraries': False,
+}
+
+deps = {
+  'build': Var('chromium_url') + '/chromium/src/build.git' + '@' + '1111111111111111111111111111111111111111',
+  'third_party/zlib': Var('chromium_url') + '/chromium/src/third_party/zlib.git@2222222222222222222222222222222222222222',
+  'tools/clang': Var('chromium_url') + '/chromium/src/tools/clang.git' + '@' + '3333333333333333333333333333333333333333',
+  'test/test262/data': Var('chromium_url') + '/external/github.com/tc39/test262.git' + '@' + '4444444444444444444444444444444444444444',
+  'third_party/instrumented_libraries': {
+    'url': '{chromium_url}/chromium/src/third_party/instrumented_libraries.git@5555555555555555555555555555555555555555',
+    'condition': 'checkout_instrumented_libraries',
+  },
+  'tools/win/tool': {
+    'packages': [ { 'package': 'infra/tools/win/tool', 'version': 'version:1' } ],
+    'dep_type': 'cipd',
+  },
+}
+
+recursedeps = [
+  'build',
+  'tools/clang',
+]
+
+hooks = [
+  {
+    'name': 'clang',
+    'pattern': '.',
+    'action': ['python3', 'tools/clang/scripts/update.py'],
+  },
+  {
+    'name': 'lastchange',
+    'pattern': '.',
+    'action': ['python3', 'build/util/lastchange.py', '-o', 'build/util/LASTCHANGE'],
+  },
+]
+"""
+
+VARIABLES = {"host_os": "win", "checkout_win": True, "checkout_linux": False, "mode": "release",
+             "alias": "checkout_win and mode == 'release'", "loop": "loop"}
+
+
+@pytest.mark.parametrize("left", [True, False])
+@pytest.mark.parametrize("right", [True, False])
+def test_condition_boolean_operators(left, right):
+    variables = {"a": left, "b": right}
+    assert eval_deps_condition("a and b", variables) is (left and right)
+    assert eval_deps_condition("a or b", variables) is (left or right)
+    assert eval_deps_condition("not a", variables) is (not left)
+    assert eval_deps_condition("not (a or b) or a and b", variables) is ((not (left or right)) or (left and right))
+
+
+@pytest.mark.parametrize("condition, expected", [
+    ("host_os == 'win'", True),
+    ("host_os != 'win'", False),
+    ("'win' == host_os == 'win'", True),
+    ("checkout_win and not checkout_linux", True),
+    ("checkout_linux or host_os == 'linux'", False),
+    ("alias", True), # A string variable is evaluated as a condition itself
+    ("alias and mode != 'debug'", True),
+    ("undefined_name", True), # An unknown name stands for its own (non-empty) text
+    ("mode == 'debug'", False),
+])
+def test_condition_values(condition, expected):
+    assert eval_deps_condition(condition, VARIABLES) is expected
+
+
+@pytest.mark.parametrize("condition", ["loop", "host_os < 'x'", "len(host_os)", "host_os ==", "checkout_win + 1"])
+def test_condition_errors(condition):
+    with pytest.raises(DepsEvalError):
+        eval_deps_condition(condition, VARIABLES)
+
+
+def test_evaluate_deps_graph():
+    graph = evaluate_deps(DEPS)
+    assert graph["use_relative_paths"]
+    zlib = graph["deps"]["third_party/zlib"]
+    assert zlib["url"] == "https://chromium.googlesource.com/chromium/src/third_party/zlib.git"
+    assert zlib["revision"] == "2" * 40
+    assert graph["deps"]["third_party/instrumented_libraries"]["active"] is False
+    assert graph["deps"]["third_party/instrumented_libraries"]["url"].startswith("https://chromium.googlesource.com/")
+    assert graph["deps"]["tools/win/tool"]["packages"] == [{"package": "infra/tools/win/tool", "version": "version:1"}]
+    assert [hook["name"] for hook in graph["hooks"]] == ["clang", "lastchange"]
+
+
+def _prune(monkeypatch, mode):
+    monkeypatch.setattr(build_v8, "DEPS_PRUNE_MODE", mode)
+    monkeypatch.setattr(build_v8, "DEPS_PRUNE_DENY", ["tools/clang", "test/test262/data", "package:infra/tools/win*"])
+    monkeypatch.setattr(build_v8, "DEPS_PRUNE_ALLOW", ["build", "third_party/zlib"])
+    out = prune_deps_text(DEPS)
+    graph = evaluate_deps(out) # The pruned text is still valid DEPS
+    return out, set(graph["deps"]), [hook["name"] for hook in graph["hooks"]], [entry["path"] for entry in graph["recursedeps"]]
+
+
+def test_prune_deny(monkeypatch):
+    out, deps, hooks, recursedeps = _prune(monkeypatch, "deny")
+    assert deps == {"build", "third_party/zlib", "third_party/instrumented_libraries"}
+    assert hooks == ["lastchange"] # The clang hook ran a script from a pruned entry
+    assert recursedeps == ["build"]
+    assert "tools/clang" not in out and "test262" not in out and "infra/tools/win" not in out
+
+
+def test_prune_allow(monkeypatch):
+    out, deps, hooks, recursedeps = _prune(monkeypatch, "allow")
+    assert deps == {"build", "third_party/zlib"}
+    assert hooks == ["lastchange"]
+    assert recursedeps == ["build"]
+    assert out.startswith(DEPS[:DEPS.index("deps = {")]) # vars and everything before deps are untouched
+
+
+def test_prune_off(monkeypatch):
+    out, deps, hooks, recursedeps = _prune(monkeypatch, "off")
+    assert out == DEPS
+    assert len(deps) == 6 and hooks == ["clang", "lastchange"] and recursedeps == ["build", "tools/clang"]
@@ -0,0 +1,99 @@
+import pytest
+
+from build_v8 import GnEditor, GnSyntaxError, gn_format_value, gn_parse, gn_target_name, gn_walk
+
+BUILD_GN = '''# Copyright header.
+import("//build/config/win/visual_studio_version.gni")
+
+config("compiler") {
+  cflags = [ "-a", "-b" ]  # trailing comment
+  if (is_win) {
+    defines += [ "A=1" ]
+  } else {
+    defines = []
+  }
+}
+
+toolchain_data = exec_script("../../vs_toolchain.py", [ "get_toolchain_dir" ], "scope")
+sys_lib_flags = "${toolchain_data.libpath_flags}"
+'''
+
+
+def _assignment(tree, name):
+    return next(node for node in gn_walk(tree) if gn_target_name(node) == name)
+
+
+def _values(node):
+    """Python value of a parsed literal (strings keep their GN quoting stripped)."""
+    if node["type"] == "list":
+        return [_values(item) for item in node["items"]]
+    if node["type"] == "string":
+        return node["value"][1:-1]
+    return node.get("value", node.get("name"))
+
+
+def test_parse_keeps_source_spans():
+    tree = gn_parse(BUILD_GN)
+    assert tree["type"] == "block"
+    assert [node["type"] for node in tree["statements"]] == ["call", "call", "assign", "assign"]
+    cflags = _assignment(tree, "cflags")
+    assert BUILD_GN[cflags["start"]:cflags["end"]] == 'cflags = [ "-a", "-b" ]'
+    call = _assignment(tree, "toolchain_data")["value"]
+    assert call["name"] == "exec_script" and _values(call["args"][0]) == "../../vs_toolchain.py"
+
+
+def test_editor_without_edits_round_trips():
+    assert GnEditor(BUILD_GN).apply() == BUILD_GN
+
+
+@pytest.mark.parametrize("value", [True, 3, "plain", 'quote " dollar $ backslash \\', [], ["a", "b"], {"x": 1, "y": ["z"]}])
+def test_format_value_round_trips(value):
+    source = "v = " + gn_format_value(value) + "\n"
+    parsed = _assignment(gn_parse(source), "v")["value"]
+    if isinstance(value, dict):
+        assert parsed["type"] == "scope"
+        assert [gn_target_name(node) for node in parsed["block"]["statements"]] == list(value)
+    elif isinstance(value, str):
+        assert source[parsed["start"]:parsed["end"]] == gn_format_value(value)
+        assert parsed["type"] == "string"
+    else:
+        assert parsed["type"] == {bool: "bool", int: "int", list: "list"}[type(value)]
+
+
+def test_span_edits_splice_in_one_pass():
+    tree = gn_parse(BUILD_GN)
+    editor = GnEditor(BUILD_GN)
+    cflags = _assignment(tree, "cflags")
+    first_flag = cflags["value"]["items"][0]
+    assert editor.replace(first_flag["start"], first_flag["end"], '"-c"')
+    assert editor.insert(cflags["start"], 'ldflags = []\n  ')
+    assert editor.comment_out(_assignment(tree, "toolchain_data"))
+    assert editor.remove_statement(_assignment(tree, "sys_lib_flags"))
+    out = editor.apply()
+
+    assert 'cflags = [ "-c", "-b" ]  # trailing comment' in out
+    assert 'ldflags = []\n  cflags' in out
+    assert '# CerebrumLux neutralized: toolchain_data = exec_script(' in out
+    assert "sys_lib_flags" not in out
+    assert out.startswith(BUILD_GN[:cflags["start"]]) # Text before the first edit is untouched
+    edited = gn_parse(out)
+    assert _values(_assignment(edited, "cflags")["value"]) == ["-c", "-b"]
+    assert _values(_assignment(edited, "ldflags")["value"]) == []
+
+
+def test_nested_edit_is_dropped_and_overlap_rejected():
+    tree = gn_parse(BUILD_GN)
+    cflags = _assignment(tree, "cflags")
+    editor = GnEditor(BUILD_GN)
+    assert editor.replace(cflags["start"], cflags["end"], "cflags = []")
+    inner = cflags["value"]["items"][1]
+    assert not editor.replace(inner["start"], inner["end"], '"-z"')
+    with pytest.raises(ValueError):
+        editor.replace(cflags["start"] + 2, cflags["end"] + 2, "")
+    assert "cflags = []  # trailing comment" in editor.apply()
+
+
+def test_syntax_error_reports_line_and_column():
+    with pytest.raises(GnSyntaxError) as error:
+        gn_parse('a = 1\nb = [ "x",\n')
+    assert error.value.line == 3 and error.value.column == 1